@@ -0,0 +1,200 @@
+"""
+Admission control for expensive API routes.
+
+Every controlled route has its own concurrency limit and a bounded wait queue,
+and all routes draw from one shared pool of worker slots. When a route's queue
+is full the request is rejected at once (the server answers 503 with
+Retry-After) instead of piling up until the machine swaps.
+
+Routes carry a priority class. Lower-priority classes may not take the slots
+reserved for higher ones, and when a slot frees up the waiting request with
+the best (priority, arrival) order goes first, so cheap interactive calls such
+as /api/analyze-text are never starved by OCR grading.
+
+Limits are per process; in pre-fork mode each worker enforces its own.
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+
+class RoutePolicy(NamedTuple):
+    max_concurrent: int
+    max_queue: int
+    priority: int = PRIORITY_NORMAL
+    queue_timeout: float = 30.0   # seconds a request may wait for a slot
+    retry_after: int = 5          # seconds suggested to rejected clients
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, route: str, reason: str, retry_after: int):
+        super().__init__(f"{route}: {reason}")
+        self.route = route
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _RouteState:
+    __slots__ = ("policy", "active", "waiting", "admitted", "rejected", "timed_out", "max_queue_seen")
+
+    def __init__(self, policy: RoutePolicy):
+        self.policy = policy
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_seen = 0
+
+
+class _Waiter:
+    __slots__ = ("order", "route", "state")
+
+    def __init__(self, order, route: str, state: _RouteState):
+        self.order = order
+        self.route = route
+        self.state = state
+
+
+class Ticket:
+    """An admitted request; call release() (or use as a context manager) when done."""
+
+    __slots__ = ("_controller", "_route", "_released")
+
+    def __init__(self, controller: Optional["AdmissionController"], route: str):
+        self._controller = controller
+        self._route = route
+        self._released = False
+
+    def release(self) -> None:
+        if self._released or self._controller is None:
+            return
+        self._released = True
+        self._controller._release(self._route)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class AdmissionController:
+    """
+    Args:
+        policies: route path -> RoutePolicy; routes not listed are not controlled
+        total_slots: shared worker slots across all controlled routes
+        reserved_slots: per priority class, how many free slots that class must
+            leave untouched for higher classes
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, RoutePolicy],
+        total_slots: int,
+        reserved_slots: Optional[Dict[int, int]] = None,
+    ):
+        self.total_slots = max(1, total_slots)
+        self.reserved_slots = reserved_slots or {PRIORITY_HIGH: 0, PRIORITY_NORMAL: 1, PRIORITY_LOW: 2}
+        self._routes = {route: _RouteState(policy) for route, policy in policies.items()}
+        self._in_use = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _can_run(self, state: _RouteState) -> bool:
+        if state.active >= state.policy.max_concurrent:
+            return False
+        reserve = min(self.reserved_slots.get(state.policy.priority, 0), self.total_slots - 1)
+        return self.total_slots - self._in_use > reserve
+
+    def _next_runnable(self) -> Optional[_Waiter]:
+        runnable = [w for w in self._waiters if self._can_run(w.state)]
+        return min(runnable, key=lambda w: w.order) if runnable else None
+
+    def acquire(self, route: str) -> Ticket:
+        """
+        Admit a request for `route`, waiting in its queue if necessary.
+        Raises AdmissionRejected when the queue is full or the wait times out.
+        """
+        state = self._routes.get(route)
+        if state is None:
+            return Ticket(None, route)
+
+        policy = state.policy
+        with self._cond:
+            if self._can_run(state):
+                ahead = self._next_runnable()
+                if ahead is None or ahead.order[0] > policy.priority:
+                    return self._grant(route, state)
+
+            if state.waiting >= policy.max_queue:
+                state.rejected += 1
+                raise AdmissionRejected(route, "queue full", policy.retry_after)
+
+            waiter = _Waiter((policy.priority, next(self._seq)), route, state)
+            self._waiters.append(waiter)
+            state.waiting += 1
+            state.max_queue_seen = max(state.max_queue_seen, state.waiting)
+            deadline = time.monotonic() + policy.queue_timeout
+            try:
+                while self._next_runnable() is not waiter:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        state.timed_out += 1
+                        state.rejected += 1
+                        raise AdmissionRejected(route, "timed out waiting for a worker slot", policy.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(waiter)
+                state.waiting -= 1
+                # Our departure may unblock someone else.
+                self._cond.notify_all()
+            return self._grant(route, state)
+
+    def _grant(self, route: str, state: _RouteState) -> Ticket:
+        state.active += 1
+        state.admitted += 1
+        self._in_use += 1
+        return Ticket(self, route)
+
+    def _release(self, route: str) -> None:
+        with self._cond:
+            state = self._routes[route]
+            state.active -= 1
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "total_slots": self.total_slots,
+                "slots_in_use": self._in_use,
+                "queued": len(self._waiters),
+                "routes": {
+                    route: {
+                        "priority": PRIORITY_NAMES.get(state.policy.priority, state.policy.priority),
+                        "max_concurrent": state.policy.max_concurrent,
+                        "max_queue": state.policy.max_queue,
+                        "active": state.active,
+                        "queued": state.waiting,
+                        "max_queued": state.max_queue_seen,
+                        "admitted": state.admitted,
+                        "rejected": state.rejected,
+                        "timed_out": state.timed_out,
+                    }
+                    for route, state in self._routes.items()
+                },
+            }
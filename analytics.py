@@ -0,0 +1,325 @@
+"""
+Incrementally maintained result analytics.
+
+The aggregates live in the exam store's database and are updated inside the
+same transaction that writes or deletes a result (see ExamStore.put_result),
+so dashboards read a handful of pre-aggregated rows instead of scanning every
+result:
+
+- per exam: attempt count, running mean / variance of the percentage score
+  (Welford), min / max, pass count and a score histogram,
+- per exam and day: attempts and score sum (performance over time),
+- per question: attempts, correct answers and points earned,
+- per student: attempt count and running mean / variance.
+
+Replacing or deleting a result subtracts its old contribution. Min / max cannot
+be "un-applied", so they are re-read from the indexed results table when the
+removed score was the current extreme.
+"""
+
+import json
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+
+HISTOGRAM_BINS = 10  # 0-10%, 10-20%, ..., 90-100%
+
+# Bump when stored aggregates (or the results.percentage column they are
+# re-read from) must be recomputed for existing databases.
+ANALYTICS_VERSION = "2"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id   TEXT PRIMARY KEY,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    mean      REAL NOT NULL DEFAULT 0,
+    m2        REAL NOT NULL DEFAULT 0,
+    min_pct   REAL,
+    max_pct   REAL,
+    passed    INTEGER NOT NULL DEFAULT 0,
+    histogram TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS exam_daily_stats (
+    exam_id   TEXT NOT NULL,
+    day       TEXT NOT NULL,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    pct_sum   REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS question_stats (
+    exam_id      TEXT NOT NULL,
+    question_id  TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    correct      INTEGER NOT NULL DEFAULT 0,
+    earned_sum   REAL NOT NULL DEFAULT 0,
+    points_sum   REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_id, question_id)
+);
+
+CREATE TABLE IF NOT EXISTS student_stats (
+    student_id  TEXT PRIMARY KEY,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    mean        REAL NOT NULL DEFAULT 0,
+    m2          REAL NOT NULL DEFAULT 0,
+    min_pct     REAL,
+    max_pct     REAL
+);
+
+CREATE TABLE IF NOT EXISTS analytics_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+
+def result_percentage(result: Dict[str, Any]) -> Optional[float]:
+    """Percentage score of a result document, or None if it carries no score."""
+    try:
+        if result.get("percentage") is not None:
+            return float(result["percentage"])
+        score = float(result["score"])
+        total = float(result.get("totalPoints") or result.get("totalQuestions") or 0)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return score / total * 100.0 if total > 0 else None
+
+
+def _bin(pct: float) -> int:
+    return min(HISTOGRAM_BINS - 1, max(0, int(pct // (100.0 / HISTOGRAM_BINS))))
+
+
+def _welford(attempts: int, mean: float, m2: float, x: float, sign: int):
+    """Add (sign=1) or remove (sign=-1) one sample from running (count, mean, M2)."""
+    if sign > 0:
+        attempts += 1
+        delta = x - mean
+        mean += delta / attempts
+        m2 += delta * (x - mean)
+    else:
+        if attempts <= 1:
+            return 0, 0.0, 0.0
+        new_mean = (attempts * mean - x) / (attempts - 1)
+        m2 -= (x - new_mean) * (x - mean)
+        attempts, mean = attempts - 1, new_mean
+    return attempts, mean, max(0.0, m2)
+
+
+def _extremes(conn: sqlite3.Connection, column: str, key: str, current_min, current_max, x: float, sign: int):
+    if sign > 0:
+        return (x if current_min is None else min(current_min, x),
+                x if current_max is None else max(current_max, x))
+    if x != current_min and x != current_max:
+        return current_min, current_max
+    # The removed score was an extreme; the result row is already gone. The
+    # percentage column holds result_percentage() of each row, so this agrees
+    # with the scores that were added.
+    row = conn.execute(
+        f"SELECT MIN(percentage), MAX(percentage) FROM results WHERE {column} = ?", (key,)
+    ).fetchone()
+    return row[0], row[1]
+
+
+def apply_result(conn: sqlite3.Connection, result: Dict[str, Any], sign: int) -> None:
+    """
+    Add (sign=1) or subtract (sign=-1) a result's contribution to every aggregate.
+    Must run in the transaction that inserts / deletes the result row; for
+    subtraction, after the row has been deleted.
+    """
+    exam_id = str(result["examId"])
+    pct = result_percentage(result)
+
+    if pct is not None:
+        row = conn.execute(
+            "SELECT attempts, mean, m2, min_pct, max_pct, passed, histogram FROM exam_stats WHERE exam_id = ?",
+            (exam_id,),
+        ).fetchone()
+        attempts, mean, m2, min_pct, max_pct, passed, histogram = (
+            row if row else (0, 0.0, 0.0, None, None, 0, "[]")
+        )
+        hist = json.loads(histogram) or [0] * HISTOGRAM_BINS
+        hist[_bin(pct)] = max(0, hist[_bin(pct)] + sign)
+        attempts, mean, m2 = _welford(attempts, mean, m2, pct, sign)
+        min_pct, max_pct = _extremes(conn, "exam_id", exam_id, min_pct, max_pct, pct, sign)
+        passed = max(0, passed + (sign if result.get("passed") else 0))
+        conn.execute(
+            "INSERT OR REPLACE INTO exam_stats (exam_id, attempts, mean, m2, min_pct, max_pct, passed, histogram)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (exam_id, attempts, mean, m2, min_pct, max_pct, passed, json.dumps(hist)),
+        )
+
+        day = str(result.get("completedAt") or "")[:10]
+        if day:
+            conn.execute(
+                "INSERT INTO exam_daily_stats (exam_id, day, attempts, pct_sum) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (exam_id, day) DO UPDATE SET"
+                " attempts = attempts + excluded.attempts, pct_sum = pct_sum + excluded.pct_sum",
+                (exam_id, day, sign, sign * pct),
+            )
+            conn.execute("DELETE FROM exam_daily_stats WHERE exam_id = ? AND day = ? AND attempts <= 0",
+                         (exam_id, day))
+
+        student_id = result.get("studentId")
+        if student_id:
+            row = conn.execute(
+                "SELECT attempts, mean, m2, min_pct, max_pct FROM student_stats WHERE student_id = ?",
+                (student_id,),
+            ).fetchone()
+            s_attempts, s_mean, s_m2, s_min, s_max = row if row else (0, 0.0, 0.0, None, None)
+            s_attempts, s_mean, s_m2 = _welford(s_attempts, s_mean, s_m2, pct, sign)
+            s_min, s_max = _extremes(conn, "student_id", student_id, s_min, s_max, pct, sign)
+            conn.execute(
+                "INSERT OR REPLACE INTO student_stats (student_id, attempts, mean, m2, min_pct, max_pct)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (student_id, s_attempts, s_mean, s_m2, s_min, s_max),
+            )
+
+    rows = []
+    for index, answer in enumerate(result.get("answers") or []):
+        if not isinstance(answer, dict):
+            continue
+        rows.append((
+            exam_id, str(answer.get("questionId") or index + 1), sign,
+            sign if answer.get("isCorrect") else 0,
+            sign * _number(answer.get("earnedPoints")),
+            sign * _number(answer.get("points")),
+        ))
+    conn.executemany(
+        "INSERT INTO question_stats (exam_id, question_id, attempts, correct, earned_sum, points_sum)"
+        " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (exam_id, question_id) DO UPDATE SET"
+        " attempts = attempts + excluded.attempts, correct = correct + excluded.correct,"
+        " earned_sum = earned_sum + excluded.earned_sum, points_sum = points_sum + excluded.points_sum",
+        rows,
+    )
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """
+    Recompute every aggregate from the results table, refreshing each row's
+    percentage column as well; returns the number of results.
+    """
+    for table in ("exam_stats", "exam_daily_stats", "question_stats", "student_stats"):
+        conn.execute(f"DELETE FROM {table}")
+    count = 0
+    for result_id, data in conn.execute("SELECT id, data FROM results").fetchall():
+        result = json.loads(data)
+        conn.execute("UPDATE results SET percentage = ? WHERE id = ?", (result_percentage(result), result_id))
+        apply_result(conn, result, 1)
+        count += 1
+    conn.execute("INSERT OR REPLACE INTO analytics_meta (key, value) VALUES ('built', ?)", (ANALYTICS_VERSION,))
+    return count
+
+
+def needs_rebuild(conn: sqlite3.Connection) -> bool:
+    """True for databases whose aggregates predate the tables or ANALYTICS_VERSION."""
+    row = conn.execute("SELECT value FROM analytics_meta WHERE key = 'built'").fetchone()
+    return row is None or row[0] != ANALYTICS_VERSION
+
+
+# ---------------------------------------------------------------- queries
+
+def _summary(attempts: int, mean: float, m2: float, min_pct, max_pct) -> Dict[str, Any]:
+    return {
+        "attempts": attempts,
+        "mean": round(mean, 4) if attempts else None,
+        "stddev": round(math.sqrt(m2 / (attempts - 1)), 4) if attempts > 1 else None,
+        "min": min_pct,
+        "max": max_pct,
+    }
+
+
+def histogram_edges() -> List[float]:
+    step = 100.0 / HISTOGRAM_BINS
+    return [round(i * step, 4) for i in range(HISTOGRAM_BINS + 1)]
+
+
+def exam_analytics(conn: sqlite3.Connection, exam_id: str) -> Dict[str, Any]:
+    """Score summary, histogram, per-question correct rates and daily trend of one exam."""
+    row = conn.execute(
+        "SELECT attempts, mean, m2, min_pct, max_pct, passed, histogram FROM exam_stats WHERE exam_id = ?",
+        (exam_id,),
+    ).fetchone()
+    attempts, mean, m2, min_pct, max_pct, passed, histogram = row if row else (0, 0.0, 0.0, None, None, 0, "[]")
+
+    questions = [
+        {
+            "questionId": q_id,
+            "attempts": q_attempts,
+            "correct": correct,
+            "correctRate": round(correct / q_attempts, 4) if q_attempts else None,
+            "meanEarned": round(earned / q_attempts, 4) if q_attempts else None,
+            "meanPoints": round(points / q_attempts, 4) if q_attempts else None,
+        }
+        for q_id, q_attempts, correct, earned, points in conn.execute(
+            "SELECT question_id, attempts, correct, earned_sum, points_sum FROM question_stats"
+            " WHERE exam_id = ? AND attempts > 0 ORDER BY question_id",
+            (exam_id,),
+        )
+    ]
+    daily = [
+        {"day": day, "attempts": d_attempts, "mean": round(pct_sum / d_attempts, 4)}
+        for day, d_attempts, pct_sum in conn.execute(
+            "SELECT day, attempts, pct_sum FROM exam_daily_stats WHERE exam_id = ? ORDER BY day", (exam_id,)
+        )
+    ]
+    return {
+        "examId": exam_id,
+        **_summary(attempts, mean, m2, min_pct, max_pct),
+        "passRate": round(passed / attempts, 4) if attempts else None,
+        "histogram": {"edges": histogram_edges(), "counts": json.loads(histogram) or [0] * HISTOGRAM_BINS},
+        "questions": questions,
+        "daily": daily,
+    }
+
+
+def student_analytics(conn: sqlite3.Connection, student_id: str) -> Dict[str, Any]:
+    row = conn.execute(
+        "SELECT attempts, mean, m2, min_pct, max_pct FROM student_stats WHERE student_id = ?", (student_id,)
+    ).fetchone()
+    return {"studentId": student_id, **_summary(*(row if row else (0, 0.0, 0.0, None, None)))}
+
+
+def teacher_analytics(conn: sqlite3.Connection, teacher_id: str) -> Dict[str, Any]:
+    """Per-exam summaries of a teacher's exams, merged into overall totals."""
+    exams = []
+    total_n, total_mean, total_m2 = 0, 0.0, 0.0
+    total_min = total_max = None
+    total_passed = 0
+    counts = [0] * HISTOGRAM_BINS
+    for exam_id, title, attempts, mean, m2, min_pct, max_pct, passed, histogram in conn.execute(
+        "SELECT e.id, e.title, s.attempts, s.mean, s.m2, s.min_pct, s.max_pct, s.passed, s.histogram"
+        " FROM exams e LEFT JOIN exam_stats s ON s.exam_id = e.id WHERE e.teacher_id = ? ORDER BY e.created_at",
+        (teacher_id,),
+    ):
+        attempts = attempts or 0
+        exams.append({"examId": exam_id, "title": title,
+                      **_summary(attempts, mean or 0.0, m2 or 0.0, min_pct, max_pct)})
+        if not attempts:
+            continue
+        # Chan et al. parallel merge of (count, mean, M2).
+        n = total_n + attempts
+        delta = mean - total_mean
+        total_mean += delta * attempts / n
+        total_m2 += m2 + delta * delta * total_n * attempts / n
+        total_n = n
+        total_min = min_pct if total_min is None else min(total_min, min_pct)
+        total_max = max_pct if total_max is None else max(total_max, max_pct)
+        total_passed += passed
+        for i, c in enumerate(json.loads(histogram) or []):
+            counts[i] += c
+    return {
+        "teacherId": teacher_id,
+        **_summary(total_n, total_mean, total_m2, total_min, total_max),
+        "passRate": round(total_passed / total_n, 4) if total_n else None,
+        "histogram": {"edges": histogram_edges(), "counts": counts},
+        "exams": exams,
+    }
@@ -0,0 +1,374 @@
+"""
+Micro-benchmarks for the grading hot paths.
+
+Each benchmark runs on seeded synthetic input: essays, glued PDF text, answer
+keys, exam documents and noisy OCR pages. Two runs with the same seed see the
+same data. By default the sentence encoder is replaced by a stub, so nothing is
+downloaded and the timings cover our own code rather than the model. The stub
+hashes words into vectors, and its WordPiece-style tokenizer drives
+fix_word_spacing_nlp. Pass --encoder real to time with the installed model.
+
+    python benchmarks.py --output bench.json
+    python benchmarks.py --baseline bench.json --max-regression 0.25
+    python benchmarks.py --filter plagiarism --threshold detect_plagiarism_n1000=0.5
+
+With --baseline, the run exits with status 1 if any benchmark's median time
+per call is slower than the baseline's by more than its threshold (a fraction;
+0.25 = 25% slower).
+"""
+
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import timeit
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import nlp_grader
+from answer_key_parser import parse_answer_key_text
+from converter import _parse_questions_from_text
+from ocr_grading import clean_ocr_text, segment_answers_by_questions
+
+
+DEFAULT_SEED = 1234
+DEFAULT_REPEAT = 5
+DEFAULT_MAX_REGRESSION = 0.25
+
+# Each timing sample runs the benchmark often enough to take at least this long.
+MIN_SAMPLE_SECONDS = 0.05
+
+STUB_DIMENSIONS = 384
+
+_VOCABULARY = (
+    "set subset power element function relation graph vertex edge tree path cycle "
+    "matrix vector space basis linear map kernel image rank determinant eigenvalue "
+    "process thread memory cache page table disk file system kernel scheduler "
+    "network packet protocol layer router address socket server client request "
+    "energy force mass velocity acceleration momentum wave frequency field charge "
+    "cell protein enzyme membrane gene organism species evolution population "
+    "the a of is and to in that for it as with on by an be this which or from "
+    "every each all some any no more most less same different equal greater "
+    "defined called shows means contains maps proves gives uses requires returns"
+).split()
+_TERMS = ["power set", "subset", "function", "vertex", "eigenvalue", "kernel", "protocol", "momentum"]
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is not installed. Install it with: pip install numpy")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic corpus generators
+# ---------------------------------------------------------------------------
+
+def gen_sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def gen_essay(rng: random.Random, words: int = 120) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentences.append(gen_sentence(rng, length))
+        words -= length
+    return " ".join(sentences)
+
+
+def gen_paraphrase(rng: random.Random, text: str, change: float = 0.3) -> str:
+    """`text` with a fraction of its words replaced, for answers near a reference."""
+    words = text.split()
+    return " ".join(rng.choice(_VOCABULARY) if rng.random() < change else w for w in words)
+
+
+def gen_glued_text(rng: random.Random, words: int = 40) -> str:
+    """PDF-style text: most spaces lost, plus a formula that must survive intact."""
+    tokens = [rng.choice(_VOCABULARY) for _ in range(words)]
+    out = []
+    for token in tokens:
+        if out and rng.random() < 0.2:
+            out.append(" ")
+        out.append(token)
+    out.append(" where f(x)=x^2-1.")
+    return "".join(out)
+
+
+def gen_answer_key(rng: random.Random, questions: int = 200) -> str:
+    styles = ["{n}) {a}", "{n}. {a}", "Q{n}: {a}", "Question {n} - {a}", "{n}: Option {a}", "({a}) {n}"]
+    lines = []
+    for n in range(1, questions + 1):
+        answer = rng.choice(["A", "B", "C", "D", "(B)", "True", "False", "A,C", rng.choice(_VOCABULARY)])
+        lines.append(rng.choice(styles).format(n=n, a=answer))
+        if rng.random() < 0.05:
+            lines.append(gen_sentence(rng, 6))  # stray line the parser reports as unparsed
+    return "\n".join(lines)
+
+
+def gen_exam_document(rng: random.Random, questions: int = 100) -> str:
+    lines = []
+    for n in range(1, questions + 1):
+        lines.append(f"Q{n}. {gen_sentence(rng, rng.randint(6, 14))[:-1]}?")
+        if rng.random() < 0.3:
+            lines.append(gen_sentence(rng, 8))  # question continues on the next line
+        if rng.random() < 0.8:
+            for letter in "ABCD":
+                lines.append(f"{letter}) {gen_sentence(rng, rng.randint(1, 4))}")
+        lines.append(f"Answer: {rng.choice('ABCD')}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def gen_ocr_document(rng: random.Random, questions: int = 20, words: int = 80) -> str:
+    """An OCR'd answer sheet: question markers, broken lines and typical OCR noise."""
+    noise = [("m", "rn"), ("w", "vv"), ("n", "ii"), ("o", "0")]
+    parts = []
+    for n in range(1, questions + 1):
+        marker = rng.choice([f"Q{n}:", f"Question {n}.", f"{n})", f"({n})"])
+        text = gen_essay(rng, words)
+        chars = list(text)
+        for i, ch in enumerate(chars):
+            if rng.random() < 0.02:
+                for good, bad in noise:
+                    if ch == good:
+                        chars[i] = bad
+        text = "".join(chars)
+        text = re.sub(r" ", lambda _m: rng.choice([" ", " ", " ", "  ", "\n", " (cid:3) "]), text)
+        parts.append(f"{marker} {text}")
+        if rng.random() < 0.2:
+            parts.append("\x0c.....")
+    return "\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Stub encoder
+# ---------------------------------------------------------------------------
+
+class StubTokenizer:
+    """Greedy longest-match WordPiece over the synthetic vocabulary."""
+
+    is_fast = False
+    _pieces = re.compile(r"[A-Za-z0-9]+|[^A-Za-z0-9\s]")
+
+    def __init__(self, vocabulary: List[str]):
+        self.vocab = set(vocabulary)
+        self.longest = max(map(len, vocabulary))
+
+    def _wordpiece(self, word: str) -> List[str]:
+        tokens, start = [], 0
+        while start < len(word):
+            for end in range(min(len(word), start + self.longest), start, -1):
+                if word[start:end] in self.vocab or end == start + 1:
+                    tokens.append(word[start:end] if start == 0 else "##" + word[start:end])
+                    start = end
+                    break
+        return tokens
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens = []
+        for piece in self._pieces.findall(text.lower()):
+            tokens.extend(self._wordpiece(piece) if piece.isalnum() else [piece])
+        return tokens
+
+
+class StubEncoder:
+    """Stands in for SentenceTransformer: bag-of-words feature hashing, normalized."""
+
+    def __init__(self, dimensions: int = STUB_DIMENSIONS):
+        _require_numpy()
+        self.dimensions = dimensions
+        self.tokenizer = StubTokenizer(_VOCABULARY)
+
+    def encode(self, texts, batch_size: int = 32, convert_to_tensor: bool = False,
+               normalize_embeddings: bool = True, **_kwargs):
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, zlib.crc32(word.encode("utf-8")) % self.dimensions] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.where(norms == 0, 1.0, norms)
+        return out
+
+
+def install_stub_encoder() -> None:
+    """Make nlp_grader use StubEncoder (and its tokenizer) instead of downloading a model."""
+    stub = StubEncoder()
+    nlp_grader._get_model = lru_cache(maxsize=1)(lambda: stub)
+    nlp_grader._get_model()
+    nlp_grader._get_tokenizer.cache_clear()
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _build_benchmarks(seed: int) -> Dict[str, Callable[[], Any]]:
+    """name -> zero-argument callable; inputs are generated here, outside the timing."""
+    rng = random.Random(seed)
+    benchmarks: Dict[str, Callable[[], Any]] = {}
+
+    references = [gen_essay(rng, 100) for _ in range(3)]
+    answers = [gen_paraphrase(rng, references[i % 3]) for i in range(32)]
+    answer_cycle = iter(range(10 ** 9))
+
+    def grade():
+        answer = answers[next(answer_cycle) % len(answers)]
+        return nlp_grader.grade_answer(answer, references, 10, mandatory_terms=_TERMS)
+    benchmarks["grade_answer"] = grade
+
+    for n in (10, 100, 1000):
+        student = gen_essay(rng, 120)
+        others = [gen_paraphrase(rng, student, 0.6) for _ in range(n)]
+        benchmarks[f"detect_plagiarism_n{n}"] = (
+            lambda student=student, others=others: nlp_grader.detect_plagiarism(student, others)
+        )
+
+    glued = [gen_glued_text(rng) for _ in range(32)]
+
+    def fix_spacing():
+        nlp_grader._spacing_cache.clear()  # time the work, not the cache
+        return [nlp_grader.fix_word_spacing_nlp(text) for text in glued]
+    benchmarks["fix_word_spacing_nlp_x32"] = fix_spacing
+
+    key = gen_answer_key(rng)
+    benchmarks["parse_answer_key_text_200"] = lambda: parse_answer_key_text(key)
+
+    exam = gen_exam_document(rng)
+    benchmarks["parse_questions_from_text_100"] = lambda: _parse_questions_from_text(exam)
+
+    ocr_page = gen_ocr_document(rng)
+    benchmarks["clean_ocr_text"] = lambda: clean_ocr_text(ocr_page)
+    benchmarks["segment_answers_by_questions_20"] = lambda: segment_answers_by_questions(ocr_page, 20)
+    return benchmarks
+
+
+def time_call(fn: Callable[[], Any], repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Seconds per call over `repeat` samples, each looping until MIN_SAMPLE_SECONDS."""
+    fn()  # warm-up: lazy imports, compiled patterns, term matchers
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= MIN_SAMPLE_SECONDS or number >= 10 ** 6:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(MIN_SAMPLE_SECONDS / elapsed * 1.2))
+    samples = [t / number for t in timer.repeat(repeat, number)]
+    median = statistics.median(samples)
+    return {
+        "calls_per_sample": number,
+        "median_ms": round(median * 1000, 4),
+        "min_ms": round(min(samples) * 1000, 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "stdev_ms": round(statistics.stdev(samples) * 1000, 4) if len(samples) > 1 else 0.0,
+        "ops_per_second": round(1 / median, 2) if median else None,
+    }
+
+
+def run(seed: int = DEFAULT_SEED, repeat: int = DEFAULT_REPEAT, name_filter: Optional[str] = None,
+        encoder: str = "stub") -> Dict[str, Any]:
+    if encoder == "stub":
+        install_stub_encoder()
+    results = {}
+    for name, fn in _build_benchmarks(seed).items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = time_call(fn, repeat)
+        print(f"{name:36s} {results[name]['median_ms']:>12.4f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "seed": seed,
+            "repeat": repeat,
+            "encoder": encoder,
+            "grader_version": nlp_grader.grader_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float,
+            thresholds: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Regressions of `report` against `baseline` (median time per call), worst first."""
+    thresholds = thresholds or {}
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get("median_ms"):
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1
+        limit = thresholds.get(name, max_regression)
+        result["change_vs_baseline"] = round(change, 4)
+        if change > limit:
+            regressions.append({"benchmark": name, "change": round(change, 4), "threshold": limit,
+                                "baseline_ms": before["median_ms"], "median_ms": result["median_ms"]})
+    return sorted(regressions, key=lambda r: r["change"], reverse=True)
+
+
+def _parse_thresholds(values: List[str]) -> Dict[str, float]:
+    thresholds = {}
+    for value in values:
+        name, _, limit = value.partition("=")
+        thresholds[name] = float(limit)
+    return thresholds
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the grading hot paths on synthetic data")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timing samples per benchmark")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--encoder", choices=("stub", "real"), default="stub",
+                        help="Stub encoder (default) or the installed sentence-transformers model")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument("--threshold", action="append", default=[], metavar="NAME=FRACTION",
+                        help="Per-benchmark allowed slowdown, e.g. detect_plagiarism_n1000=0.5")
+    args = parser.parse_args(argv)
+
+    try:
+        thresholds = _parse_thresholds(args.threshold)
+    except ValueError:
+        parser.error("--threshold must look like NAME=FRACTION")
+    try:
+        report = run(args.seed, args.repeat, args.filter, args.encoder)
+    except RuntimeError as e:
+        print(f"Benchmarks failed: {e}", file=sys.stderr)
+        return 2
+
+    regressions: List[Dict[str, Any]] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.max_regression, thresholds)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    for regression in regressions:
+        print(f"REGRESSION {regression['benchmark']}: {regression['baseline_ms']} ms -> "
+              f"{regression['median_ms']} ms (+{regression['change']:.0%}, "
+              f"allowed +{regression['threshold']:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
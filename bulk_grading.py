@@ -0,0 +1,245 @@
+"""
+Bulk grading from the command line: JSONL requests in, JSONL results out.
+
+    python -m nlp_grader requests.jsonl -o results.jsonl --workers 4
+    cat requests.jsonl | python -m nlp_grader > results.jsonl
+    python -m ocr_grading sheets.jsonl -o results.jsonl --resume
+
+Each input line is one request:
+- for `nlp_grader`, the /api/grade-essay body (studentAnswer, referenceAnswers,
+  maxPoints, ...);
+- for `ocr_grading`, {"answerSheet": <path>, "questions": [...], "lang",
+  "minConfidence"}.
+
+An optional "id" is copied to the result. Each output line is the matching
+endpoint's response, plus "line" (the 0-based input line number).
+
+Requests are graded in batches by a pool of worker processes. Each worker loads
+the embedding model once. Results are written in input order, and the number
+of batches in flight is bounded, so memory stays flat however long the input.
+With an output file, a checkpoint (<output>.ckpt) records how many input lines
+are done and how long the output was at that point. --resume continues from
+there after an interruption.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+BULK_BATCH_SIZE = 16
+
+# Batches queued per worker beyond the one it is grading.
+BULK_PENDING_PER_WORKER = 2
+
+KINDS = ("essay", "ocr")
+
+
+# ---------------------------------------------------------------------------
+# Workers
+# ---------------------------------------------------------------------------
+
+def _init_worker(kind: str, threads: int) -> None:
+    """Load the model once per worker and keep its thread pool to this worker's share of cores."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from nlp_grader import _get_model
+    try:
+        _get_model()
+    except RuntimeError:
+        pass  # reported per request by the grader
+
+
+def _grade_essay_line(request: Dict[str, Any]) -> Dict[str, Any]:
+    from nlp_grader import grade_essay_request, normalize_essay_request
+
+    response, _status = grade_essay_request(normalize_essay_request(request))
+    return response
+
+
+def _grade_ocr_line(request: Dict[str, Any]) -> Dict[str, Any]:
+    from ocr_grading import grade_ocr_answer_sheet
+
+    if not request.get("answerSheet") or not isinstance(request.get("questions"), list):
+        return {"success": False, "message": "answerSheet (a path) and questions (a list) are required"}
+    return grade_ocr_answer_sheet(
+        answer_sheet_path=request["answerSheet"],
+        questions=request["questions"],
+        lang=request.get("lang") or "eng",
+        min_confidence=float(request.get("minConfidence") or 30.0),
+    )
+
+
+def grade_batch(kind: str, batch: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """Grade (line number, raw JSON line) pairs; a bad line yields an error result, not an exception."""
+    grade = _grade_ocr_line if kind == "ocr" else _grade_essay_line
+    out = []
+    for line_number, raw in batch:
+        try:
+            request = json.loads(raw)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            out.append({"line": line_number, "success": False, "message": f"Invalid request: {e}"})
+            continue
+        try:
+            result = grade(request)
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        if "id" in request:
+            result = {"id": request["id"], **result}
+        out.append({"line": line_number, **result})
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Input, output and checkpoints
+# ---------------------------------------------------------------------------
+
+def _read_batches(source: TextIO, skip: int, batch_size: int) -> Iterator[Tuple[int, List[Tuple[int, str]]]]:
+    """(lines consumed so far, batch) for non-blank lines after the first `skip` lines."""
+    consumed = 0
+    batch: List[Tuple[int, str]] = []
+    for line_number, line in enumerate(source):
+        consumed = line_number + 1
+        if line_number < skip or not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            yield consumed, batch
+            batch = []
+    if batch or consumed > skip:
+        yield consumed, batch
+
+
+def _read_checkpoint(path: Path) -> Dict[str, int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        return {"lines_done": int(checkpoint["lines_done"]), "output_bytes": int(checkpoint["output_bytes"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {"lines_done": 0, "output_bytes": 0}
+
+
+def _write_checkpoint(path: Path, lines_done: int, output_bytes: int) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"lines_done": lines_done, "output_bytes": output_bytes}, f)
+    os.replace(tmp_path, path)
+
+
+def _graded_batches(kind: str, batches: Iterator[Tuple[int, List[Tuple[int, str]]]], workers: int,
+                    threads: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """(lines consumed, results) per batch, in input order."""
+    if workers <= 1:
+        _init_worker(kind, threads)
+        for consumed, batch in batches:
+            yield consumed, grade_batch(kind, batch)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    # Fork before any model is loaded in this process; each worker loads its own.
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker, initargs=(kind, threads))
+    try:
+        window = workers * (1 + BULK_PENDING_PER_WORKER)
+        pending = deque((consumed, pool.submit(grade_batch, kind, batch))
+                        for consumed, batch in islice(batches, window))
+        while pending:
+            consumed, future = pending.popleft()
+            for nxt_consumed, nxt in islice(batches, 1):
+                pending.append((nxt_consumed, pool.submit(grade_batch, kind, nxt)))
+            yield consumed, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def run(kind: str, input_path: str = "-", output_path: str = "-", workers: int = 1,
+        batch_size: int = BULK_BATCH_SIZE, resume: bool = False,
+        checkpoint_path: Optional[str] = None) -> Dict[str, int]:
+    """Grade every request of `input_path` into `output_path` ("-" = stdin / stdout)."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    to_file = output_path != "-"
+    checkpoint = None
+    if to_file:
+        checkpoint = Path(checkpoint_path or output_path + ".ckpt")
+    elif resume:
+        raise ValueError("--resume needs an output file")
+
+    state = {"lines_done": 0, "output_bytes": 0}
+    if resume and checkpoint.exists():
+        state = _read_checkpoint(checkpoint)
+    if to_file:
+        out = open(output_path, "r+b" if resume and Path(output_path).exists() else "wb")
+        # Drop anything written after the last checkpoint (a batch cut short by the interruption).
+        out.truncate(state["output_bytes"])
+        out.seek(state["output_bytes"])
+    else:
+        out = sys.stdout.buffer
+
+    source = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    graded = 0
+    try:
+        batches = _read_batches(source, state["lines_done"], batch_size)
+        for consumed, results in _graded_batches(kind, batches, workers, threads):
+            out.write(b"".join((json.dumps(r) + "\n").encode("utf-8") for r in results))
+            out.flush()
+            graded += len(results)
+            if checkpoint is not None:
+                os.fsync(out.fileno())
+                _write_checkpoint(checkpoint, consumed, out.tell())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if to_file:
+            out.close()
+    return {"graded": graded, "skipped_lines": state["lines_done"]}
+
+
+def main(kind: str, argv: Optional[List[str]] = None) -> int:
+    module = "ocr_grading" if kind == "ocr" else "nlp_grader"
+    parser = argparse.ArgumentParser(
+        prog=f"python -m {module}",
+        description="Grade JSONL requests in bulk, writing JSONL results in input order",
+    )
+    parser.add_argument("input", nargs="?", default="-", help="JSONL requests (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Grading processes (default: GRADER_WORKERS or the CPU count)")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="Requests per task")
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.ckpt)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers
+    if workers is None:
+        try:
+            workers = int(os.environ.get("GRADER_WORKERS") or os.cpu_count() or 1)
+        except ValueError:
+            print("Invalid GRADER_WORKERS environment variable, falling back to the CPU count", file=sys.stderr)
+            workers = os.cpu_count() or 1
+    if workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be at least 1")
+
+    try:
+        stats = run(kind, args.input, args.output, workers, args.batch_size, args.resume, args.checkpoint)
+    except (OSError, ValueError) as e:
+        print(f"Bulk grading failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Graded {stats['graded']} requests"
+          + (f" (resumed after {stats['skipped_lines']} lines)" if stats["skipped_lines"] else ""),
+          file=sys.stderr)
+    return 0
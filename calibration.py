@@ -0,0 +1,317 @@
+"""
+Fit the grader's similarity bounds and hybrid weights to teacher scores.
+
+Every example in the training log (teacher corrections saved from manual
+grading) is reduced once to the inputs of the hybrid score: best semantic
+similarity to the reference answers (computed as grade_answer does, windowing
+and pooling long answers), mandatory-term coverage and the grammar factor. Embeddings are kept in an on-disk cache keyed by model and text, so
+only new texts are encoded on later runs. The grid search then evaluates every
+(min_sim, max_sim) pair against all weight combinations at once with NumPy;
+no candidate setting re-encodes or re-grades anything.
+
+The result is written as a versioned profile that nlp_grader loads at import,
+which also changes grader_version() and so invalidates cached grades:
+
+    python calibration.py                      # fit and write calibration_profile.json
+    python calibration.py --dry-run            # report only
+    python calibration.py --default-max-points 10
+
+Plagiarism penalties are not modelled: the training log does not keep the
+other submissions the AI score was computed against.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import nlp_grader
+from nlp_grader import TextAnalysis, iter_training_data
+
+
+EMBEDDING_CACHE_FILE = Path(__file__).parent / "calibration_embeddings.npz"
+
+# Grid resolution for the similarity bounds and the hybrid weights.
+SIM_STEP = 0.05
+WEIGHT_STEP = 0.05
+
+# Examples per block when scoring a grid point, to bound memory use.
+FIT_BLOCK_SIZE = 8192
+
+LOSSES = ("mae", "mse")
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is not installed. Install it with: pip install numpy")
+
+
+# ---------------------------------------------------------------------------
+# Embedding cache
+# ---------------------------------------------------------------------------
+
+class EmbeddingCache:
+    """Normalized embeddings by (model, text) digest, persisted as one .npz file."""
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_FILE, model: str = nlp_grader.EMBEDDING_MODEL_NAME):
+        _require_numpy()
+        self.path = Path(path)
+        self.model = model
+        self._rows: Dict[bytes, int] = {}
+        self._vectors = None
+        if self.path.exists():
+            with np.load(self.path) as data:
+                keys, self._vectors = data["keys"], data["vectors"]
+            self._rows = {key.tobytes(): i for i, key in enumerate(keys)}
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    def embed(self, texts: List[str]):
+        """Embeddings for `texts` (rows in order); only unseen texts are encoded."""
+        keys = [self._key(t) for t in texts]
+        missing = list({k: t for k, t in zip(keys, texts) if k not in self._rows}.items())
+        if missing:
+            encoded = np.asarray(nlp_grader.embed_texts_bulk([t for _k, t in missing]), dtype=np.float32)
+            start = 0 if self._vectors is None else len(self._vectors)
+            self._vectors = encoded if self._vectors is None else np.concatenate([self._vectors, encoded])
+            for offset, (key, _text) in enumerate(missing):
+                self._rows[key] = start + offset
+            self.save()
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[[self._rows[k] for k in keys]]
+
+    def save(self) -> None:
+        ordered = sorted(self._rows, key=self._rows.get)
+        keys = np.frombuffer(b"".join(ordered), dtype=np.uint8).reshape(len(ordered), -1)
+        tmp_path = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez(tmp_path, keys=keys, vectors=self._vectors)
+        tmp_path.replace(self.path)
+
+
+# ---------------------------------------------------------------------------
+# Features
+# ---------------------------------------------------------------------------
+
+def _grammar_factor(analysis: TextAnalysis) -> float:
+    """The multiplier calculate_hybrid_score applies to the grammar share."""
+    grammar = analysis.grammar(10, 1000)
+    factor = 1.0
+    if not grammar["passed"]:
+        factor *= 0.5
+    if grammar["warnings"]:
+        factor *= 0.8
+    return factor
+
+
+def build_features(examples: Iterable[Dict[str, Any]], cache: EmbeddingCache,
+                   default_max_points: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Per-example arrays: similarity, coverage, grammar, target (teacher score / max
+    points), ai (stored AI score / max points) and max_points. Examples without
+    an answer, a reference or max points (and no default) are skipped.
+    """
+    _require_numpy()
+    pairs = []
+    coverage, grammar, target, ai, max_points = [], [], [], [], []
+    skipped = 0
+
+    for example in examples:
+        answer = (example.get("student_answer") or "").strip()
+        refs = [r.strip() for r in example.get("reference_answers") or [] if r and r.strip()]
+        points = example.get("max_points") or default_max_points
+        if not answer or not refs or not points:
+            skipped += 1
+            continue
+        points = float(points)
+
+        analysis = TextAnalysis(answer)
+        terms = example.get("mandatory_terms")
+        coverage.append(analysis.terms(terms)["coverage"] if terms else 1.0)
+        grammar.append(_grammar_factor(analysis))
+        target.append(min(max(float(example.get("teacher_score") or 0) / points, 0.0), 1.0))
+        ai.append(float(example.get("ai_score") or 0) / points)
+        max_points.append(points)
+
+        pairs.append((answer, refs))
+
+    if not target:
+        return {"examples": 0, "skipped": skipped}
+
+    similarity = nlp_grader.pairwise_semantic_similarities(pairs, embed=cache.embed)
+    return {
+        "examples": len(target),
+        "skipped": skipped,
+        "similarity": np.array(similarity, dtype=np.float32),
+        "coverage": np.array(coverage, dtype=np.float32),
+        "grammar": np.array(grammar, dtype=np.float32),
+        "target": np.array(target, dtype=np.float32),
+        "ai": np.array(ai, dtype=np.float32),
+        "max_points": np.array(max_points, dtype=np.float32),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fitting
+# ---------------------------------------------------------------------------
+
+def _weight_grid(step: float):
+    """Every (semantic, terms, grammar) weight triple on the simplex at `step`."""
+    n = int(round(1 / step))
+    triples = [(s, t, n - s - t) for s in range(n + 1) for t in range(n + 1 - s)]
+    return np.array(triples, dtype=np.float32) / n
+
+
+def _semantic_ratio(similarity, min_sim: float, max_sim: float):
+    return np.clip((similarity - min_sim) / (max_sim - min_sim), 0.0, 1.0)
+
+
+def predict(features: Dict[str, Any], min_sim: float, max_sim: float, weights: Dict[str, float]):
+    """Normalized hybrid score (0..1) of every example for one setting."""
+    ratio = _semantic_ratio(features["similarity"], min_sim, max_sim)
+    score = (ratio * weights["semantic"] + features["coverage"] * weights["terms"]
+             + features["grammar"] * weights["grammar"])
+    return np.clip(score, 0.0, 1.0)
+
+
+def _loss(pred, target, loss: str) -> float:
+    diff = pred - target
+    return float(np.mean(np.abs(diff)) if loss == "mae" else np.mean(diff * diff))
+
+
+def fit(features: Dict[str, Any], sim_step: float = SIM_STEP, weight_step: float = WEIGHT_STEP,
+        loss: str = "mae") -> Dict[str, Any]:
+    """
+    Grid search over min_sim < max_sim (both multiples of sim_step) and weights
+    summing to 1. For each bound pair, all weight triples are scored against all
+    examples in one broadcast (blocked by FIT_BLOCK_SIZE examples).
+    """
+    _require_numpy()
+    if loss not in LOSSES:
+        raise ValueError(f"loss must be one of {', '.join(LOSSES)}")
+    weights = _weight_grid(weight_step)
+    w_sem, w_terms, w_grammar = weights[:, 0:1], weights[:, 1:2], weights[:, 2:3]
+    similarity, target = features["similarity"], features["target"]
+    n = len(target)
+
+    # Term and grammar parts do not depend on the bounds: compute them once.
+    fixed = w_terms * features["coverage"][None, :] + w_grammar * features["grammar"][None, :]
+
+    bounds = np.round(np.arange(0.0, 1.0 + sim_step / 2, sim_step), 6)
+    best = {"error": float("inf")}
+    for min_sim in map(float, bounds):
+        for max_sim in map(float, bounds[bounds > min_sim]):
+            ratio = _semantic_ratio(similarity, min_sim, max_sim)
+            errors = np.zeros(len(weights), dtype=np.float64)
+            for start in range(0, n, FIT_BLOCK_SIZE):
+                block = slice(start, start + FIT_BLOCK_SIZE)
+                pred = np.clip(w_sem * ratio[None, block] + fixed[:, block], 0.0, 1.0)
+                diff = pred - target[None, block]
+                errors += (np.abs(diff) if loss == "mae" else diff * diff).sum(axis=1)
+            k = int(np.argmin(errors))
+            if errors[k] / n < best["error"]:
+                best = {"error": errors[k] / n, "min_sim": min_sim, "max_sim": max_sim,
+                        "weights": dict(zip(("semantic", "terms", "grammar"), map(float, weights[k])))}
+    best["candidates"] = int(len(weights) * sum(int((bounds > b).sum()) for b in bounds))
+    return best
+
+
+def _report(features: Dict[str, Any], min_sim: float, max_sim: float, weights: Dict[str, float],
+            loss: str) -> Dict[str, float]:
+    pred = predict(features, min_sim, max_sim, weights)
+    return {
+        loss: round(_loss(pred, features["target"], loss), 5),
+        "mae_points": round(float(np.mean(np.abs(pred - features["target"]) * features["max_points"])), 4),
+    }
+
+
+def calibrate(examples: Iterable[Dict[str, Any]], cache: EmbeddingCache,
+              default_max_points: Optional[float] = None, sim_step: float = SIM_STEP,
+              weight_step: float = WEIGHT_STEP, loss: str = "mae") -> Dict[str, Any]:
+    """Fit a profile (not yet written) from training examples."""
+    started = time.perf_counter()
+    features = build_features(examples, cache, default_max_points)
+    if not features["examples"]:
+        raise ValueError(f"No usable training examples ({features['skipped']} skipped)")
+    prepared = time.perf_counter()
+    best = fit(features, sim_step, weight_step, loss)
+    finished = time.perf_counter()
+
+    before = _report(features, nlp_grader.SEMANTIC_MIN_SIM, nlp_grader.SEMANTIC_MAX_SIM,
+                     nlp_grader.DEFAULT_HYBRID_WEIGHTS, loss)
+    after = _report(features, best["min_sim"], best["max_sim"], best["weights"], loss)
+    stored_ai = float(np.mean(np.abs(np.clip(features["ai"], 0, 1) - features["target"]) * features["max_points"]))
+    return {
+        "format": nlp_grader.CALIBRATION_FORMAT,
+        "model": nlp_grader.EMBEDDING_MODEL_NAME,
+        "long_answer": nlp_grader.long_answer_settings(),
+        "min_sim": round(best["min_sim"], 4),
+        "max_sim": round(best["max_sim"], 4),
+        "weights": {k: round(v, 4) for k, v in best["weights"].items()},
+        "fit": {
+            "examples": features["examples"],
+            "skipped": features["skipped"],
+            "loss": loss,
+            "sim_step": sim_step,
+            "weight_step": weight_step,
+            "candidates": best["candidates"],
+            "before": before,
+            "after": after,
+            "stored_ai_mae_points": round(stored_ai, 4),
+            "feature_seconds": round(prepared - started, 3),
+            "search_seconds": round(finished - prepared, 3),
+        },
+    }
+
+
+def write_profile(profile: Dict[str, Any], path: Path = nlp_grader.CALIBRATION_PROFILE_FILE) -> Dict[str, Any]:
+    """Write `profile` with the next version number after the existing profile's."""
+    path = Path(path)
+    version = 0
+    if path.exists():
+        try:
+            version = int(json.loads(path.read_text(encoding="utf-8")).get("version") or 0)
+        except (OSError, ValueError):
+            version = 0
+    profile = {"version": version + 1, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), **profile}
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    tmp_path.replace(path)
+    return profile
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fit grading thresholds and weights to teacher scores")
+    parser.add_argument("--output", default=str(nlp_grader.CALIBRATION_PROFILE_FILE), help="Profile to write")
+    parser.add_argument("--cache", default=str(EMBEDDING_CACHE_FILE), help="Embedding cache file")
+    parser.add_argument("--default-max-points", type=float, default=None,
+                        help="Max points for examples saved without maxPoints (skipped otherwise)")
+    parser.add_argument("--sim-step", type=float, default=SIM_STEP)
+    parser.add_argument("--weight-step", type=float, default=WEIGHT_STEP)
+    parser.add_argument("--loss", choices=LOSSES, default="mae")
+    parser.add_argument("--dry-run", action="store_true", help="Report the fit without writing the profile")
+    args = parser.parse_args(argv)
+
+    try:
+        profile = calibrate(iter_training_data(), EmbeddingCache(Path(args.cache)), args.default_max_points,
+                            args.sim_step, args.weight_step, args.loss)
+    except (RuntimeError, ValueError) as e:
+        print(f"Calibration failed: {e}", file=sys.stderr)
+        return 1
+    if not args.dry_run:
+        profile = write_profile(profile, Path(args.output))
+    print(json.dumps(profile, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
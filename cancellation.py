@@ -0,0 +1,121 @@
+"""
+Cooperative cancellation and request deadlines.
+
+The server installs a CancelToken for each request (`cancel_scope`). Long-running
+code calls `check_cancelled()` at natural boundaries (between PDF pages,
+between embedding batches, between questions). When the time budget is spent,
+or the client has closed its connection, the check raises OperationCancelled
+and the work unwinds, releasing its admission slot on the way out.
+
+OperationCancelled derives from BaseException (like asyncio.CancelledError) so
+the broad `except Exception` handlers in the grading code do not swallow it.
+"""
+
+import select
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+class OperationCancelled(BaseException):
+    """Raised by check_cancelled() once the current request has been cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+DEADLINE_EXCEEDED = "deadline exceeded"
+CLIENT_DISCONNECTED = "client disconnected"
+
+
+class CancelToken:
+    """
+    Cancellation state for one unit of work.
+
+    Args:
+        timeout: seconds from now after which the work is cancelled (None = no deadline)
+        probe: optional callable returning True when the requester has gone away;
+            polled at most every `probe_interval` seconds from check()
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        probe: Optional[Callable[[], bool]] = None,
+        probe_interval: float = 0.25,
+    ):
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.reason: Optional[str] = None
+        self._next_probe = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if self.reason is None:
+            self.reason = reason
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        """Raise OperationCancelled if the work should stop."""
+        if self.reason is None:
+            now = time.monotonic()
+            if self.deadline is not None and now >= self.deadline:
+                self.cancel(DEADLINE_EXCEEDED)
+            elif self.probe is not None and now >= self._next_probe:
+                self._next_probe = now + self.probe_interval
+                if self.probe():
+                    self.cancel(CLIENT_DISCONNECTED)
+        if self.reason is not None:
+            raise OperationCancelled(self.reason)
+
+
+_current_token: ContextVar[Optional[CancelToken]] = ContextVar("examgrade_cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """Make `token` the current token for the enclosed work."""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def check_cancelled() -> None:
+    """Cancellation point: raises OperationCancelled if the current work was cancelled."""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def socket_disconnected(sock: socket.socket) -> bool:
+    """
+    True if the peer has closed `sock`. Peeks without consuming data, so
+    pipelined requests on a keep-alive connection are left untouched.
+    """
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (BlockingIOError, InterruptedError):
+        return False
+    except (OSError, ValueError):
+        return True
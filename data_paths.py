@@ -0,0 +1,51 @@
+"""
+Where the server keeps its data (the exam store and the training log).
+
+The source directory can be the web root, so data files default to a
+per-user data directory instead:
+- EXAMGRADE_DATA_DIR if set,
+- otherwise %LOCALAPPDATA%\\examgrade on Windows,
+- otherwise $XDG_DATA_HOME/examgrade (~/.local/share/examgrade).
+
+Files left next to the sources by older versions are moved there on first use.
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterable
+
+SOURCE_DIR = Path(__file__).resolve().parent
+
+
+def data_dir() -> Path:
+    configured = os.environ.get("EXAMGRADE_DATA_DIR")
+    if configured:
+        return Path(configured)
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "examgrade"
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "examgrade"
+
+
+def is_within(path: Path, root: Path) -> bool:
+    """True if `path` is `root` or lies under it (symlinks resolved)."""
+    path, root = Path(path).resolve(), Path(root).resolve()
+    return path == root or root in path.parents
+
+
+def adopt_legacy_files(old: Path, new: Path, suffixes: Iterable[str] = ("",)) -> None:
+    """
+    Move `old` (and `old` + each suffix, e.g. "-wal") to `new` if `new` does
+    not exist yet, so upgrading does not start from an empty store.
+    """
+    old, new = Path(old), Path(new)
+    if new.exists() or not old.exists() or old.resolve() == new.resolve():
+        return
+    new.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in suffixes:
+        source = old.with_name(old.name + suffix)
+        if source.exists():
+            shutil.move(str(source), str(new.with_name(new.name + suffix)))
+    print(f"Moved {old} to {new}", file=sys.stderr)
@@ -0,0 +1,197 @@
+"""
+Multi-process sentence encoding for bulk jobs.
+
+One process calling model.encode uses a single intra-op thread pool, whatever
+the number of cores. EncoderPool starts several encoder processes instead. The
+available cores are split between them, and on Linux each process is pinned to
+its share with os.sched_setaffinity, so the processes do not compete for the
+same cores.
+
+Texts are handled in windows of a few batches per worker. Within a window they
+are sorted by length, so each batch pads to similar lengths. Each window's
+embeddings are yielded in input order as soon as the window is done, and the
+next window is already encoding meanwhile.
+
+    python encoding_pool.py texts.txt --workers 4 --batch-size 64 --compare
+
+reports texts per second for the pool (and, with --compare, for one process).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from cancellation import check_cancelled
+
+
+ENCODER_BATCH_SIZE = 64
+
+# Batches per worker in one length-sorted window.
+WINDOW_BATCHES_PER_WORKER = 4
+
+_worker_slot = None
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_encoder(slot_counter, workers: int, cores: List[int]) -> None:
+    """Claim a slot, pin this process to its share of `cores` and load the model."""
+    global _worker_slot
+    with slot_counter.get_lock():
+        _worker_slot = slot_counter.value
+        slot_counter.value += 1
+    share = cores[_worker_slot::workers] or cores
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, share)
+        except OSError:
+            pass
+    try:
+        import torch
+        torch.set_num_threads(len(share))
+    except ImportError:
+        pass
+    from nlp_grader import _get_model
+    _get_model()
+
+
+def _encode_batch(texts: List[str], batch_size: int):
+    from nlp_grader import _get_model
+    import numpy as np
+
+    vectors = _get_model().encode(
+        texts, batch_size=batch_size, convert_to_tensor=False, normalize_embeddings=True
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class EncoderPool:
+    """
+    Args:
+        workers: encoder processes (default: one per 2 available cores, at least 1)
+        batch_size: texts per model.encode call
+        start_method: multiprocessing start method; "spawn" keeps the workers
+            independent of threads already running in this process
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = ENCODER_BATCH_SIZE,
+                 start_method: str = "spawn"):
+        cores = available_cores()
+        self.workers = max(1, workers or len(cores) // 2)
+        self.batch_size = max(1, batch_size)
+        context = multiprocessing.get_context(start_method)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_encoder,
+            initargs=(context.Value("i", 0), self.workers, cores),
+        )
+        self.stats: Dict[str, Any] = {}
+
+    def _submit_window(self, texts: List[str]):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        futures = []
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            futures.append((rows, self._executor.submit(_encode_batch, [texts[i] for i in rows], self.batch_size)))
+        return len(texts), futures
+
+    @staticmethod
+    def _collect_window(window):
+        import numpy as np
+
+        size, futures = window
+        out = None
+        for rows, future in futures:
+            vectors = future.result()
+            if out is None:
+                out = np.empty((size, vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+        return out
+
+    def iter_encode(self, texts: List[str]) -> Iterator[Any]:
+        """Embeddings of `texts` as consecutive row blocks, in input order."""
+        window_size = self.batch_size * self.workers * WINDOW_BATCHES_PER_WORKER
+        started = time.perf_counter()
+        pending = None
+        for start in range(0, len(texts), window_size):
+            check_cancelled()
+            window = self._submit_window(texts[start:start + window_size])
+            if pending is not None:
+                yield self._collect_window(pending)
+            pending = window
+        if pending is not None:
+            yield self._collect_window(pending)
+        elapsed = time.perf_counter() - started
+        self.stats = {
+            "texts": len(texts),
+            "seconds": round(elapsed, 3),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+        }
+
+    def encode(self, texts: List[str]):
+        """All embeddings of `texts` as one (len(texts), dim) float32 array."""
+        import numpy as np
+
+        blocks = list(self.iter_encode(texts))
+        return np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _load_texts(path: Path) -> List[str]:
+    raw = Path(path).read_text(encoding="utf-8")
+    if raw.lstrip().startswith("["):
+        return [t for t in json.loads(raw) if isinstance(t, str)]
+    return [line.strip() for line in raw.splitlines() if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Encode texts with a pool of encoder processes")
+    parser.add_argument("texts", help="Text file (one text per line) or JSON array of strings")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes")
+    parser.add_argument("--batch-size", type=int, default=ENCODER_BATCH_SIZE)
+    parser.add_argument("--compare", action="store_true", help="Also time single-process encoding")
+    args = parser.parse_args(argv)
+
+    texts = _load_texts(Path(args.texts))
+    report: Dict[str, Any] = {}
+    with EncoderPool(args.workers, args.batch_size) as pool:
+        pool.encode(texts[:pool.workers * pool.batch_size])  # warm-up: workers load the model
+        pool.encode(texts)
+        report["pool"] = pool.stats
+    if args.compare:
+        from nlp_grader import _embed_texts
+        started = time.perf_counter()
+        _embed_texts(texts)
+        elapsed = time.perf_counter() - started
+        report["single_process"] = {
+            "texts": len(texts),
+            "seconds": round(elapsed, 3),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+        }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+Server-side persistence for exams, results and per-question submissions.
+
+SQLite in WAL mode: readers never block the writer, and one database file is
+safely shared by the pre-fork workers. Each thread (and each forked process)
+gets its own connection.
+
+Exams and results are stored as their original JSON documents (the shape
+`storage.js` uses) next to the columns we query on. Every answer in a result is
+also written to the `submissions` table with id "<resultId>:<questionId>", so
+grading endpoints can refer to an answer by id, and plagiarism checks can fetch
+the classmates' answers to the same question from the server instead of having
+the browser upload them.
+
+Result writes also update the incremental aggregates in `analytics` within the
+same transaction.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import analytics
+from data_paths import SOURCE_DIR, adopt_legacy_files, data_dir
+
+
+# Outside the source tree, which may be the web root (see data_paths).
+LEGACY_DB_PATH = SOURCE_DIR / "examgrade.db"
+DB_PATH = Path(os.environ.get("EXAMGRADE_DB") or data_dir() / "examgrade.db")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    id          TEXT PRIMARY KEY,
+    teacher_id  TEXT,
+    title       TEXT,
+    created_at  TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_exams_teacher ON exams (teacher_id, created_at);
+
+CREATE TABLE IF NOT EXISTS results (
+    id            TEXT PRIMARY KEY,
+    exam_id       TEXT NOT NULL,
+    student_id    TEXT,
+    score         REAL,
+    total_points  REAL,
+    percentage    REAL,
+    passed        INTEGER,
+    completed_at  TEXT,
+    data          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_exam ON results (exam_id, completed_at);
+CREATE INDEX IF NOT EXISTS idx_results_student ON results (student_id, completed_at);
+CREATE INDEX IF NOT EXISTS idx_results_completed ON results (completed_at);
+
+CREATE TABLE IF NOT EXISTS submissions (
+    id             TEXT PRIMARY KEY,
+    result_id      TEXT NOT NULL,
+    exam_id        TEXT NOT NULL,
+    student_id     TEXT,
+    question_id    TEXT NOT NULL,
+    question_type  TEXT,
+    answer         TEXT,
+    is_correct     INTEGER,
+    points         REAL,
+    earned_points  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_question ON submissions (exam_id, question_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_result ON submissions (result_id);
+"""
+
+
+class StoreError(ValueError):
+    """Raised for documents that cannot be stored (missing id, wrong type, ...)."""
+
+
+def _page(limit: Optional[int], offset: Optional[int]):
+    limit = DEFAULT_PAGE_SIZE if limit is None else max(1, min(int(limit), MAX_PAGE_SIZE))
+    return limit, max(0, int(offset or 0))
+
+
+def _answer_text(answer: Any) -> Optional[str]:
+    if answer is None or isinstance(answer, str):
+        return answer
+    return json.dumps(answer)
+
+
+def _float_or_none(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ExamStore:
+    """
+    Args:
+        path: SQLite database file (created on first use)
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        if path is None and not os.environ.get("EXAMGRADE_DB"):
+            adopt_legacy_files(LEGACY_DB_PATH, DB_PATH, ("", "-wal", "-shm"))
+        self.path = Path(path or DB_PATH)
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so they are keyed by pid as well as thread.
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+            if not self._schema_ready:
+                with self._schema_lock:
+                    if not self._schema_ready:
+                        local.conn.executescript(_SCHEMA + analytics.SCHEMA)
+                        if analytics.needs_rebuild(local.conn):
+                            with self.transaction() as conn:
+                                analytics.rebuild(conn)
+                        self._schema_ready = True
+        return local.conn
+
+    @contextmanager
+    def snapshot(self):
+        """Read transaction: every query inside sees the same database state."""
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT on this thread's connection."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+    # ---------------------------------------------------------------- exams
+
+    def put_exam(self, exam: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or replace an exam document (must carry an "id")."""
+        if not isinstance(exam, dict) or not exam.get("id"):
+            raise StoreError("exam must be an object with an id")
+        exam_id = str(exam["id"])
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO exams (id, teacher_id, title, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (exam_id, exam.get("teacherId"), exam.get("title"), exam.get("createdAt"), json.dumps(exam)),
+            )
+        return exam
+
+    def get_exam(self, exam_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT data FROM exams WHERE id = ?", (exam_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list_exams(self, teacher_id: Optional[str] = None, limit: Optional[int] = None,
+                   offset: Optional[int] = None) -> Dict[str, Any]:
+        where, params = ("WHERE teacher_id = ?", [teacher_id]) if teacher_id else ("", [])
+        return self._paginate("exams", where, params, "created_at DESC, id", limit, offset)
+
+    def delete_exam(self, exam_id: str) -> bool:
+        """Delete an exam together with its results and submissions."""
+        with self.transaction() as conn:
+            deleted = conn.execute("DELETE FROM exams WHERE id = ?", (exam_id,)).rowcount
+            result_ids = [r["id"] for r in conn.execute("SELECT id FROM results WHERE exam_id = ?", (exam_id,))]
+            for result_id in result_ids:
+                self._delete_result(conn, result_id)
+            for table in ("exam_stats", "exam_daily_stats", "question_stats"):
+                conn.execute(f"DELETE FROM {table} WHERE exam_id = ?", (exam_id,))
+        return bool(deleted or result_ids)
+
+    # -------------------------------------------------------------- results
+
+    def put_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or replace a result document and its per-question submissions."""
+        if not isinstance(result, dict) or not result.get("id") or not result.get("examId"):
+            raise StoreError("result must be an object with an id and an examId")
+        answers = result.get("answers") or []
+        if not isinstance(answers, list):
+            raise StoreError("result answers must be an array")
+
+        with self.transaction() as conn:
+            self._delete_result(conn, str(result["id"]))
+            self._insert_result(conn, result)
+        return result
+
+    def _insert_result(self, conn: sqlite3.Connection, result: Dict[str, Any]) -> None:
+        result_id = str(result["id"])
+        exam_id = str(result["examId"])
+        student_id = result.get("studentId")
+        passed = result.get("passed")
+        conn.execute(
+            "INSERT INTO results (id, exam_id, student_id, score, total_points, percentage, passed, completed_at, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                result_id, exam_id, student_id,
+                _float_or_none(result.get("score")),
+                _float_or_none(result.get("totalPoints")),
+                analytics.result_percentage(result),
+                None if passed is None else int(bool(passed)),
+                result.get("completedAt"),
+                json.dumps(result),
+            ),
+        )
+        rows = []
+        for index, answer in enumerate(result.get("answers") or []):
+            if not isinstance(answer, dict):
+                continue
+            question_id = str(answer.get("questionId") or index + 1)
+            is_correct = answer.get("isCorrect")
+            rows.append((
+                f"{result_id}:{question_id}", result_id, exam_id, student_id, question_id,
+                answer.get("type"), _answer_text(answer.get("userAnswer")),
+                None if is_correct is None else int(bool(is_correct)),
+                _float_or_none(answer.get("points")),
+                _float_or_none(answer.get("earnedPoints")),
+            ))
+        conn.executemany(
+            "INSERT OR REPLACE INTO submissions (id, result_id, exam_id, student_id, question_id, question_type,"
+            " answer, is_correct, points, earned_points) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        analytics.apply_result(conn, result, 1)
+
+    def _delete_result(self, conn: sqlite3.Connection, result_id: str) -> bool:
+        row = conn.execute("SELECT data FROM results WHERE id = ?", (result_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM submissions WHERE result_id = ?", (result_id,))
+        conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+        analytics.apply_result(conn, json.loads(row["data"]), -1)
+        return True
+
+    def get_result(self, result_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT data FROM results WHERE id = ?", (result_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list_results(self, exam_id: Optional[str] = None, student_id: Optional[str] = None,
+                     limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        clauses, params = [], []
+        if exam_id:
+            clauses.append("exam_id = ?")
+            params.append(exam_id)
+        if student_id:
+            clauses.append("student_id = ?")
+            params.append(student_id)
+        where = "WHERE " + " AND ".join(clauses) if clauses else ""
+        return self._paginate("results", where, params, "completed_at DESC, id", limit, offset)
+
+    def iter_results(self, exam_id: Optional[str] = None, since: Optional[str] = None,
+                     until: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Yield result documents ordered by completion time, `batch_size` rows per
+        query. Keyset pagination on (completed_at, id) keeps memory constant and
+        holds no read transaction open between batches, so a slow consumer
+        does not block WAL checkpoints.
+
+        `since` is inclusive and `until` exclusive (ISO timestamps compare as strings).
+        Results without a completion time are yielded first, unless a range is given.
+        """
+        clauses, params = [], []
+        if exam_id:
+            clauses.append("exam_id = ?")
+            params.append(exam_id)
+        if since:
+            clauses.append("completed_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("completed_at < ?")
+            params.append(until)
+
+        if not since and not until:
+            where = " AND ".join(clauses + ["completed_at IS NULL"])
+            cursor_id = ""
+            while True:
+                rows = self.conn.execute(
+                    f"SELECT id, data FROM results WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                    params + [cursor_id, batch_size],
+                ).fetchall()
+                for row in rows:
+                    yield json.loads(row["data"])
+                if len(rows) < batch_size:
+                    break
+                cursor_id = rows[-1]["id"]
+
+        where = " AND ".join(clauses + ["completed_at IS NOT NULL"])
+        cursor = None
+        while True:
+            keyset, keyset_params = ("", []) if cursor is None else (" AND (completed_at, id) > (?, ?)", list(cursor))
+            rows = self.conn.execute(
+                f"SELECT id, completed_at, data FROM results WHERE {where}{keyset}"
+                " ORDER BY completed_at, id LIMIT ?",
+                params + keyset_params + [batch_size],
+            ).fetchall()
+            for row in rows:
+                yield json.loads(row["data"])
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1]["completed_at"], rows[-1]["id"])
+
+    def delete_result(self, result_id: str) -> bool:
+        with self.transaction() as conn:
+            return self._delete_result(conn, result_id)
+
+    # ---------------------------------------------------------- submissions
+
+    def get_submission(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+        return self._submission(row) if row else None
+
+    def list_submissions(self, exam_id: str, question_id: Optional[str] = None,
+                         limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        where, params = "WHERE exam_id = ?", [exam_id]
+        if question_id:
+            where += " AND question_id = ?"
+            params.append(question_id)
+        page = self._paginate("submissions", where, params, "id", limit, offset, columns="*", decode=False)
+        page["items"] = [self._submission(row) for row in page["items"]]
+        return page
+
+    def peer_answers(self, submission_id: str) -> List[str]:
+        """Answers of the other students to the same question of the same exam."""
+        row = self.conn.execute(
+            "SELECT exam_id, question_id, student_id FROM submissions WHERE id = ?", (submission_id,)
+        ).fetchone()
+        if row is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT answer FROM submissions WHERE exam_id = ? AND question_id = ? AND id != ?"
+            " AND (student_id IS NULL OR student_id IS NOT ?) AND answer IS NOT NULL AND answer != ''",
+            (row["exam_id"], row["question_id"], submission_id, row["student_id"]),
+        )
+        return [r["answer"] for r in rows]
+
+    @staticmethod
+    def _submission(row: sqlite3.Row) -> Dict[str, Any]:
+        is_correct = row["is_correct"]
+        return {
+            "id": row["id"],
+            "resultId": row["result_id"],
+            "examId": row["exam_id"],
+            "studentId": row["student_id"],
+            "questionId": row["question_id"],
+            "type": row["question_type"],
+            "userAnswer": row["answer"],
+            "isCorrect": None if is_correct is None else bool(is_correct),
+            "points": row["points"],
+            "earnedPoints": row["earned_points"],
+        }
+
+    # ------------------------------------------------------------ analytics
+
+    def exam_analytics(self, exam_id: str) -> Dict[str, Any]:
+        with self.snapshot() as conn:
+            return analytics.exam_analytics(conn, exam_id)
+
+    def student_analytics(self, student_id: str) -> Dict[str, Any]:
+        with self.snapshot() as conn:
+            return analytics.student_analytics(conn, student_id)
+
+    def teacher_analytics(self, teacher_id: str) -> Dict[str, Any]:
+        with self.snapshot() as conn:
+            return analytics.teacher_analytics(conn, teacher_id)
+
+    def rebuild_analytics(self) -> int:
+        with self.transaction() as conn:
+            return analytics.rebuild(conn)
+
+    # -------------------------------------------------------------- helpers
+
+    def _paginate(self, table: str, where: str, params: List[Any], order: str,
+                  limit: Optional[int], offset: Optional[int], columns: str = "data",
+                  decode: bool = True) -> Dict[str, Any]:
+        limit, offset = _page(limit, offset)
+        total = self.conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params).fetchone()[0]
+        rows = self.conn.execute(
+            f"SELECT {columns} FROM {table} {where} ORDER BY {order} LIMIT ? OFFSET ?", params + [limit, offset]
+        ).fetchall()
+        items = [json.loads(row["data"]) for row in rows] if decode else rows
+        return {"items": items, "total": total, "limit": limit, "offset": offset}
+
+
+_store: Optional[ExamStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ExamStore:
+    """Process-wide store at DB_PATH."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ExamStore()
+    return _store
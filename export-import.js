@@ -52,6 +52,22 @@ function exportResultsToJSON(examId) {
     downloadFile(JSON.stringify(exportData, null, 2), `${exam.title}_results.json`, 'application/json');
 }
 
+// Server-side export: streamed from the result store, so large exports neither
+// freeze the tab nor need to fit in localStorage.
+function exportResultsFromServer(examId, format, fromDate, toDate) {
+    const params = new URLSearchParams({ format: format || 'csv' });
+    if (examId) params.set('examId', examId);
+    if (fromDate) params.set('from', fromDate);
+    if (toDate) params.set('to', toDate);
+    
+    const a = document.createElement('a');
+    a.href = '/api/export/results?' + params.toString();
+    a.download = `results_${examId || 'all'}.${format === 'ndjson' ? 'ndjson' : 'csv'}`;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+}
+
 function exportExamToJSON(examId) {
     const exam = getExamById(examId);
     if (!exam) {
@@ -230,7 +230,8 @@ async function suggestScore(questionId, resultId) {
         aiSuggestions[questionId] = {
             score: data.score,
             similarity: data.similarity,
-            feedback: data.feedback
+            feedback: data.feedback,
+            mandatoryTerms: mandatoryTerms
         };
 
         // Update form fields
@@ -506,7 +507,12 @@ async function saveGrading() {
                             referenceAnswers: question.correctAnswer ? question.correctAnswer.split(';') : [],
                             aiScore: aiSugg.score,
                             teacherScore: newScore,
-                            teacherFeedback: feedbackInput.value
+                            teacherFeedback: feedbackInput.value,
+                            questionId: question.id,
+                            examId: exam.id,
+                            teacherId: getCurrentUser()?.id,
+                            maxPoints: question.points || 1,
+                            mandatoryTerms: aiSugg.mandatoryTerms || []
                         })
                     });
                 } catch (e) {
@@ -2,10 +2,157 @@ import math
 import re
 import json
 import os
+import hashlib
+import sys
+import threading
 from functools import lru_cache
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Callable, Iterator, Tuple, Optional
 from pathlib import Path
 
+from tracing import span, traced
+from cancellation import check_cancelled
+from result_cache import ResultCache
+from term_matcher import compile_terms, tokenize as tokenize_terms
+from training_log import LOG_FILE, PATTERN_GROUPS, get_training_log
+
+
+# ============================================================================
+# GRADER CONFIGURATION
+# ============================================================================
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Bump GRADER_VERSION whenever a change alters scores for the same input.
+GRADER_VERSION = "1.4"
+
+# Similarity below SEMANTIC_MIN_SIM earns no semantic credit, above SEMANTIC_MAX_SIM full credit.
+SEMANTIC_MIN_SIM = 0.4
+SEMANTIC_MAX_SIM = 0.9
+
+DEFAULT_HYBRID_WEIGHTS = {
+    "semantic": 0.7,      # 70% weight on meaning
+    "terms": 0.2,         # 20% weight on key terms
+    "grammar": 0.1        # 10% weight on grammar/length
+}
+
+DEFAULT_PLAGIARISM_THRESHOLD = 0.92
+
+# EmbeddingMatrix storage for cohort comparisons: "float32", "float16" (half the
+# memory) or "int8" (a quarter, plus one scale per row). Rows are compared in
+# blocks of SIMILARITY_BLOCK_ROWS, so only one block is ever expanded to float32.
+EMBEDDING_STORAGE_DTYPES = ("float32", "float16", "int8")
+EMBEDDING_STORAGE = os.environ.get("EMBEDDING_STORAGE", "float16")
+if EMBEDDING_STORAGE not in EMBEDDING_STORAGE_DTYPES:
+    print(f"Invalid EMBEDDING_STORAGE {EMBEDDING_STORAGE!r} (use one of {', '.join(EMBEDDING_STORAGE_DTYPES)}), "
+          "falling back to 'float16'", file=sys.stderr)
+    EMBEDDING_STORAGE = "float16"
+SIMILARITY_BLOCK_ROWS = 4096
+
+# Default texts per model.encode call for embed_texts_bulk's encoder processes.
+EMBED_BATCH_SIZE = 64
+
+# _embed_texts groups texts of similar token length and sizes each batch so that
+# (texts x longest text) stays within EMBED_TOKEN_BUDGET padded tokens.
+EMBED_TOKEN_BUDGET = 8192
+EMBED_MAX_BATCH = 256
+TOKEN_LENGTH_CACHE_SIZE = 65536
+
+# embed_texts_bulk: encoder processes (0 or 1 = encode in this process), and
+# the smallest list worth sharding across them.
+ENCODER_WORKERS = int(os.environ.get("ENCODER_WORKERS") or 0)
+ENCODER_POOL_MIN_TEXTS = 1024
+
+# Answers longer than the model's max_seq_length are split into sentence-aware
+# windows (at most LONG_ANSWER_MAX_WINDOWS, spread over the answer) and the
+# window similarities are pooled: "max" (best window), "mean" (mean of the
+# window embeddings) or "coverage" (mean over reference sentences of their best
+# window match). "truncate" encodes only what fits, as the model does by itself.
+LONG_ANSWER_POOLINGS = ("max", "mean", "coverage", "truncate")
+LONG_ANSWER_POOLING = os.environ.get("LONG_ANSWER_POOLING", "max")
+if LONG_ANSWER_POOLING not in LONG_ANSWER_POOLINGS:
+    print(f"Invalid LONG_ANSWER_POOLING {LONG_ANSWER_POOLING!r} (use one of {', '.join(LONG_ANSWER_POOLINGS)}), "
+          "falling back to 'max'", file=sys.stderr)
+    LONG_ANSWER_POOLING = "max"
+LONG_ANSWER_MAX_WINDOWS = 8
+
+# Texts tokenized per call by fix_word_spacing_batch, and how many fixed texts to remember.
+SPACING_BATCH_SIZE = 256
+SPACING_CACHE_SIZE = 4096
+
+# Word spacing repair: "tokenizer" (BERT WordPiece, needs transformers) or
+# "segmenter" (unigram dictionary segmentation, see word_segmenter.py).
+SPACING_ENGINES = ("tokenizer", "segmenter")
+SPACING_ENGINE = os.environ.get("SPACING_ENGINE", "tokenizer")
+
+
+# Similarity bounds and hybrid weights fitted to teacher scores by calibration.py.
+# Loaded once at import; a missing file keeps the defaults above.
+CALIBRATION_PROFILE_FILE = Path(os.environ.get("CALIBRATION_PROFILE") or Path(__file__).parent / "calibration_profile.json")
+CALIBRATION_FORMAT = 1
+CALIBRATION_VERSION: Optional[int] = None
+
+
+def long_answer_settings() -> Dict[str, Any]:
+    """How answers longer than the model are scored; part of grader_version() and calibration profiles."""
+    return {"pooling": LONG_ANSWER_POOLING, "max_windows": LONG_ANSWER_MAX_WINDOWS}
+
+
+def load_calibration_profile(path: Path = CALIBRATION_PROFILE_FILE) -> Optional[Dict[str, Any]]:
+    """
+    Apply the similarity bounds and hybrid weights of a calibration profile.
+    Returns the profile, or None if there is none or it was fitted for another
+    embedding model, file format or long-answer pooling (the defaults are kept).
+    """
+    global SEMANTIC_MIN_SIM, SEMANTIC_MAX_SIM, DEFAULT_HYBRID_WEIGHTS, CALIBRATION_VERSION
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+        min_sim, max_sim = float(profile["min_sim"]), float(profile["max_sim"])
+        weights = {key: float(profile["weights"][key]) for key in DEFAULT_HYBRID_WEIGHTS}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring calibration profile {path}: {e}", file=sys.stderr)
+        return None
+    if profile.get("format") != CALIBRATION_FORMAT or profile.get("model") != EMBEDDING_MODEL_NAME:
+        print(f"Ignoring calibration profile {path}: fitted for another model or format", file=sys.stderr)
+        return None
+    if profile.get("long_answer") != long_answer_settings():
+        print(f"Ignoring calibration profile {path}: fitted with other long-answer pooling settings", file=sys.stderr)
+        return None
+    if not 0 <= min_sim < max_sim <= 1:
+        print(f"Ignoring calibration profile {path}: invalid similarity bounds", file=sys.stderr)
+        return None
+
+    SEMANTIC_MIN_SIM, SEMANTIC_MAX_SIM = min_sim, max_sim
+    DEFAULT_HYBRID_WEIGHTS = weights
+    CALIBRATION_VERSION = profile.get("version")
+    return profile
+
+
+def grader_version() -> str:
+    """
+    Identify the grading behaviour: GRADER_VERSION plus a digest of the active
+    thresholds and weights. Anything caching grades should key on this.
+    """
+    config = {
+        "version": GRADER_VERSION,
+        "model": EMBEDDING_MODEL_NAME,
+        "min_sim": SEMANTIC_MIN_SIM,
+        "max_sim": SEMANTIC_MAX_SIM,
+        "weights": DEFAULT_HYBRID_WEIGHTS,
+        "plagiarism_threshold": DEFAULT_PLAGIARISM_THRESHOLD,
+        "embedding_storage": EMBEDDING_STORAGE,
+        "calibration": CALIBRATION_VERSION,
+        "long_answer": long_answer_settings(),
+    }
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{GRADER_VERSION}+{digest}"
+
+
+load_calibration_profile()
+
 
 # ============================================================================
 # 1. SENTENCE EMBEDDING MODEL (BERT-based)
@@ -25,13 +172,138 @@ def _get_model():
             "Install it with: pip install sentence-transformers"
         ) from exc
 
-    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+_token_length_cache = ResultCache(max_entries=TOKEN_LENGTH_CACHE_SIZE, ttl_seconds=24 * 3600)
+
+
+def _text_digest(text: str) -> str:
+    """Fixed-size cache key for a text, so caches do not hold whole essays as keys."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _token_lengths(model, texts: List[str], cap: bool = True) -> List[int]:
+    """
+    Model input length of each text (special tokens included, capped at the
+    model's max_seq_length unless cap is False). Lengths are cached; uncached
+    texts are tokenized in one call.
+    """
+    lengths = [_token_length_cache.get(_text_digest(text)) for text in texts]
+    missing = list({text for text, length in zip(texts, lengths) if length is None})
+    if missing:
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is None:
+            counted = [len(text.split()) + 2 for text in missing]
+        elif getattr(tokenizer, "is_fast", False):
+            encoded = tokenizer(
+                missing,
+                add_special_tokens=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False,
+            )
+            counted = [len(ids) for ids in encoded["input_ids"]]
+        else:
+            counted = [len(tokenizer.tokenize(text)) + 2 for text in missing]
+        found = dict(zip(missing, counted))
+        for text, length in found.items():
+            _token_length_cache.put(_text_digest(text), length)
+        lengths = [found[text] if length is None else length for text, length in zip(texts, lengths)]
+    limit = getattr(model, "max_seq_length", None)
+    if cap and limit:
+        return [min(length, limit) for length in lengths]
+    return lengths
+
+
+def _token_budget_batches(lengths: List[int], budget: int = EMBED_TOKEN_BUDGET,
+                          max_batch: int = EMBED_MAX_BATCH) -> List[List[int]]:
+    """
+    Group text indices, shortest first, into batches whose padded size
+    (count x longest) stays within `budget`; a text longer than the budget
+    gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        # Sorted ascending, so this text is the longest in the batch so far.
+        if current and ((len(current) + 1) * lengths[index] > budget or len(current) >= max_batch):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
 
 
 def _embed_texts(texts: List[str]):
-    """Convert texts to normalized vector embeddings."""
+    """
+    Convert texts to normalized vector embeddings.
+    Texts are grouped by token length into batches under EMBED_TOKEN_BUDGET
+    padded tokens, so one long essay does not make a batch of short answers
+    pay for its padding; rows come back in the input order. Cancellation is
+    checked before each batch.
+    """
     model = _get_model()
-    return model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+    with span("embed", texts=len(texts)):
+        check_cancelled()
+        if len(texts) <= 1:
+            return model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+
+        import numpy as np
+
+        batches = _token_budget_batches(_token_lengths(model, texts))
+        if len(batches) == 1:
+            return model.encode(texts, batch_size=len(texts), convert_to_tensor=False, normalize_embeddings=True)
+
+        out = None
+        for rows in batches:
+            check_cancelled()
+            vectors = model.encode(
+                [texts[i] for i in rows],
+                batch_size=len(rows),
+                convert_to_tensor=False,
+                normalize_embeddings=True,
+            )
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+            out[rows] = vectors
+        return out
+
+
+_encoder_pool = None
+_encoder_pool_lock = threading.Lock()
+
+
+def _get_encoder_pool(workers: int, batch_size: int):
+    """The process-wide EncoderPool, recreated if the requested shape changed."""
+    global _encoder_pool
+    from encoding_pool import EncoderPool
+
+    with _encoder_pool_lock:
+        pool = _encoder_pool
+        if pool is None or pool.workers != workers or pool.batch_size != batch_size:
+            if pool is not None:
+                pool.close()
+            _encoder_pool = pool = EncoderPool(workers, batch_size)
+        return pool
+
+
+def embed_texts_bulk(texts: List[str], workers: Optional[int] = None, batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Normalized embeddings for a large list of texts (cohort plagiarism checks,
+    archive re-grades, calibration). With more than one worker (default
+    ENCODER_WORKERS) and at least ENCODER_POOL_MIN_TEXTS texts the work is
+    sharded across encoder processes pinned to separate cores; otherwise this
+    is _embed_texts.
+    """
+    workers = ENCODER_WORKERS if workers is None else workers
+    if workers <= 1 or len(texts) < ENCODER_POOL_MIN_TEXTS:
+        return _embed_texts(texts)
+    pool = _get_encoder_pool(workers, batch_size)
+    with span("embed_bulk", texts=len(texts), workers=workers):
+        return pool.encode(texts)
 
 
 def _cosine(a, b) -> float:
@@ -46,35 +318,301 @@ def _cosine(a, b) -> float:
     return float(dot / (norm_a * norm_b))
 
 
+class EmbeddingMatrix:
+    """
+    Unit-length embeddings in one contiguous array of `dtype` (one of
+    EMBEDDING_STORAGE_DTYPES). int8 rows carry a float32 scale each: the stored
+    row times its scale is the unit vector the row approximates.
+
+    A matrix can be saved as <path> (.npy) plus <path>.scales.npy and loaded
+    back memory-mapped, so a historical index larger than RAM is paged in as
+    it is compared.
+    """
+
+    def __init__(self, data, scales=None):
+        self.data = data
+        self.scales = scales
+
+    @classmethod
+    def from_vectors(cls, vectors, dtype: Optional[str] = None) -> "EmbeddingMatrix":
+        """Normalize and store `vectors` (any (n, dim) array-like), default dtype EMBEDDING_STORAGE."""
+        import numpy as np
+
+        dtype = dtype or EMBEDDING_STORAGE
+        if dtype not in EMBEDDING_STORAGE_DTYPES:
+            raise ValueError(f"Unknown embedding storage {dtype!r}; use one of {', '.join(EMBEDDING_STORAGE_DTYPES)}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(vectors), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = vectors / np.where(norms == 0, 1.0, norms)
+        if dtype != "int8":
+            return cls(np.ascontiguousarray(unit, dtype=dtype))
+        peaks = np.abs(unit).max(axis=1, initial=0.0, keepdims=True)
+        data = np.rint(unit * (127.0 / np.where(peaks == 0, 1.0, peaks))).astype(np.int8)
+        # Scale so each dequantized row is unit length again.
+        lengths = np.linalg.norm(data.astype(np.float32), axis=1)
+        scales = np.where(lengths == 0, 0.0, 1.0 / np.where(lengths == 0, 1.0, lengths)).astype(np.float32)
+        return cls(data, scales)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], dtype: Optional[str] = None,
+                   chunk_size: int = SIMILARITY_BLOCK_ROWS) -> "EmbeddingMatrix":
+        """Encode `texts` chunk by chunk, so no float32 copy of the whole set is held."""
+        import numpy as np
+
+        chunks = [cls.from_vectors(embed_texts_bulk(texts[start:start + chunk_size]), dtype)
+                  for start in range(0, len(texts), chunk_size)]
+        if not chunks:
+            return cls.from_vectors(np.zeros((0, 0), dtype=np.float32), dtype)
+        data = np.concatenate([c.data for c in chunks])
+        scales = None if chunks[0].scales is None else np.concatenate([c.scales for c in chunks])
+        return cls(data, scales)
+
+    @staticmethod
+    def _scales_path(path: Path) -> Path:
+        return path.with_name(path.name + ".scales.npy")
+
+    def save(self, path) -> None:
+        import numpy as np
+
+        path = Path(path)
+        with open(path, "wb") as f:
+            np.save(f, self.data)
+        scales_path = self._scales_path(path)
+        if self.scales is not None:
+            with open(scales_path, "wb") as f:
+                np.save(f, self.scales)
+        elif scales_path.exists():
+            scales_path.unlink()
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "EmbeddingMatrix":
+        import numpy as np
+
+        path = Path(path)
+        mode = "r" if mmap else None
+        data = np.load(path, mmap_mode=mode)
+        if str(data.dtype) not in EMBEDDING_STORAGE_DTYPES:
+            raise ValueError(f"{path} holds {data.dtype} rows; expected one of {', '.join(EMBEDDING_STORAGE_DTYPES)}")
+        scales = None
+        if data.dtype == np.int8:
+            scales = np.load(cls._scales_path(path), mmap_mode=mode)
+        return cls(data, scales)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def dtype(self) -> str:
+        return str(self.data.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None):
+        """Rows start:stop as a float32 array."""
+        import numpy as np
+
+        block = np.asarray(self.data[start:stop], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[start:stop])[:, None]
+        return block
+
+    def similarities(self, queries):
+        """
+        Cosine similarity of each query (a vector or (q, dim) array) with every
+        row: a (q, len(self)) float32 array, or (len(self),) for one vector.
+        """
+        import numpy as np
+
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = queries.reshape(1, -1) if single else queries
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        out = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SIMILARITY_BLOCK_ROWS):
+            stop = start + SIMILARITY_BLOCK_ROWS
+            block = np.asarray(self.data[start:stop], dtype=np.float32)
+            sims = queries @ block.T
+            if self.scales is not None:
+                sims *= np.asarray(self.scales[start:stop])
+            out[:, start:stop] = sims
+        return out[0] if single else out
+
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_windows(model, text: str, window_tokens: int, max_windows: int = LONG_ANSWER_MAX_WINDOWS) -> List[str]:
+    """
+    Split `text` into windows of whole sentences, each within `window_tokens`
+    tokens (a single longer sentence is cut at word boundaries). Past
+    `max_windows`, evenly spaced windows are kept so the whole answer is sampled.
+    """
+    sentences = [s for s in _SENTENCE_BOUNDARY.split(text.strip()) if s]
+    # _token_lengths counts the two special tokens of each sentence.
+    lengths = [max(1, n - 2) for n in _token_lengths(model, sentences, cap=False)]
+    windows: List[str] = []
+    current: List[str] = []
+    used = 0
+    for sentence, length in zip(sentences, lengths):
+        if current and used + length > window_tokens:
+            windows.append(" ".join(current))
+            current, used = [], 0
+        if length > window_tokens:
+            words = sentence.split()
+            step = max(1, len(words) * window_tokens // length)
+            windows.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+            continue
+        current.append(sentence)
+        used += length
+    if current:
+        windows.append(" ".join(current))
+    if len(windows) > max_windows:
+        stride = len(windows) / max_windows
+        windows = [windows[int(i * stride)] for i in range(max_windows)]
+    return windows
+
+
+@traced()
+def pairwise_semantic_similarities(pairs: List[Tuple[str, List[str]]], pooling: Optional[str] = None,
+                                   embed: Optional[Callable[[List[str]], Any]] = None) -> List[float]:
+    """
+    Best similarity of each (answer, reference answers) pair. Every answer,
+    window and reference is encoded in one `embed` call (default
+    _embed_texts), so many answers share token-budget batches.
+
+    Answers that fit the model are compared whole. Longer ones are split by
+    _split_windows and pooled per `pooling`, one of LONG_ANSWER_POOLINGS
+    (default LONG_ANSWER_POOLING).
+    """
+    pooling = pooling or LONG_ANSWER_POOLING
+    if pooling not in LONG_ANSWER_POOLINGS:
+        raise ValueError(f"Unknown long-answer pooling {pooling!r}; use one of {', '.join(LONG_ANSWER_POOLINGS)}")
+    if not pairs:
+        return []
+
+    model = _get_model()
+    max_tokens = getattr(model, "max_seq_length", None)
+    if pooling == "truncate" or not max_tokens:
+        long_answers = [False] * len(pairs)
+    else:
+        long_answers = [n > max_tokens for n in _token_lengths(model, [a for a, _refs in pairs], cap=False)]
+
+    texts: List[str] = []
+    rows: Dict[str, int] = {}
+
+    def row(text: str) -> int:
+        if text not in rows:
+            rows[text] = len(texts)
+            texts.append(text)
+        return rows[text]
+
+    plans = []
+    for (answer, references), is_long in zip(pairs, long_answers):
+        ref_rows = [row(r) for r in references]
+        if not is_long:
+            plans.append(([row(answer)], ref_rows, None))
+            continue
+        windows = [row(w) for w in _split_windows(model, answer, max_tokens - 2)]
+        sentence_rows = None
+        if pooling == "coverage":
+            sentence_rows = [[row(s) for s in _SENTENCE_BOUNDARY.split(r) if s] or [ref_row]
+                             for r, ref_row in zip(references, ref_rows)]
+        plans.append((windows, ref_rows, sentence_rows))
+
+    embeddings = (embed or _embed_texts)(texts)
+
+    import numpy as np
+
+    with span("similarity", answers=len(pairs)):
+        out = []
+        for (windows, ref_rows, sentence_rows), is_long in zip(plans, long_answers):
+            if not ref_rows:
+                out.append(0.0)
+                continue
+            ref_vecs = [embeddings[i] for i in ref_rows]
+            if not is_long:
+                student_vec = embeddings[windows[0]]
+                out.append(max(_cosine(student_vec, rv) for rv in ref_vecs))
+                continue
+            window_vecs = np.asarray(embeddings[windows], dtype=np.float32)
+            if pooling == "max":
+                best = float((window_vecs @ np.asarray(ref_vecs, dtype=np.float32).T).max())
+            elif pooling == "mean":
+                pooled = window_vecs.mean(axis=0)
+                best = max(_cosine(pooled, rv) for rv in ref_vecs)
+            else:
+                best = max(
+                    float((np.asarray(embeddings[sentences], dtype=np.float32) @ window_vecs.T).max(axis=1).mean())
+                    for sentences in sentence_rows
+                )
+            out.append(best)
+        return out
+
+
+def semantic_similarities(answers: List[str], reference_answers: List[str],
+                          pooling: Optional[str] = None) -> List[float]:
+    """
+    Best similarity of each answer to the same reference answers (a cohort
+    answering one question); see pairwise_semantic_similarities.
+    """
+    if not answers or not reference_answers:
+        return [0.0] * len(answers)
+    return pairwise_semantic_similarities([(a, reference_answers) for a in answers], pooling)
+
+
 # ============================================================================
 # 2. TEXT PREPROCESSING & ANALYSIS
 # ============================================================================
 
 @lru_cache(maxsize=1)
 def _get_tokenizer():
-    """Get the BERT tokenizer for word segmentation."""
+    """
+    Get the BERT tokenizer for word segmentation. Reuses the embedding model's
+    tokenizer when the model is already loaded instead of loading a second copy.
+    """
+    if _get_model.cache_info().currsize:
+        tokenizer = getattr(_get_model(), "tokenizer", None)
+        if tokenizer is not None:
+            return tokenizer
     try:
         from transformers import AutoTokenizer
-        return AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
+        return AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME, use_fast=True)
     except Exception:
         return None
 
 
-def fix_word_spacing_nlp(text: str) -> str:
-    """
-    Use NLP tokenizer to intelligently fix word spacing.
-    The BERT tokenizer knows word boundaries and can segment glued text.
-    """
-    if not text or not text.strip():
-        return text
-    
-    tokenizer = _get_tokenizer()
-    if tokenizer is None:
-        # Fallback to basic spacing if tokenizer not available
-        return text
+# Heuristic patterns for "math-like" spans that must keep their exact spelling:
+# - (cid:*) artifacts from PDF extraction
+# - f(x)=..., scientific notation (2.0×10-12)
+# - operators / symbols (x^2-1, a/b), arrows (R→R)
+_MATH_PATTERN = re.compile(
+    r"(\(cid:\d+\))"                       # PDF artifacts
+    r"|([A-Za-z]\([^)]*\)\s*=\s*[^,\s]+)"   # f(x)=...
+    r"|([0-9]+(?:\.[0-9]+)?\s*[×xX]\s*10\s*[-−]?\s*\d+)"  # 2.0×10-12
+    r"|([A-Za-z0-9]+(?:\^|\*|/|=|\+|[-−])[A-Za-z0-9^*/=+−-]+)"  # x^2-1, a/b, etc.
+    r"|([A-Za-z]\s*[→→\-]\s*[A-Za-z])",     # R→R or R-R (arrow-like)
+    flags=re.UNICODE,
+)
+# Placeholders survive tokenization as one word, but uncased tokenizers lowercase them.
+_MATH_PLACEHOLDER = re.compile(r"mathplaceholder(\d+)", re.IGNORECASE)
+_SPACE_BEFORE_PUNCT = re.compile(r'\s+([.,;:!?)])')
+_SPACE_AFTER_PAREN = re.compile(r'([(])\s+')
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+_spacing_cache = ResultCache(max_entries=SPACING_CACHE_SIZE, ttl_seconds=24 * 3600)
+
 
-    # Protect mathematical / symbolic expressions from being spaced out.
-    # Goal: keep expressions exactly as written (e.g., x^2-1, f(x)=..., (cid:0), 2.0×10-12, R→R).
+def _spacing_key(engine: str, text: str) -> str:
+    return f"{engine}:{_text_digest(text)}"
+
+
+def _protect_math(text: str) -> Tuple[str, List[str]]:
+    """Replace math-like spans with numbered placeholders; returns (text, spans)."""
     math_spans: List[str] = []
 
     def _store_math(m: re.Match) -> str:
@@ -82,53 +620,131 @@ def fix_word_spacing_nlp(text: str) -> str:
         # Use a placeholder unlikely to appear in normal text; avoid punctuation.
         return f" MATHPLACEHOLDER{len(math_spans) - 1} "
 
-    # Heuristic patterns for "math-like" spans.
-    # - Contains common operators/symbols
-    # - Contains (cid:*) artifacts from PDF extraction
-    # - Contains arrows / unicode multiplication
-    math_pattern = re.compile(
-        r"(\(cid:\d+\))"                       # PDF artifacts
-        r"|([A-Za-z]\([^)]*\)\s*=\s*[^,\s]+)"   # f(x)=...
-        r"|([0-9]+(?:\.[0-9]+)?\s*[×xX]\s*10\s*[-−]?\s*\d+)"  # 2.0×10-12
-        r"|([A-Za-z0-9]+(?:\^|\*|/|=|\+|[-−])[A-Za-z0-9^*/=+−-]+)"  # x^2-1, a/b, etc.
-        r"|([A-Za-z]\s*[→→\-]\s*[A-Za-z])",     # R→R or R-R (arrow-like)
-        flags=re.UNICODE,
-    )
+    return _MATH_PATTERN.sub(_store_math, text), math_spans
 
-    protected = math_pattern.sub(_store_math, text)
-    
-    try:
-        # Tokenize the text - BERT tokenizer handles subword tokenization
-        tokens = tokenizer.tokenize(protected)
-        
-        # Reconstruct with proper spacing
-        # BERT uses ## prefix for continuation tokens
-        result_parts = []
-        for token in tokens:
-            if token.startswith('##'):
-                # This is a continuation of the previous word
-                result_parts.append(token[2:])
-            else:
-                # New word - add space before (except for first)
-                if result_parts:
-                    result_parts.append(' ')
-                result_parts.append(token)
-        
-        result = ''.join(result_parts)
-        
-        # Clean up: fix spacing around punctuation
-        result = re.sub(r'\s+([.,;:!?)])', r'\1', result)  # no space before punctuation
-        result = re.sub(r'([(])\s+', r'\1', result)        # no space after opening paren
-        result = re.sub(r'\s+', ' ', result).strip()       # collapse spaces
-
-        # Restore protected math spans exactly as they were.
-        for i, span in enumerate(math_spans):
-            result = result.replace(f"MATHPLACEHOLDER{i}", span)
-        
-        return result
-    except Exception:
+
+def _restore_math(text: str, math_spans: List[str]) -> str:
+    """Put the protected spans back in one pass over the text."""
+    if not math_spans:
         return text
 
+    def _span(m: re.Match) -> str:
+        index = int(m.group(1))
+        return math_spans[index] if index < len(math_spans) else m.group(0)
+
+    return _MATH_PLACEHOLDER.sub(_span, text)
+
+
+def _join_wordpieces(tokens: List[str]) -> str:
+    """Rebuild text from WordPiece tokens: "##" marks a continuation of the previous word."""
+    result_parts = []
+    for token in tokens:
+        if token.startswith('##'):
+            result_parts.append(token[2:])
+        else:
+            if result_parts:
+                result_parts.append(' ')
+            result_parts.append(token)
+    result = ''.join(result_parts)
+
+    # Clean up: fix spacing around punctuation
+    result = _SPACE_BEFORE_PUNCT.sub(r'\1', result)  # no space before punctuation
+    result = _SPACE_AFTER_PAREN.sub(r'\1', result)   # no space after opening paren
+    return _WHITESPACE_RUN.sub(' ', result).strip()   # collapse spaces
+
+
+def _tokenize_batch(tokenizer, texts: List[str]) -> List[List[str]]:
+    """WordPiece tokens for each text; one call for fast (Rust) tokenizers."""
+    if getattr(tokenizer, "is_fast", False):
+        encoded = tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        return [encoded.tokens(i) for i in range(len(texts))]
+    return [tokenizer.tokenize(text) for text in texts]
+
+
+def _segment_spacing(text: str) -> str:
+    """Dictionary (word_segmenter) engine for fix_word_spacing_batch."""
+    from word_segmenter import segment_text
+
+    protected, math_spans = _protect_math(text)
+    result = _SPACE_BEFORE_PUNCT.sub(r'\1', segment_text(protected))
+    return _restore_math(_WHITESPACE_RUN.sub(' ', result).strip(), math_spans)
+
+
+@traced()
+def fix_word_spacing_batch(texts: List[Any], engine: Optional[str] = None) -> List[Any]:
+    """
+    Fix word spacing for many texts. Non-string and blank entries are returned
+    unchanged; repeated texts (within the batch or seen recently) are fixed once.
+
+    `engine` is one of SPACING_ENGINES (default SPACING_ENGINE).
+    """
+    engine = engine or SPACING_ENGINE
+    if engine not in SPACING_ENGINES:
+        raise ValueError(f"Unknown spacing engine {engine!r}; use one of {', '.join(SPACING_ENGINES)}")
+
+    results = list(texts)
+    pending: Dict[str, List[int]] = {}
+    for index, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
+            continue
+        cached = _spacing_cache.get(_spacing_key(engine, text))
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.setdefault(text, []).append(index)
+    if not pending:
+        return results
+
+    if engine == "segmenter":
+        for count, text in enumerate(pending):
+            if count % SPACING_BATCH_SIZE == 0:
+                check_cancelled()
+            fixed = _segment_spacing(text)
+            _spacing_cache.put(_spacing_key(engine, text), fixed)
+            for index in pending[text]:
+                results[index] = fixed
+        return results
+
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        # Fallback to basic spacing if tokenizer not available
+        return results
+
+    unique = list(pending)
+    for start in range(0, len(unique), SPACING_BATCH_SIZE):
+        check_cancelled()
+        chunk = unique[start:start + SPACING_BATCH_SIZE]
+        protected = [_protect_math(text) for text in chunk]
+        try:
+            with span("tokenize", texts=len(chunk)):
+                token_lists = _tokenize_batch(tokenizer, [p for p, _spans in protected])
+        except Exception:
+            continue
+        for text, (_p, math_spans), tokens in zip(chunk, protected, token_lists):
+            fixed = _restore_math(_join_wordpieces(tokens), math_spans)
+            _spacing_cache.put(_spacing_key(engine, text), fixed)
+            for index in pending[text]:
+                results[index] = fixed
+    return results
+
+
+@traced()
+def fix_word_spacing_nlp(text: str, engine: Optional[str] = None) -> str:
+    """
+    Use NLP tokenizer to intelligently fix word spacing.
+    The BERT tokenizer knows word boundaries and can segment glued text.
+    With engine="segmenter" a word-frequency dictionary is used instead.
+    """
+    if not text or not text.strip():
+        return text
+    return fix_word_spacing_batch([text], engine=engine)[0]
+
 
 def preprocess_text(text: str) -> str:
     """
@@ -144,91 +760,162 @@ def preprocess_text(text: str) -> str:
     return text
 
 
+# Patterns for the text analysis pass, compiled once.
+_SENTENCE_END = re.compile(r'[.!?]+')
+_NON_WORD_CHARS = re.compile(r'[^\w\s]')
+_WEB_INDICATOR_PATTERN = re.compile(
+    r'(?P<url>https?://|www\.|\.com|\.org|\.edu)'
+    r'|(?P<citation>\[\d+\]|\(\d{4}\)|\bet al\b)'
+    r'|(?P<wiki>\[edit\]|\[citation needed\])'
+    r'|(?P<bullet>^\s*[-•]\s)',
+    re.IGNORECASE | re.MULTILINE,
+)
+_WEB_INDICATOR_MESSAGES = {
+    "url": "Contains URL fragments",
+    "citation": "Contains citation-like markers",
+    "wiki": "Contains Wikipedia-style markers",
+    "bullet": "Contains bullet points (possible copy-paste)",
+}
+
+
+class TextAnalysis:
+    """
+    One answer tokenized once. The grammar, mandatory-term and web-indicator
+    checks all read from the same word / sentence split instead of each
+    re-scanning the text.
+    """
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        self.lowered = self.text.lower()
+        self.words = self.text.split()
+        self.sentences = _SENTENCE_END.split(self.text)
+        self._tokens: Optional[List[str]] = None
+
+    def grammar(self, min_words: int = 10, max_words: int = 1000) -> Dict[str, Any]:
+        """Length, capitalization, repetition and sentence-length checks."""
+        issues = []
+        warnings = []
+
+        word_count = len(self.words)
+        # split() yields one more part than there are sentence terminators.
+        sentence_count = (len(self.sentences) - 1) or 1
+        avg_sentence_length = word_count / sentence_count
+
+        # Length checks
+        if word_count < min_words:
+            issues.append(f"Answer too short ({word_count} words, minimum {min_words} expected)")
+        elif word_count > max_words:
+            warnings.append(f"Answer quite long ({word_count} words)")
+
+        # Basic grammar checks
+        for sent in self.sentences:
+            sent = sent.strip()
+            if sent and sent[0].islower():
+                warnings.append("Some sentences don't start with capital letters")
+                break
+
+        # Check for repeated words (potential copy-paste or filler); short words are ignored.
+        word_freq: Dict[str, int] = {}
+        for w in _NON_WORD_CHARS.sub('', self.lowered).split():
+            if len(w) > 3:
+                word_freq[w] = word_freq.get(w, 0) + 1
+
+        for word, count in word_freq.items():
+            if count > 5 and count / word_count > 0.1:
+                warnings.append(f"Word '{word}' repeated excessively ({count} times)")
+
+        # Check for very short sentences
+        short_sentences = sum(1 for s in self.sentences if len(s.split()) < 3 and s.strip())
+        if short_sentences > 2:
+            warnings.append("Multiple very short/incomplete sentences detected")
+
+        return {
+            "word_count": word_count,
+            "sentence_count": sentence_count,
+            "avg_sentence_length": round(avg_sentence_length, 1),
+            "issues": issues,
+            "warnings": warnings,
+            "passed": len(issues) == 0
+        }
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._tokens is None:
+            self._tokens = tokenize_terms(self.lowered)
+        return self._tokens
+
+    def terms(self, mandatory_terms: List[Any]) -> Dict[str, Any]:
+        """
+        Which mandatory terms (or their plural / stem / synonym variants) occur
+        as whole words, via the question's compiled term matcher.
+        """
+        return compile_terms(mandatory_terms).check(tokens=self.tokens)
+
+    def web_indicators(self) -> Dict[str, Any]:
+        """URL, citation, Wikipedia and bullet-point markers, found in one regex scan."""
+        kinds = set()
+        for m in _WEB_INDICATOR_PATTERN.finditer(self.text):
+            kinds.add(m.lastgroup)
+            if len(kinds) == len(_WEB_INDICATOR_MESSAGES):
+                break
+        indicators = [message for kind, message in _WEB_INDICATOR_MESSAGES.items() if kind in kinds]
+        return {
+            "has_indicators": len(indicators) > 0,
+            "indicators": indicators
+        }
+
+
+@traced()
+def analyze_text(
+    text: str,
+    min_words: int = 10,
+    max_words: int = 1000,
+    mandatory_terms: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Run the grammar/length, mandatory-term and web-indicator checks over one
+    tokenization of `text`. Returns {"grammar": ..., "terms": ... or None,
+    "web_indicators": ...} with the same dicts as the individual functions.
+    """
+    analysis = TextAnalysis(text)
+    return {
+        "grammar": analysis.grammar(min_words, max_words),
+        "terms": analysis.terms(mandatory_terms) if mandatory_terms else None,
+        "web_indicators": analysis.web_indicators(),
+    }
+
+
+@traced()
 def analyze_grammar_and_length(text: str, min_words: int = 10, max_words: int = 1000) -> Dict[str, Any]:
     """
     Analyze text for grammar issues and length constraints.
     Returns analysis dict with issues found.
     """
-    issues = []
-    warnings = []
-    
-    words = text.split()
-    word_count = len(words)
-    sentence_count = len(re.findall(r'[.!?]+', text)) or 1
-    avg_sentence_length = word_count / sentence_count
-    
-    # Length checks
-    if word_count < min_words:
-        issues.append(f"Answer too short ({word_count} words, minimum {min_words} expected)")
-    elif word_count > max_words:
-        warnings.append(f"Answer quite long ({word_count} words)")
-    
-    # Basic grammar checks
-    sentences = re.split(r'[.!?]+', text)
-    for sent in sentences:
-        sent = sent.strip()
-        if sent and sent[0].islower():
-            warnings.append("Some sentences don't start with capital letters")
-            break
-    
-    # Check for repeated words (potential copy-paste or filler)
-    word_freq = {}
-    for w in words:
-        w_clean = re.sub(r'[^\w]', '', w.lower())
-        if len(w_clean) > 3:  # ignore short words
-            word_freq[w_clean] = word_freq.get(w_clean, 0) + 1
-    
-    for word, count in word_freq.items():
-        if count > 5 and count / word_count > 0.1:
-            warnings.append(f"Word '{word}' repeated excessively ({count} times)")
-    
-    # Check for very short sentences
-    short_sentences = sum(1 for s in sentences if len(s.split()) < 3 and s.strip())
-    if short_sentences > 2:
-        warnings.append("Multiple very short/incomplete sentences detected")
-    
-    return {
-        "word_count": word_count,
-        "sentence_count": sentence_count,
-        "avg_sentence_length": round(avg_sentence_length, 1),
-        "issues": issues,
-        "warnings": warnings,
-        "passed": len(issues) == 0
-    }
+    return TextAnalysis(text).grammar(min_words, max_words)
 
 
-def check_mandatory_terms(text: str, mandatory_terms: List[str]) -> Dict[str, Any]:
+@traced()
+def check_mandatory_terms(text: str, mandatory_terms: List[Any]) -> Dict[str, Any]:
     """
     Check if mandatory terms/concepts are present in the answer.
+    Terms may list alternatives ("CPU|processor") or be {"term": ..., "synonyms": [...]};
+    plurals and simple stems match too (see term_matcher).
     Returns dict with found/missing terms.
     """
-    text_lower = preprocess_text(text)
-    found = []
-    missing = []
-    
-    for term in mandatory_terms:
-        term_lower = term.lower().strip()
-        # Check for term or close variations
-        if term_lower in text_lower or re.search(rf'\b{re.escape(term_lower)}\b', text_lower):
-            found.append(term)
-        else:
-            missing.append(term)
-    
-    return {
-        "found_terms": found,
-        "missing_terms": missing,
-        "coverage": len(found) / len(mandatory_terms) if mandatory_terms else 1.0
-    }
+    return TextAnalysis(text).terms(mandatory_terms)
 
 
 # ============================================================================
 # 3. PLAGIARISM DETECTION
 # ============================================================================
 
+@traced()
 def detect_plagiarism(
     student_answer: str,
     other_answers: List[str],
-    threshold: float = 0.92
+    threshold: float = DEFAULT_PLAGIARISM_THRESHOLD,
+    other_embeddings: Optional[EmbeddingMatrix] = None
 ) -> Dict[str, Any]:
     """
     Detect potential plagiarism by comparing student answer against other submissions.
@@ -238,28 +925,32 @@ def detect_plagiarism(
         student_answer: The answer to check
         other_answers: List of other student answers to compare against
         threshold: Similarity threshold above which plagiarism is flagged (0.92 = very similar)
+        other_embeddings: Optional EmbeddingMatrix of the other answers (e.g. a
+            memory-mapped index of past submissions); other_answers is then not encoded
     
     Returns:
         Dict with plagiarism detection results
     """
-    if not student_answer or not other_answers:
-        return {"is_plagiarized": False, "max_similarity": 0.0, "similar_indices": []}
-    
-    texts = [student_answer] + other_answers
-    embeddings = _embed_texts(texts)
-    student_vec = embeddings[0]
-    other_vecs = embeddings[1:]
-    
-    similarities = []
-    similar_indices = []
-    
-    for i, other_vec in enumerate(other_vecs):
-        sim = _cosine(student_vec, other_vec)
-        similarities.append(sim)
-        if sim >= threshold:
-            similar_indices.append({"index": i, "similarity": round(sim, 3)})
+    if other_embeddings is None:
+        if not student_answer or not other_answers:
+            return {"is_plagiarized": False, "max_similarity": 0.0, "similar_indices": []}
+        embeddings = _embed_texts([student_answer] + other_answers)
+        student_vec = embeddings[0]
+        other_embeddings = EmbeddingMatrix.from_vectors(embeddings[1:])
+    else:
+        if not student_answer or not len(other_embeddings):
+            return {"is_plagiarized": False, "max_similarity": 0.0, "similar_indices": []}
+        student_vec = _embed_texts([student_answer])[0]
+
+    import numpy as np
+
+    similarities = other_embeddings.similarities(student_vec)
+    similar_indices = [
+        {"index": int(i), "similarity": round(float(similarities[i]), 3)}
+        for i in np.flatnonzero(similarities >= threshold)
+    ]
     
-    max_sim = max(similarities) if similarities else 0.0
+    max_sim = float(similarities.max()) if len(similarities) else 0.0
     
     return {
         "is_plagiarized": max_sim >= threshold,
@@ -269,33 +960,13 @@ def detect_plagiarism(
     }
 
 
+@traced()
 def detect_web_plagiarism_indicators(text: str) -> Dict[str, Any]:
     """
     Detect indicators that text might be copied from web sources.
     (Basic heuristic checks - not actual web search)
     """
-    indicators = []
-    
-    # Check for URL remnants
-    if re.search(r'https?://|www\.|\.com|\.org|\.edu', text, re.I):
-        indicators.append("Contains URL fragments")
-    
-    # Check for citation markers without actual citations
-    if re.search(r'\[\d+\]|\(\d{4}\)|\bet al\b', text, re.I):
-        indicators.append("Contains citation-like markers")
-    
-    # Check for Wikipedia-style formatting
-    if re.search(r'\[edit\]|\[citation needed\]', text, re.I):
-        indicators.append("Contains Wikipedia-style markers")
-    
-    # Check for unusual formatting
-    if re.search(r'^\s*[-•]\s', text, re.MULTILINE):
-        indicators.append("Contains bullet points (possible copy-paste)")
-    
-    return {
-        "has_indicators": len(indicators) > 0,
-        "indicators": indicators
-    }
+    return TextAnalysis(text).web_indicators()
 
 
 # ============================================================================
@@ -320,11 +991,7 @@ def calculate_hybrid_score(
     Returns (final_score, list of deductions/adjustments made)
     """
     if weights is None:
-        weights = {
-            "semantic": 0.7,      # 70% weight on meaning
-            "terms": 0.2,         # 20% weight on key terms
-            "grammar": 0.1        # 10% weight on grammar/length
-        }
+        weights = DEFAULT_HYBRID_WEIGHTS
     
     adjustments = []
     
@@ -419,7 +1086,21 @@ def generate_detailed_feedback(
 # 6. MAIN GRADING FUNCTION (ENHANCED)
 # ============================================================================
 
-def grade_answer(
+def _grading_details(score: float, feedback: str, similarity: float,
+                     term_check: Optional[Dict[str, Any]] = None,
+                     grammar_analysis: Optional[Dict[str, Any]] = None,
+                     plagiarism: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "score": score,
+        "feedback": feedback,
+        "similarity": similarity,
+        "term_check": term_check,
+        "grammar_analysis": grammar_analysis,
+        "plagiarism": plagiarism,
+    }
+
+
+def grade_answer_details(
     student_answer: str,
     reference_answers: List[str],
     max_points: float,
@@ -428,10 +1109,13 @@ def grade_answer(
     min_words: int = 10,
     max_words: int = 1000,
     enable_plagiarism_check: bool = True,
-    enable_grammar_check: bool = True
-) -> Tuple[float, str, float]:
+    enable_grammar_check: bool = True,
+    other_embeddings: Optional[EmbeddingMatrix] = None
+) -> Dict[str, Any]:
     """
-    Grade a single descriptive/essay answer using hybrid NLP + rule-based approach.
+    grade_answer, also returning the analyses the score was built from: a dict
+    with score, feedback, similarity, term_check, grammar_analysis and
+    plagiarism (the last three are None when the answer or reference is empty).
     
     Args:
         student_answer: The student's answer text
@@ -443,53 +1127,49 @@ def grade_answer(
         max_words: Maximum word count expected
         enable_plagiarism_check: Whether to check for plagiarism
         enable_grammar_check: Whether to check grammar/length
-    
-    Returns:
-        Tuple of (score, feedback, similarity)
+        other_embeddings: Optional EmbeddingMatrix of other submissions, used for
+            the plagiarism check instead of encoding other_student_answers
     """
     student_answer = (student_answer or "").strip()
     if not student_answer:
-        return 0.0, "No answer provided.", 0.0
+        return _grading_details(0.0, "No answer provided.", 0.0)
 
     clean_refs = [r.strip() for r in reference_answers or [] if r and r.strip()]
     if not clean_refs:
-        return 0.0, "No reference answer configured for this question.", 0.0
+        return _grading_details(0.0, "No reference answer configured for this question.", 0.0)
 
-    # 1. Compute semantic similarity
-    texts = [student_answer] + clean_refs
-    embeddings = _embed_texts(texts)
-    student_vec = embeddings[0]
-    ref_vecs = embeddings[1:]
+    # 1. Compute semantic similarity (long answers are windowed, see semantic_similarities)
+    best_sim = semantic_similarities([student_answer], clean_refs)[0]
 
-    sims = [_cosine(student_vec, rv) for rv in ref_vecs]
-    best_sim = max(sims) if sims else 0.0
+    # 2-3. Grammar/length and mandatory terms, from a single pass over the answer
+    with span("text_analysis"):
+        analysis = TextAnalysis(student_answer)
+        if enable_grammar_check:
+            grammar_analysis = analysis.grammar(min_words, max_words)
+        else:
+            grammar_analysis = {"passed": True, "issues": [], "warnings": [], "word_count": len(analysis.words)}
 
-    # 2. Grammar and length analysis
-    if enable_grammar_check:
-        grammar_analysis = analyze_grammar_and_length(student_answer, min_words, max_words)
-    else:
-        grammar_analysis = {"passed": True, "issues": [], "warnings": [], "word_count": len(student_answer.split())}
-    
-    # 3. Mandatory terms check
-    if mandatory_terms:
-        term_check = check_mandatory_terms(student_answer, mandatory_terms)
-    else:
-        term_check = {"found_terms": [], "missing_terms": [], "coverage": 1.0}
+        if mandatory_terms:
+            term_check = analysis.terms(mandatory_terms)
+        else:
+            term_check = {"found_terms": [], "missing_terms": [], "coverage": 1.0}
+        web_plag = analysis.web_indicators()
     
     # 4. Plagiarism detection
-    if enable_plagiarism_check and other_student_answers:
+    if enable_plagiarism_check and other_embeddings is not None:
+        plagiarism_result = detect_plagiarism(student_answer, [], other_embeddings=other_embeddings)
+    elif enable_plagiarism_check and other_student_answers:
         plagiarism_result = detect_plagiarism(student_answer, other_student_answers)
     else:
         plagiarism_result = {"is_plagiarized": False, "max_similarity": 0.0}
     
-    # Also check for web plagiarism indicators
-    web_plag = detect_web_plagiarism_indicators(student_answer)
+    # Also report web plagiarism indicators
     if web_plag["has_indicators"]:
         plagiarism_result["web_indicators"] = web_plag["indicators"]
     
     # 5. Calculate semantic base score
-    min_sim = 0.4
-    max_sim = 0.9
+    min_sim = SEMANTIC_MIN_SIM
+    max_sim = SEMANTIC_MAX_SIM
     if best_sim <= min_sim:
         semantic_ratio = 0.0
     elif best_sim >= max_sim:
@@ -500,31 +1180,105 @@ def grade_answer(
     semantic_score = max_points * semantic_ratio
     
     # 6. Calculate hybrid score
-    final_score, adjustments = calculate_hybrid_score(
-        semantic_score=semantic_score,
-        grammar_analysis=grammar_analysis,
-        term_coverage=term_check["coverage"],
-        plagiarism_result=plagiarism_result,
-        max_points=max_points
-    )
+    with span("hybrid_score"):
+        final_score, adjustments = calculate_hybrid_score(
+            semantic_score=semantic_score,
+            grammar_analysis=grammar_analysis,
+            term_coverage=term_check["coverage"],
+            plagiarism_result=plagiarism_result,
+            max_points=max_points
+        )
     
     # 7. Generate detailed feedback
-    feedback = generate_detailed_feedback(
-        similarity=best_sim,
-        grammar_analysis=grammar_analysis,
-        term_check=term_check,
-        plagiarism_result=plagiarism_result,
-        adjustments=adjustments
-    )
+    with span("feedback"):
+        feedback = generate_detailed_feedback(
+            similarity=best_sim,
+            grammar_analysis=grammar_analysis,
+            term_check=term_check,
+            plagiarism_result=plagiarism_result,
+            adjustments=adjustments
+        )
     
-    return final_score, feedback, best_sim
+    return _grading_details(final_score, feedback, best_sim, term_check, grammar_analysis, plagiarism_result)
+
+
+@traced()
+def grade_answer(
+    student_answer: str,
+    reference_answers: List[str],
+    max_points: float,
+    mandatory_terms: Optional[List[str]] = None,
+    other_student_answers: Optional[List[str]] = None,
+    min_words: int = 10,
+    max_words: int = 1000,
+    enable_plagiarism_check: bool = True,
+    enable_grammar_check: bool = True,
+    other_embeddings: Optional[EmbeddingMatrix] = None
+) -> Tuple[float, str, float]:
+    """
+    Grade a single descriptive/essay answer using hybrid NLP + rule-based approach.
+    See grade_answer_details for the arguments.
+
+    Returns:
+        Tuple of (score, feedback, similarity)
+    """
+    details = grade_answer_details(
+        student_answer=student_answer,
+        reference_answers=reference_answers,
+        max_points=max_points,
+        mandatory_terms=mandatory_terms,
+        other_student_answers=other_student_answers,
+        min_words=min_words,
+        max_words=max_words,
+        enable_plagiarism_check=enable_plagiarism_check,
+        enable_grammar_check=enable_grammar_check,
+        other_embeddings=other_embeddings
+    )
+    return details["score"], details["feedback"], details["similarity"]
+
+
+def normalize_essay_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply grade-essay defaults; the result is both the grading input and the cache key payload."""
+    return {
+        "studentAnswer": (payload.get("studentAnswer") or "").strip(),
+        "referenceAnswers": payload.get("referenceAnswers") or [],
+        "maxPoints": float(payload.get("maxPoints") or 0),
+        "mandatoryTerms": payload.get("mandatoryTerms") or [],
+        "otherAnswers": payload.get("otherAnswers") or [],
+        "minWords": int(payload.get("minWords") or 10),
+        "maxWords": int(payload.get("maxWords") or 1000),
+    }
+
+
+def grade_essay_request(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Grade one normalized grade-essay request; returns (response_dict, status)."""
+    try:
+        score, feedback, similarity = grade_answer(
+            student_answer=request["studentAnswer"],
+            reference_answers=request["referenceAnswers"],
+            max_points=request["maxPoints"],
+            mandatory_terms=request["mandatoryTerms"] or None,
+            other_student_answers=request["otherAnswers"] or None,
+            min_words=request["minWords"],
+            max_words=request["maxWords"],
+            enable_plagiarism_check=bool(request["otherAnswers"]),
+            enable_grammar_check=True
+        )
+    except RuntimeError as e:
+        return {"success": False, "message": str(e)}, 500
+    return {
+        "success": True,
+        "score": score,
+        "similarity": similarity,
+        "feedback": feedback,
+    }, 200
 
 
 # ============================================================================
 # 7. MODEL FINE-TUNING SUPPORT (DATA COLLECTION)
 # ============================================================================
 
-TRAINING_DATA_FILE = Path(__file__).parent / "grading_training_data.json"
+TRAINING_DATA_FILE = LOG_FILE
 
 
 def save_grading_example(
@@ -533,11 +1287,19 @@ def save_grading_example(
     reference_answers: List[str],
     ai_score: float,
     teacher_score: float,
-    teacher_feedback: str
+    teacher_feedback: str,
+    question_id: Optional[str] = None,
+    exam_id: Optional[str] = None,
+    teacher_id: Optional[str] = None,
+    max_points: Optional[float] = None,
+    mandatory_terms: Optional[List[Any]] = None
 ):
     """
     Save a grading example for future model fine-tuning.
     Collects cases where teacher adjusted the AI score.
+    Appends one line to the training log; returns the total number of examples.
+    The optional ids feed the per-question / exam / teacher grading patterns;
+    max_points and mandatory_terms let calibration.py replay the AI score.
     """
     example = {
         "question": question,
@@ -548,58 +1310,74 @@ def save_grading_example(
         "teacher_feedback": teacher_feedback,
         "score_difference": teacher_score - ai_score
     }
-    
-    # Load existing data
-    data = []
-    if TRAINING_DATA_FILE.exists():
-        try:
-            with open(TRAINING_DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            data = []
-    
-    data.append(example)
-    
-    # Save updated data
-    with open(TRAINING_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    return len(data)
+    for field, value in (("question_id", question_id), ("exam_id", exam_id), ("teacher_id", teacher_id)):
+        if value:
+            example[field] = value
+    if max_points:
+        example["max_points"] = max_points
+    if mandatory_terms:
+        example["mandatory_terms"] = mandatory_terms
+    return get_training_log().append(example)
 
 
-def get_training_data() -> List[Dict[str, Any]]:
-    """Load collected training data for analysis or fine-tuning."""
-    if not TRAINING_DATA_FILE.exists():
-        return []
-    try:
-        with open(TRAINING_DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return []
+def iter_training_data() -> Iterator[Dict[str, Any]]:
+    """Stream collected training data, oldest first, without loading it all."""
+    return iter(get_training_log())
+
 
+def get_training_data(limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+    """One page of collected training data: {items, total, limit, offset}."""
+    return get_training_log().page(limit, offset)
 
-def analyze_grading_patterns() -> Dict[str, Any]:
+
+def _pattern_summary(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    avg_diff = bucket["mean"]
+    return {
+        "total_examples": bucket["count"],
+        "average_score_difference": round(avg_diff, 2),
+        "score_difference_variance": round(bucket["m2"] / bucket["count"], 4),
+        "teacher_scored_higher": bucket["higher"],
+        "teacher_scored_lower": bucket["lower"],
+        "similar_scores": bucket["similar"],
+        "recommendation": "Consider adjusting thresholds" if abs(avg_diff) > 0.5 else "Current thresholds seem appropriate"
+    }
+
+
+def analyze_grading_patterns(
+    question_id: Optional[str] = None,
+    exam_id: Optional[str] = None,
+    teacher_id: Optional[str] = None,
+    group_by: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Analyze collected grading data to understand teacher patterns.
     Useful for adjusting scoring thresholds.
+
+    Reads the running summaries kept by the training log, so the cost does not
+    depend on how many examples were collected. At most one of question_id,
+    exam_id and teacher_id narrows the summary to that question, exam or teacher;
+    group_by ("question", "exam" or "teacher") adds a summary per group.
+    Raises ValueError for more than one filter or an unknown group_by.
     """
-    data = get_training_data()
-    if not data:
+    filters = [(group, key) for group, key in
+               (("question", question_id), ("exam", exam_id), ("teacher", teacher_id)) if key]
+    if len(filters) > 1:
+        raise ValueError("Filter by only one of questionId, examId and teacherId")
+    if group_by is not None and group_by not in PATTERN_GROUPS.values():
+        raise ValueError(f"groupBy must be one of {', '.join(PATTERN_GROUPS.values())}")
+
+    patterns = get_training_log().patterns()
+    bucket = patterns[filters[0][0]].get(str(filters[0][1])) if filters else patterns["overall"]
+    if not bucket or not bucket["count"]:
         return {"message": "No training data collected yet."}
-    
-    diffs = [d["score_difference"] for d in data]
-    avg_diff = sum(diffs) / len(diffs)
-    
-    # Cases where teacher gave higher/lower scores
-    teacher_higher = sum(1 for d in diffs if d > 0.1)
-    teacher_lower = sum(1 for d in diffs if d < -0.1)
-    similar = len(diffs) - teacher_higher - teacher_lower
-    
-    return {
-        "total_examples": len(data),
-        "average_score_difference": round(avg_diff, 2),
-        "teacher_scored_higher": teacher_higher,
-        "teacher_scored_lower": teacher_lower,
-        "similar_scores": similar,
-        "recommendation": "Consider adjusting thresholds" if abs(avg_diff) > 0.5 else "Current thresholds seem appropriate"
-    }
+
+    analysis = _pattern_summary(bucket)
+    if group_by is not None:
+        analysis["groups"] = {key: _pattern_summary(b) for key, b in patterns[group_by].items()}
+    return analysis
+
+
+if __name__ == "__main__":
+    # python -m nlp_grader: bulk-grade JSONL requests (see bulk_grading.py)
+    from bulk_grading import main
+    sys.exit(main("essay"))
@@ -253,10 +253,8 @@ function saveResults() {
         gradingMethod: 'ocr'
     };
     
-    // Save to results
-    const results = getResults();
-    results.push(result);
-    saveResults(results);
+    // Save to results (storage.js; this file's saveResults shadows the global one)
+    addResult(result);
     
     showAlert('Results saved successfully!', 'success');
 }
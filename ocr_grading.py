@@ -13,6 +13,7 @@ This module handles:
 import re
 import json
 import os
+import sys
 from typing import List, Dict, Any, Tuple, Optional
 from pathlib import Path
 import tempfile
@@ -34,25 +35,30 @@ except ImportError:
     Image = None
 
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
     PDF2IMAGE_AVAILABLE = True
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
     convert_from_path = None
+    pdfinfo_from_path = None
 
 # Import NLP grader for semantic comparison
 from nlp_grader import (
-    grade_answer,
+    grade_answer_details,
     analyze_grammar_and_length,
-    check_mandatory_terms,
     preprocess_text
 )
+from tracing import span, traced
+from cancellation import check_cancelled
 
 
 # ============================================================================
 # 1. OCR TEXT EXTRACTION
 # ============================================================================
 
+PAGE_BREAK = '\n\n--- PAGE BREAK ---\n\n'
+
+
 def extract_text_from_image(image_path: str, lang: str = 'eng') -> Tuple[str, float]:
     """
     Extract text from an image using Tesseract OCR.
@@ -71,7 +77,8 @@ def extract_text_from_image(image_path: str, lang: str = 'eng') -> Tuple[str, fl
         
         # Get OCR data with confidence scores
         try:
-            ocr_data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+            with span("tesseract", lang=lang):
+                ocr_data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
         except pytesseract.TesseractNotFoundError:
             raise RuntimeError(
                 "Tesseract OCR binary not found. Please install Tesseract OCR:\n"
@@ -100,12 +107,25 @@ def extract_text_from_image(image_path: str, lang: str = 'eng') -> Tuple[str, fl
         raise RuntimeError(f"OCR extraction failed: {str(e)}")
 
 
-def extract_text_from_pdf(pdf_path: str, lang: str = 'eng') -> Tuple[str, float, List[str]]:
+def _iter_pdf_page_images(pdf_path: str, dpi: int = 300):
     """
-    Extract text from PDF by converting pages to images and running OCR.
-    
-    Returns:
-        (combined_text, average_confidence, list_of_page_texts)
+    Render a PDF one page at a time, yielding (page_number, image).
+    Only one rendered page is held in memory, and the caller can stop
+    (e.g. on cancellation) without rendering the remaining pages.
+    """
+    page_count = int(pdfinfo_from_path(pdf_path).get("Pages", 0))
+    for page_num in range(1, page_count + 1):
+        check_cancelled()
+        with span("pdf_render", page=page_num, dpi=dpi):
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)
+        for img in images:
+            yield page_num, img
+
+
+def iter_pdf_page_texts(pdf_path: str, lang: str = 'eng'):
+    """
+    OCR a PDF page by page, yielding (page_number, text, confidence) as soon
+    as each page is done. Checks for cancellation between pages.
     """
     if not PDF2IMAGE_AVAILABLE:
         raise RuntimeError(
@@ -113,32 +133,42 @@ def extract_text_from_pdf(pdf_path: str, lang: str = 'eng') -> Tuple[str, float,
             "pip install pdf2image"
         )
     
-    try:
-        # Convert PDF pages to images
-        images = convert_from_path(pdf_path, dpi=300)
-        
-        all_texts = []
-        all_confidences = []
-        page_texts = []
-        
-        for page_num, img in enumerate(images):
-            # Save temporary image
+    for page_num, img in _iter_pdf_page_images(pdf_path, dpi=300):
+        # Save temporary image
+        with span("save_page_image", page=page_num):
             with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
                 tmp_path = tmp.name
                 img.save(tmp_path, 'PNG')
-            
-            try:
+        
+        try:
+            with span("ocr_page", page=page_num):
                 text, confidence = extract_text_from_image(tmp_path, lang)
-                all_texts.append(text)
-                all_confidences.append(confidence)
-                page_texts.append(text)
-            finally:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
+        finally:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        
+        yield page_num, text, confidence
+
+
+def extract_text_from_pdf(pdf_path: str, lang: str = 'eng') -> Tuple[str, float, List[str]]:
+    """
+    Extract text from PDF by converting pages to images and running OCR.
+    Checks for cancellation between pages.
+    
+    Returns:
+        (combined_text, average_confidence, list_of_page_texts)
+    """
+    try:
+        page_texts = []
+        all_confidences = []
+        
+        for _page_num, text, confidence in iter_pdf_page_texts(pdf_path, lang):
+            page_texts.append(text)
+            all_confidences.append(confidence)
         
-        combined_text = '\n\n--- PAGE BREAK ---\n\n'.join(all_texts)
+        combined_text = PAGE_BREAK.join(page_texts)
         avg_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
         
         return combined_text, avg_confidence, page_texts
@@ -171,6 +201,7 @@ def extract_text_from_file(file_path: str, lang: str = 'eng') -> Tuple[str, floa
 # 2. TEXT CLEANING AND NORMALIZATION
 # ============================================================================
 
+@traced()
 def clean_ocr_text(text: str) -> str:
     """
     Clean and normalize OCR-extracted text:
@@ -237,6 +268,7 @@ def normalize_text(text: str) -> str:
 # 3. QUESTION SEGMENTATION
 # ============================================================================
 
+@traced()
 def segment_answers_by_questions(text: str, question_count: int) -> Dict[int, str]:
     """
     Segment extracted text into question-wise answers.
@@ -305,6 +337,7 @@ def segment_answers_by_questions(text: str, question_count: int) -> Dict[int, st
 # 4. OCR GRADING ENGINE
 # ============================================================================
 
+@traced()
 def grade_ocr_answer(
     student_answer: str,
     reference_answer: str,
@@ -343,16 +376,13 @@ def grade_ocr_answer(
     
     # Use NLP grader for semantic comparison
     try:
-        grading_result = grade_answer(
+        details = grade_answer_details(
             student_answer=cleaned_answer,
-            reference_answer=reference_answer,
-            max_score=max_marks,
-            question_type=question_type,
-            mandatory_terms=mandatory_terms or []
+            reference_answers=[reference_answer],
+            max_points=max_marks,
+            mandatory_terms=mandatory_terms or None
         )
-        
-        marks = grading_result.get("score", 0.0)
-        similarity = grading_result.get("similarity", 0.0)
+        marks, similarity = details["score"], details["similarity"]
         
         # Generate feedback
         feedback_parts = []
@@ -364,19 +394,13 @@ def grade_ocr_answer(
         else:
             feedback_parts.append("Good understanding of the topic.")
         
-        # Check mandatory terms
-        if mandatory_terms:
-            missing_terms = []
-            answer_lower = cleaned_answer.lower()
-            for term in mandatory_terms:
-                if term.lower() not in answer_lower:
-                    missing_terms.append(term)
-            
-            if missing_terms:
-                feedback_parts.append(f"Missing key terms: {', '.join(missing_terms)}")
+        # Mandatory terms were already matched while grading
+        term_check = details["term_check"] if mandatory_terms else None
+        if term_check and term_check["missing_terms"]:
+            feedback_parts.append(f"Missing key terms: {', '.join(term_check['missing_terms'])}")
         
         # Grammar and length analysis
-        grammar_analysis = analyze_grammar_and_length(cleaned_answer)
+        grammar_analysis = details["grammar_analysis"] or analyze_grammar_and_length(cleaned_answer)
         if grammar_analysis.get("issues"):
             feedback_parts.append("Note: " + "; ".join(grammar_analysis["issues"]))
         
@@ -387,10 +411,11 @@ def grade_ocr_answer(
             "max_marks": max_marks,
             "feedback": feedback,
             "needs_manual_review": False,
-            "confidence": grading_result.get("confidence", 100.0),
+            "confidence": 100.0,
             "similarity_score": round(similarity, 3),
             "extracted_text": cleaned_answer,
-            "grammar_analysis": grammar_analysis
+            "grammar_analysis": grammar_analysis,
+            "term_check": term_check
         }
     
     except Exception as e:
@@ -404,29 +429,23 @@ def grade_ocr_answer(
         }
 
 
-def grade_ocr_answer_sheet(
+def iter_grade_ocr_answer_sheet(
     answer_sheet_path: str,
     questions: List[Dict[str, Any]],
     lang: str = 'eng',
     min_confidence: float = 30.0
-) -> Dict[str, Any]:
+):
     """
-    Main function to grade an entire answer sheet using OCR.
+    Grade an answer sheet incrementally, yielding events as work completes:
     
-    Args:
-        answer_sheet_path: Path to scanned image/PDF
-        questions: List of question dictionaries with:
-            - id: question ID
-            - question: question text
-            - correctAnswer: reference answer
-            - points: max marks
-            - type: question type
-            - mandatoryTerms: (optional) list of required terms
-        lang: OCR language code
-        min_confidence: Minimum OCR confidence threshold
+        {"type": "page", "page": n, "text": ..., "confidence": ...}   per OCRed page
+        {"type": "result", ...per-question result...}                   per question
+        {"type": "summary", "success": True, "message": ..., "summary": {...}, ...}
     
-    Returns:
-        Dictionary with grading results for all questions
+    or a single terminal {"type": "error", "success": False, "message": ..., ...}
+    when extraction fails or OCR confidence is too low.
+    
+    Segmentation needs the whole sheet, so question results follow the last page.
     """
     if not OCR_AVAILABLE:
         raise RuntimeError(
@@ -435,24 +454,41 @@ def grade_ocr_answer_sheet(
         )
     
     # Extract text from answer sheet
+    page_texts = None
     try:
-        extracted_text, ocr_confidence, page_texts = extract_text_from_file(answer_sheet_path, lang)
+        with span("ocr_extract"):
+            if Path(answer_sheet_path).suffix.lower() == '.pdf':
+                page_texts = []
+                confidences = []
+                for page_num, text, confidence in iter_pdf_page_texts(answer_sheet_path, lang):
+                    page_texts.append(text)
+                    confidences.append(confidence)
+                    yield {"type": "page", "page": page_num, "text": text, "confidence": round(confidence, 2)}
+                extracted_text = PAGE_BREAK.join(page_texts)
+                ocr_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            else:
+                extracted_text, ocr_confidence, _ = extract_text_from_file(answer_sheet_path, lang)
+                yield {"type": "page", "page": 1, "text": extracted_text, "confidence": round(ocr_confidence, 2)}
     except Exception as e:
-        return {
+        yield {
+            "type": "error",
             "success": False,
             "message": f"OCR extraction failed: {str(e)}",
             "results": []
         }
+        return
     
     # Check OCR confidence
     if ocr_confidence < min_confidence:
-        return {
+        yield {
+            "type": "error",
             "success": False,
             "message": f"Low OCR confidence ({ocr_confidence:.1f}%). Answer sheet may be unclear. Please review manually.",
             "ocr_confidence": ocr_confidence,
             "extracted_text": extracted_text,
             "results": []
         }
+        return
     
     # Clean extracted text
     cleaned_text = clean_ocr_text(extracted_text)
@@ -462,12 +498,13 @@ def grade_ocr_answer_sheet(
     segmented_answers = segment_answers_by_questions(cleaned_text, question_count)
     
     # Grade each question
-    results = []
     total_marks = 0.0
     max_total_marks = 0.0
     needs_review_count = 0
+    graded_count = 0
     
     for i, question in enumerate(questions, start=1):
+        check_cancelled()
         question_num = i
         max_marks = float(question.get("points", 1.0))
         max_total_marks += max_marks
@@ -521,24 +558,75 @@ def grade_ocr_answer_sheet(
             needs_review_count += 1
         
         total_marks += result["marks_awarded"]
-        results.append(result)
+        graded_count += 1
+        yield {"type": "result", **result}
     
     # Calculate percentage
     percentage = (total_marks / max_total_marks * 100) if max_total_marks > 0 else 0.0
     
-    return {
+    yield {
+        "type": "summary",
         "success": True,
         "message": f"Grading completed. {needs_review_count} question(s) flagged for manual review.",
         "ocr_confidence": round(ocr_confidence, 2),
         "extracted_text": cleaned_text,
         "page_texts": page_texts,
-        "results": results,
         "summary": {
             "total_marks": round(total_marks, 2),
             "max_total_marks": round(max_total_marks, 2),
             "percentage": round(percentage, 2),
-            "questions_graded": len(results),
+            "questions_graded": graded_count,
             "needs_manual_review": needs_review_count
         }
     }
 
+
+@traced()
+def grade_ocr_answer_sheet(
+    answer_sheet_path: str,
+    questions: List[Dict[str, Any]],
+    lang: str = 'eng',
+    min_confidence: float = 30.0
+) -> Dict[str, Any]:
+    """
+    Main function to grade an entire answer sheet using OCR.
+    
+    Args:
+        answer_sheet_path: Path to scanned image/PDF
+        questions: List of question dictionaries with:
+            - id: question ID
+            - question: question text
+            - correctAnswer: reference answer
+            - points: max marks
+            - type: question type
+            - mandatoryTerms: (optional) list of required terms
+        lang: OCR language code
+        min_confidence: Minimum OCR confidence threshold
+    
+    Returns:
+        Dictionary with grading results for all questions
+    """
+    results = []
+    for event in iter_grade_ocr_answer_sheet(answer_sheet_path, questions, lang, min_confidence):
+        kind = event.pop("type")
+        if kind == "error":
+            return event
+        if kind == "result":
+            results.append(event)
+        elif kind == "summary":
+            return {
+                "success": event["success"],
+                "message": event["message"],
+                "ocr_confidence": event["ocr_confidence"],
+                "extracted_text": event["extracted_text"],
+                "page_texts": event["page_texts"],
+                "results": results,
+                "summary": event["summary"]
+            }
+    return {"success": False, "message": "Grading ended without a summary.", "results": results}
+
+
+if __name__ == "__main__":
+    # python -m ocr_grading: bulk-grade JSONL requests (see bulk_grading.py)
+    from bulk_grading import main
+    sys.exit(main("ocr"))
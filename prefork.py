@@ -0,0 +1,204 @@
+"""
+Pre-fork process model for the grading server.
+
+The parent process binds the listening socket, loads read-only state (the
+sentence embedding model) once and then forks worker processes that all accept
+on the shared socket. Forked workers share the loaded model pages
+copy-on-write, so N workers cost far less than N model loads.
+
+The parent only supervises:
+- a worker that crashes is restarted in the same slot,
+- a worker exits (and is replaced) after `max_requests` connections to bound
+  memory growth,
+- SIGTERM / SIGINT trigger a graceful shutdown: workers finish the request in
+  flight, and are killed if they are still running after `graceful_timeout`.
+
+Requires os.fork (Linux / macOS). On other platforms callers should fall back
+to a single-process server.
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+# How often workers wake up to check for shutdown / recycling.
+POLL_INTERVAL = 0.5
+
+# A worker that dies sooner than this after being spawned is treated as crash-looping.
+MIN_WORKER_LIFETIME = 1.0
+
+
+def fork_supported() -> bool:
+    return hasattr(os, "fork")
+
+
+def _log(message: str) -> None:
+    print(f"[prefork {os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+
+def _worker_server_class(server_class):
+    """Wrap `server_class` so it counts connections and accepts cooperatively."""
+
+    class PreforkWorkerServer(server_class):
+        requests_handled = 0
+
+        def get_request(self):
+            # The listening socket is non-blocking so that a worker losing the
+            # accept race to a sibling returns to its loop instead of blocking.
+            conn, addr = super().get_request()
+            conn.setblocking(True)
+            return conn, addr
+
+        def process_request(self, request, client_address):
+            self.requests_handled += 1
+            super().process_request(request, client_address)
+
+    PreforkWorkerServer.__name__ = f"PreforkWorker{server_class.__name__}"
+    return PreforkWorkerServer
+
+
+def _run_worker(listen_sock: socket.socket, server_class, handler_class, max_requests: int) -> int:
+    """Worker process body; returns the process exit code."""
+    stopping = False
+
+    def _request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    # Ctrl+C reaches the whole process group; let the parent coordinate shutdown.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    worker_class = _worker_server_class(server_class)
+    server = worker_class(listen_sock.getsockname(), handler_class, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listen_sock
+    server.timeout = POLL_INTERVAL
+
+    try:
+        while not stopping:
+            if max_requests and server.requests_handled >= max_requests:
+                _log(f"recycling after {server.requests_handled} requests")
+                break
+            server.handle_request()
+    finally:
+        # Waits for in-flight request threads when the server is threaded.
+        server.server_close()
+    return 0
+
+
+def serve_prefork(
+    address: Tuple[str, int],
+    server_class,
+    handler_class,
+    workers: int,
+    max_requests: int = 0,
+    graceful_timeout: float = 30.0,
+    preload: Optional[Callable[[], None]] = None,
+) -> None:
+    """
+    Bind `address`, run `preload()` and supervise `workers` forked servers
+    until SIGTERM / SIGINT.
+    """
+    if not fork_supported():
+        raise RuntimeError("Pre-fork mode requires os.fork (not available on this platform)")
+
+    listen_sock = socket.create_server(address, backlog=max(128, workers * 16))
+    listen_sock.setblocking(False)
+
+    if preload is not None:
+        preload()
+    # Move everything loaded so far out of the GC's tracked generations, so
+    # collections in the workers don't write to (and un-share) those pages.
+    gc.freeze()
+
+    children: Dict[int, Tuple[int, float]] = {}  # pid -> (slot, spawn time)
+    stopping = False
+
+    def _spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(listen_sock, server_class, handler_class, max_requests)
+            except BaseException as e:  # noqa: BLE001 - report and exit the child
+                _log(f"worker crashed: {e!r}")
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    def _request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    previous_handlers = {
+        sig: signal.signal(sig, _request_stop) for sig in (signal.SIGTERM, signal.SIGINT)
+    }
+
+    try:
+        for slot in range(workers):
+            _spawn(slot)
+        _log(f"started {workers} workers on {address[0]}:{address[1]}")
+
+        while not stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = 0, 0
+            if pid == 0:
+                time.sleep(POLL_INTERVAL)
+                continue
+            if pid not in children:
+                continue
+
+            slot, started = children.pop(pid)
+            if stopping:
+                break
+            if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+                _log(f"worker {pid} (slot {slot}) exited, replacing it")
+            else:
+                _log(f"worker {pid} (slot {slot}) died with status {status}, restarting")
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+            _spawn(slot)
+    finally:
+        _shutdown_children(children, graceful_timeout)
+        listen_sock.close()
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        _log("shut down")
+
+
+def _shutdown_children(children: Dict[int, Tuple[int, float]], graceful_timeout: float) -> None:
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            children.pop(pid, None)
+
+    deadline = time.monotonic() + graceful_timeout
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.1)
+        else:
+            children.pop(pid, None)
+
+    for pid in list(children):
+        _log(f"worker {pid} did not stop within {graceful_timeout}s, killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+    children.clear()
@@ -0,0 +1,268 @@
+"""
+Offline replay: re-grade a corpus of saved answers with the current grader.
+
+Use it before deploying a grader change to see what the change does to speed
+and to scores. Every example is graded again with grade_answer, in batches
+spread over worker processes. The JSON report contains:
+- throughput (answers/sec),
+- per-answer latency percentiles,
+- the score deltas against the stored AI score (drift),
+- the score deltas against the teacher score (accuracy).
+
+    python replay.py                                   # the training log
+    python replay.py corpus.jsonl --workers 4 --output replay_report.json
+    python replay.py grading_training_data.json --limit 500
+
+The corpus is a JSONL file or a JSON array. Each example has student_answer,
+reference_answers and optionally ai_score, teacher_score, max_points and
+mandatory_terms (camelCase keys are accepted too).
+
+Stored scores are only comparable when the example's max points are known.
+Examples saved without max_points are timed but left out of the score deltas
+(reported as "without_max_points"), unless --default-max-points says what
+their maximum was.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nlp_grader import TRAINING_DATA_FILE, grade_answer, grader_version, iter_training_data
+
+
+REPLAY_BATCH_SIZE = 32
+
+# Max points used to grade (for timing only) examples saved without max_points.
+TIMING_MAX_POINTS = 10.0
+
+# A replayed score differing from the stored AI score by more than this counts as changed.
+SCORE_CHANGE_EPSILON = 0.01
+
+_FIELDS = {
+    "student_answer": "studentAnswer",
+    "reference_answers": "referenceAnswers",
+    "ai_score": "aiScore",
+    "teacher_score": "teacherScore",
+    "max_points": "maxPoints",
+    "mandatory_terms": "mandatoryTerms",
+}
+
+
+def iter_corpus(path: Optional[Path]) -> Iterator[Dict[str, Any]]:
+    """Examples from a JSONL file or JSON array, or the training log if `path` is None."""
+    if path is None:
+        yield from iter_training_data()
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def _normalize(example: Dict[str, Any], default_max_points: Optional[float]) -> Dict[str, Any]:
+    item = {field: example.get(field, example.get(camel)) for field, camel in _FIELDS.items()}
+    points = item["max_points"] or default_max_points
+    item["comparable"] = bool(points)
+    item["max_points"] = float(points or TIMING_MAX_POINTS)
+    item["reference_answers"] = item["reference_answers"] or []
+    return item
+
+
+def _grade_batch(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Worker: grade each example, timing it on its own."""
+    out = []
+    for item in batch:
+        start = time.perf_counter()
+        try:
+            score, _feedback, similarity = grade_answer(
+                student_answer=item["student_answer"] or "",
+                reference_answers=item["reference_answers"],
+                max_points=item["max_points"],
+                mandatory_terms=item["mandatory_terms"] or None,
+            )
+            error = None
+        except Exception as e:
+            score, similarity, error = None, None, str(e)
+        out.append({
+            "score": score,
+            "similarity": similarity,
+            "latency": time.perf_counter() - start,
+            "error": error,
+        })
+    return out
+
+
+def _batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _graded(items: Iterable[Dict[str, Any]], workers: int,
+            batch_size: int) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(item, result) pairs in input order, graded here or in a process pool."""
+    batches = _batches(items, batch_size)
+    if workers <= 1:
+        for batch in batches:
+            yield from zip(batch, _grade_batch(batch))
+        return
+
+    # Fork where possible so a model already loaded in this process is shared.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        # A bounded number of batches in flight, so large corpora stream.
+        pending = deque((batch, pool.submit(_grade_batch, batch)) for batch in islice(batches, workers * 2))
+        while pending:
+            batch, future = pending.popleft()
+            for nxt in islice(batches, 1):
+                pending.append((nxt, pool.submit(_grade_batch, nxt)))
+            yield from zip(batch, future.result())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def _delta_stats(deltas: List[float], max_points: List[float]) -> Dict[str, Any]:
+    if not deltas:
+        return {"count": 0}
+    abs_deltas = [abs(d) for d in deltas]
+    return {
+        "count": len(deltas),
+        "mean_delta": round(sum(deltas) / len(deltas), 4),
+        "mean_abs_delta": round(sum(abs_deltas) / len(deltas), 4),
+        "mean_abs_delta_fraction": round(sum(a / p for a, p in zip(abs_deltas, max_points)) / len(deltas), 4),
+        "max_abs_delta": round(max(abs_deltas), 4),
+    }
+
+
+def replay(examples: Iterable[Dict[str, Any]], workers: int = 1, batch_size: int = REPLAY_BATCH_SIZE,
+           default_max_points: Optional[float] = None,
+           details: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Re-grade `examples` and build the report. With workers > 1 batches go to a
+    process pool. `details`, if given, is a text file that receives one JSON
+    line per example. Examples without max_points (and no `default_max_points`)
+    are left out of the score deltas.
+    """
+    items = (_normalize(e, default_max_points) for e in examples)
+    latencies: List[float] = []
+    ai_deltas, ai_points, teacher_deltas, teacher_points = [], [], [], []
+    stored_teacher_deltas = []
+    errors = changed = count = without_max_points = 0
+
+    started = time.perf_counter()
+    for item, result in _graded(items, workers, batch_size):
+        count += 1
+        latencies.append(result["latency"])
+        if result["error"] is not None:
+            errors += 1
+        elif not item["comparable"]:
+            without_max_points += 1
+        else:
+            score, points = result["score"], item["max_points"]
+            if item["ai_score"] is not None:
+                delta = score - float(item["ai_score"])
+                ai_deltas.append(delta)
+                ai_points.append(points)
+                changed += abs(delta) > SCORE_CHANGE_EPSILON
+            if item["teacher_score"] is not None:
+                teacher_deltas.append(score - float(item["teacher_score"]))
+                teacher_points.append(points)
+                if item["ai_score"] is not None:
+                    stored_teacher_deltas.append(float(item["ai_score"]) - float(item["teacher_score"]))
+        if details is not None:
+            details.write(json.dumps({"index": count - 1, **result}) + "\n")
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    vs_teacher = _delta_stats(teacher_deltas, teacher_points)
+    if stored_teacher_deltas:
+        vs_teacher["stored_ai_mean_abs_delta"] = round(
+            sum(abs(d) for d in stored_teacher_deltas) / len(stored_teacher_deltas), 4)
+    return {
+        "grader_version": grader_version(),
+        "answers": count,
+        "errors": errors,
+        "without_max_points": without_max_points,
+        "workers": workers,
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "answers_per_second": round(count / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            name: round(_percentile(latencies, q) * 1000, 2) if latencies else None
+            for name, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "vs_ai_score": {**_delta_stats(ai_deltas, ai_points), "changed": changed},
+        "vs_teacher_score": vs_teacher,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-grade a corpus and report throughput and score drift")
+    parser.add_argument("corpus", nargs="?", help="JSONL file or JSON array (default: the training log)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("REPLAY_WORKERS", "1")),
+                        help="Grading processes (default 1, or REPLAY_WORKERS)")
+    parser.add_argument("--batch-size", type=int, default=REPLAY_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N examples")
+    parser.add_argument("--default-max-points", type=float, default=None,
+                        help="Max points for examples saved without max_points "
+                             "(otherwise they are left out of the score deltas)")
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    parser.add_argument("--details", help="Write one JSON line per example here")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be at least 1")
+    examples = iter_corpus(Path(args.corpus) if args.corpus else None)
+    if args.limit is not None:
+        examples = islice(examples, args.limit)
+
+    details = open(args.details, "w", encoding="utf-8") if args.details else None
+    try:
+        report = replay(examples, args.workers, args.batch_size, args.default_max_points, details)
+    finally:
+        if details is not None:
+            details.close()
+    report["corpus"] = args.corpus or str(TRAINING_DATA_FILE)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
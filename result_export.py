@@ -0,0 +1,103 @@
+"""
+Streaming result export (CSV or NDJSON) straight from the exam store.
+
+`iter_export` turns the store's batched result iterator into byte chunks, one
+per batch, optionally gzip-compressed on the fly, so an export of any size is
+produced in constant memory and can be written to the client as chunked
+transfer encoding.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from cancellation import check_cancelled
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+CSV_COLUMNS = [
+    ("Result ID", "id"),
+    ("Exam ID", "examId"),
+    ("Student ID", "studentId"),
+    ("Score", "score"),
+    ("Total Points", "totalPoints"),
+    ("Total Questions", "totalQuestions"),
+    ("Percentage", "percentage"),
+    ("Passed", "passed"),
+    ("Completed At", "completedAt"),
+    ("Time Spent", "timeSpent"),
+]
+
+# Rows per store query, and so per chunk written to the client.
+EXPORT_BATCH_SIZE = 500
+
+
+def parse_date_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """
+    Turn a `from` / `to` filter into a comparable ISO string. A plain date used
+    as the end of a range covers that whole day (the bound becomes the next day,
+    exclusive). Raises ValueError for malformed dates.
+    """
+    if not value:
+        return None
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        return (day + timedelta(days=1)).isoformat() if end else day.isoformat()
+    return value
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return "" if value is None else value
+
+
+def _encode_batches(results: Iterable[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow([title for title, _key in CSV_COLUMNS])
+
+    rows = 0
+    for result in results:
+        if writer is not None:
+            writer.writerow([_csv_value(result.get(key)) for _title, key in CSV_COLUMNS])
+        else:
+            buffer.write(json.dumps(result))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            check_cancelled()
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def iter_export(results: Iterable[Dict[str, Any]], fmt: str, compress: bool = False) -> Iterator[bytes]:
+    """Byte chunks of the export; gzip-compressed (one gzip member) when `compress`."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    chunks = _encode_batches(results, fmt)
+    if not compress:
+        yield from chunks
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        # Sync-flush per batch so the client receives data as it is produced.
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -6,34 +6,176 @@ import sys
 import json
 import tempfile
 from pathlib import Path
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, unquote
 
+import prefork
 from converter import convert_file
 from answer_key_parser import parse_answer_key_file
+from tracing import start_trace, stop_trace, span, load_trace
+from result_cache import ResultCache, make_cache_key
+from exam_store import DB_PATH, get_store, StoreError
+from data_paths import is_within
+from training_log import LOG_FILE
+from result_export import EXPORT_FORMATS, EXPORT_BATCH_SIZE, iter_export, parse_date_bound
+from static_assets import (
+    StaticAssetTable,
+    choose_encoding,
+    is_versioned_request,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+)
+from cancellation import (
+    CancelToken,
+    OperationCancelled,
+    cancel_scope,
+    check_cancelled,
+    socket_disconnected,
+    DEADLINE_EXCEEDED,
+)
+from admission import (
+    AdmissionController,
+    AdmissionRejected,
+    RoutePolicy,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+)
 from nlp_grader import (
-    grade_answer,
     detect_plagiarism,
-    analyze_grammar_and_length,
-    check_mandatory_terms,
+    analyze_text,
     save_grading_example,
     get_training_data,
+    iter_training_data,
     analyze_grading_patterns,
-    fix_word_spacing_nlp
+    fix_word_spacing_nlp,
+    fix_word_spacing_batch,
+    SPACING_BATCH_SIZE,
+    SPACING_ENGINE,
+    SPACING_ENGINES,
+    grader_version,
+    normalize_essay_request,
+    grade_essay_request,
+    DEFAULT_PLAGIARISM_THRESHOLD
 )
 try:
-    from ocr_grading import grade_ocr_answer_sheet
+    from ocr_grading import grade_ocr_answer_sheet, iter_grade_ocr_answer_sheet
     OCR_GRADING_AVAILABLE = True
 except ImportError:
     OCR_GRADING_AVAILABLE = False
     grade_ocr_answer_sheet = None
+    iter_grade_ocr_answer_sheet = None
 
 PORT = 5000
 
 
-def parse_port():
-    # Priority: CLI arg -> env var PORT -> default 5000
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f'Invalid {name} environment variable, falling back to default {default}', file=sys.stderr)
+        return default
+
+
+# Cache for repeated identical grading requests (e.g. repeated "AI suggest" clicks).
+RESULT_CACHE = ResultCache(
+    max_entries=_env_int('GRADE_CACHE_SIZE', 512),
+    ttl_seconds=_env_int('GRADE_CACHE_TTL', 600),
+)
+
+# Concurrency limits and bounded queues for the expensive routes. Cheap,
+# interactive routes get a higher priority class so OCR bursts cannot starve them.
+ADMISSION = AdmissionController(
+    policies={
+        "/api/grade-ocr": RoutePolicy(max_concurrent=2, max_queue=4, priority=PRIORITY_LOW, retry_after=30),
+        "/api/convert-questions": RoutePolicy(max_concurrent=2, max_queue=8, priority=PRIORITY_LOW),
+        "/api/parse-answer-key": RoutePolicy(max_concurrent=2, max_queue=8, priority=PRIORITY_LOW),
+        "/api/grade-essay": RoutePolicy(max_concurrent=4, max_queue=16, priority=PRIORITY_NORMAL),
+        "/api/check-plagiarism": RoutePolicy(max_concurrent=4, max_queue=16, priority=PRIORITY_NORMAL),
+        "/api/fix-spacing": RoutePolicy(max_concurrent=2, max_queue=8, priority=PRIORITY_NORMAL),
+        "/api/analyze-text": RoutePolicy(max_concurrent=8, max_queue=32, priority=PRIORITY_HIGH),
+        "/api/save-grading-example": RoutePolicy(max_concurrent=4, max_queue=32, priority=PRIORITY_HIGH),
+    },
+    total_slots=_env_int('ADMISSION_SLOTS', max(4, os.cpu_count() or 1)),
+)
+
+
+# HTTP/1.1 persistent connections: idle connections are closed after
+# KEEPALIVE_TIMEOUT seconds and after MAX_KEEPALIVE_REQUESTS requests.
+KEEPALIVE_TIMEOUT = _env_int('KEEPALIVE_TIMEOUT', 15)
+MAX_KEEPALIVE_REQUESTS = _env_int('MAX_KEEPALIVE_REQUESTS', 100)
+
+# Unread request bodies up to this size are drained so the connection can be reused.
+MAX_DRAIN_BYTES = 64 * 1024
+
+# Default time budget (seconds) for a POST request once it has been admitted.
+# Clients may ask for less with an X-Request-Timeout header or ?timeout= query.
+REQUEST_TIMEOUT = _env_int('REQUEST_TIMEOUT', 300)
+
+
+# Preloaded front-end assets; built in main() (or on first static request).
+STATIC_ASSETS = None
+
+
+def get_static_assets(directory: str) -> StaticAssetTable:
+    global STATIC_ASSETS
+    if STATIC_ASSETS is None or str(STATIC_ASSETS.root) != os.path.realpath(directory):
+        STATIC_ASSETS = StaticAssetTable(directory)
+    return STATIC_ASSETS
+
+
+def _resolve_submission(payload: dict):
+    """
+    Fill `studentAnswer` (and, if omitted, `otherAnswers` with the classmates'
+    answers to the same question) from a stored submission referenced by
+    `submissionId`. Returns an error message, or None.
+    """
+    submission_id = payload.get("submissionId")
+    if not submission_id:
+        return None
+    store = get_store()
+    submission = store.get_submission(str(submission_id))
+    if submission is None:
+        return f"Submission {submission_id} not found"
+    if not payload.get("studentAnswer"):
+        payload["studentAnswer"] = submission["userAnswer"] or ""
+    if "otherAnswers" not in payload:
+        payload["otherAnswers"] = store.peer_answers(submission["id"])
+    return None
+
+
+class ExamGradeServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Handles each connection in its own thread; ADMISSION bounds the expensive work."""
+
+
+def _build_arg_parser():
     parser = argparse.ArgumentParser(description='Start a static file HTTP server for ExamGradeFlow')
     parser.add_argument('--port', '-p', type=int, help='Port to listen on')
+    parser.add_argument('--workers', '-w', type=int,
+                        help='Pre-fork this many worker processes sharing the loaded model (0 = single process)')
+    parser.add_argument('--max-requests', type=int,
+                        help='Restart a worker after it has handled this many connections (0 = never)')
+    parser.add_argument('--graceful-timeout', type=float,
+                        help='Seconds workers get to finish in-flight requests on shutdown')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Do not load the embedding model in the parent before forking')
+    return parser
+
+
+def _pick_option(value, env_name, default, cast):
+    # Priority: CLI arg -> env var -> default
+    if value is not None:
+        return value
+    if os.environ.get(env_name):
+        try:
+            return cast(os.environ.get(env_name))
+        except ValueError:
+            print(f'Invalid {env_name} environment variable, falling back to default {default}', file=sys.stderr)
+    return default
+
+
+def parse_port():
+    # Priority: CLI arg -> env var PORT -> default 5000
+    parser = _build_arg_parser()
     args, _ = parser.parse_known_args()
 
     port = None
@@ -51,14 +193,242 @@ def parse_port():
     return port
 
 
+def parse_worker_options():
+    # Priority: CLI arg -> env var -> default (single process, no recycling)
+    parser = _build_arg_parser()
+    args, _ = parser.parse_known_args()
+
+    args.workers = max(0, _pick_option(args.workers, 'WORKERS', 0, int))
+    args.max_requests = max(0, _pick_option(args.max_requests, 'MAX_REQUESTS', 0, int))
+    args.graceful_timeout = max(0.0, _pick_option(args.graceful_timeout, 'GRACEFUL_TIMEOUT', 30.0, float))
+    return args
+
+
+def _trace_requested(handler) -> bool:
+    """Tracing is enabled per request with `X-Trace: 1` or `?trace=1`."""
+    if handler.headers.get("X-Trace", "").strip().lower() in ("1", "true", "yes"):
+        return True
+    query = parse_qs(urlparse(handler.path).query)
+    return query.get("trace", [""])[0].lower() in ("1", "true", "yes")
+
+
 class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections time out after this many seconds.
+    timeout = KEEPALIVE_TIMEOUT
+
+    tracer = None
+    # Set while answering from STATIC_ASSETS, which sends its own caching headers.
+    serving_static = False
+    requests_on_connection = 0
+    body_bytes_read = 0
+    connection_header_sent = False
+    # Set while a chunked / streamed response body is being written.
+    streaming = False
+    chunked = False
+
+    def parse_request(self):
+        self.body_bytes_read = 0
+        self.connection_header_sent = False
+        self.streaming = False
+        self.chunked = False
+        if not super().parse_request():
+            return False
+        self.requests_on_connection += 1
+        if self.requests_on_connection >= MAX_KEEPALIVE_REQUESTS:
+            self.close_connection = True
+        return True
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "connection":
+            self.connection_header_sent = True
+        super().send_header(keyword, value)
+
+    def _read_request_body(self, length: int) -> bytes:
+        data = self.rfile.read(length)
+        self.body_bytes_read += len(data)
+        return data
+
+    def _finish_request_body(self):
+        """
+        Keep the connection usable after a handler that did not read the whole
+        request body: drain small leftovers, close the connection otherwise.
+        """
+        try:
+            expected = int(self.headers.get("Content-Length", "0") or "0")
+        except ValueError:
+            expected = 0
+        remaining = expected - self.body_bytes_read
+        if remaining <= 0 or self.close_connection:
+            return
+        if remaining > MAX_DRAIN_BYTES:
+            self.close_connection = True
+            return
+        self._read_request_body(remaining)
+
     def end_headers(self):
-        self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-        self.send_header("Pragma", "no-cache")
-        self.send_header("Expires", "0")
+        if not self.serving_static:
+            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+            self.send_header("Pragma", "no-cache")
+            self.send_header("Expires", "0")
+        if self.tracer is not None:
+            self.send_header("X-Trace-Id", self.tracer.trace_id)
+        if not self.connection_header_sent and self.request_version == "HTTP/1.1":
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            else:
+                self.send_header("Keep-Alive", f"timeout={KEEPALIVE_TIMEOUT}, max={MAX_KEEPALIVE_REQUESTS}")
         super().end_headers()
 
+    def _run_traced(self, route):
+        """Run a route handler, recording a Chrome trace when the request asks for one."""
+        if not self.path.startswith("/api/") or not _trace_requested(self):
+            route()
+            return
+
+        name = f"{self.command} {urlparse(self.path).path}"
+        self.tracer, token = start_trace(name)
+        try:
+            with span(name):
+                route()
+        finally:
+            stop_trace(token)
+            try:
+                path = self.tracer.save()
+                self.log_message("trace %s written to %s", self.tracer.trace_id, path)
+            except OSError as e:
+                self.log_message("could not save trace %s: %s", self.tracer.trace_id, e)
+            self.tracer = None
+
     def do_POST(self):
+        try:
+            self._run_traced(self._admitted(self._route_post))
+        finally:
+            self._finish_request_body()
+
+    def do_GET(self):
+        self._run_traced(self._route_get)
+
+    def do_PUT(self):
+        try:
+            self._run_traced(self._route_store_or_404)
+        finally:
+            self._finish_request_body()
+
+    def do_DELETE(self):
+        try:
+            self._run_traced(self._route_store_or_404)
+        finally:
+            self._finish_request_body()
+
+    def do_HEAD(self):
+        if not self._serve_static(head_only=True):
+            self.send_error(404, "File not found")
+
+    def _serve_static(self, head_only: bool = False) -> bool:
+        """
+        Answer from the preloaded asset table: ETag / If-None-Match revalidation,
+        precompressed variants and sendfile for large files.
+        Returns False if the path is not a known asset.
+        """
+        asset = get_static_assets(self.directory).lookup(self.path)
+        if asset is None:
+            return False
+
+        encoding = choose_encoding(asset, self.headers.get("Accept-Encoding", ""))
+        cache_control = IMMUTABLE_CACHE_CONTROL if is_versioned_request(self.path) else REVALIDATE_CACHE_CONTROL
+
+        self.serving_static = True
+        try:
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match and asset.matches(if_none_match):
+                self.send_response(304)
+                self.send_header("ETag", asset.etag_for(encoding))
+                self.send_header("Cache-Control", cache_control)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return True
+
+            body = asset.variants[encoding] if encoding else asset.body
+            length = len(body) if body is not None else asset.size
+
+            self.send_response(200)
+            self.send_header("Content-Type", asset.content_type)
+            self.send_header("Content-Length", str(length))
+            self.send_header("ETag", asset.etag_for(encoding))
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+        finally:
+            self.serving_static = False
+
+        if head_only:
+            return True
+        if body is not None:
+            self.wfile.write(body)
+        else:
+            with open(asset.path, "rb") as f:
+                self.wfile.flush()
+                self.connection.sendfile(f, 0, asset.size)
+        return True
+
+    def _admitted(self, route):
+        """
+        Wrap a route handler so it only runs once ADMISSION grants a slot, under
+        a CancelToken that fires when the time budget runs out or the client
+        disconnects. Cancelled work releases its slot as it unwinds.
+        """
+        def run():
+            try:
+                ticket = ADMISSION.acquire(urlparse(self.path).path)
+            except AdmissionRejected as e:
+                # Don't read (possibly large) rejected uploads; drop the connection instead.
+                self.close_connection = True
+                self._send_json(
+                    {"success": False, "message": f"Server busy ({e.reason}), retry later"},
+                    503,
+                    {"Retry-After": str(e.retry_after)},
+                )
+                return
+            token = CancelToken(
+                timeout=self._time_budget(),
+                probe=lambda: socket_disconnected(self.connection),
+            )
+            with ticket, cancel_scope(token):
+                try:
+                    route()
+                except OperationCancelled as e:
+                    self._handle_cancelled(e)
+        return run
+
+    def _time_budget(self) -> float:
+        """Seconds this request may run: REQUEST_TIMEOUT, or less if the client asks."""
+        requested = self.headers.get("X-Request-Timeout")
+        if requested is None:
+            requested = parse_qs(urlparse(self.path).query).get("timeout", [None])[0]
+        try:
+            budget = float(requested) if requested is not None else REQUEST_TIMEOUT
+        except ValueError:
+            budget = REQUEST_TIMEOUT
+        return max(0.0, min(budget, REQUEST_TIMEOUT))
+
+    def _handle_cancelled(self, e: OperationCancelled):
+        self.log_message("%s cancelled: %s", urlparse(self.path).path, e.reason)
+        self.close_connection = True
+        if e.reason != DEADLINE_EXCEEDED:
+            return
+        message = {"success": False, "message": f"Request cancelled: {e.reason}"}
+        if self.streaming:
+            self._write_ndjson({"type": "error", **message})
+            self._end_chunked()
+        else:
+            self._send_json(message, 504)
+
+    def _route_post(self):
+        if self._route_store():
+            return
         if self.path.startswith("/api/convert-questions"):
             self.handle_convert_questions()
         elif self.path.startswith("/api/parse-answer-key"):
@@ -78,14 +448,134 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         else:
             self.send_error(404, "Not Found")
 
-    def do_GET(self):
+    def _route_get(self):
+        if self._route_store():
+            return
         if self.path.startswith("/api/training-data"):
             self.handle_get_training_data()
         elif self.path.startswith("/api/grading-patterns"):
             self.handle_get_grading_patterns()
+        elif self.path.startswith("/api/trace/"):
+            self.handle_get_trace()
+        elif self.path.startswith("/api/analytics/"):
+            self.handle_get_analytics()
+        elif self.path.startswith("/api/export/results"):
+            self.handle_export_results()
+        elif self.path.startswith("/api/cache-stats"):
+            self._send_json({"success": True, **RESULT_CACHE.stats()})
+        elif self.path.startswith("/api/admission-stats"):
+            self._send_json({"success": True, **ADMISSION.stats()})
+        elif not self._serve_static():
+            # Only preloaded front-end assets are served: never sources, data or .git,
+            # whichever directory the server runs from.
+            self.send_error(404, "File not found")
+
+    def _route_store_or_404(self):
+        if not self._route_store():
+            self.send_error(404, "Not Found")
+
+    def _route_store(self) -> bool:
+        """
+        REST endpoints backed by the exam store:
+
+          GET    /api/exams?teacherId=&limit=&offset=
+          POST   /api/exams                  PUT/GET/DELETE /api/exams/<id>
+          GET    /api/results?examId=&studentId=&limit=&offset=
+          POST   /api/results                PUT/GET/DELETE /api/results/<id>
+          GET    /api/submissions?examId=&questionId=&limit=&offset=
+          GET    /api/submissions/<id>
+
+        Returns False if the path is not a store endpoint.
+        """
+        parsed = urlparse(self.path)
+        parts = parsed.path.strip("/").split("/")
+        if len(parts) not in (2, 3) or parts[0] != "api" or parts[1] not in ("exams", "results", "submissions"):
+            return False
+        collection = parts[1]
+        item_id = unquote(parts[2]) if len(parts) == 3 else None
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        try:
+            if collection == "exams":
+                self.handle_store_exams(item_id, query)
+            elif collection == "results":
+                self.handle_store_results(item_id, query)
+            else:
+                self.handle_store_submissions(item_id, query)
+        except StoreError as e:
+            self._send_json({"success": False, "message": str(e)}, 400)
+        except ValueError:
+            self._send_json({"success": False, "message": "limit and offset must be integers"}, 400)
+        return True
+
+    def _store_document(self, item_id):
+        """Read the JSON document for POST / PUT; the URL id wins over the body's."""
+        payload, error = self._read_json_body()
+        if error:
+            self._send_json({"success": False, "message": error}, 400)
+            return None
+        if not isinstance(payload, dict):
+            self._send_json({"success": False, "message": "Request body must be a JSON object"}, 400)
+            return None
+        if item_id is not None:
+            payload["id"] = item_id
+        return payload
+
+    def _store_item(self, kind: str, item_id: str, get, put, delete):
+        """Shared GET / PUT / POST / DELETE handling for a single stored document."""
+        if self.command == "GET" and item_id is not None:
+            item = get(item_id)
+            if item is None:
+                self._send_json({"success": False, "message": f"{kind.capitalize()} not found"}, 404)
+            else:
+                self._send_json({"success": True, kind: item})
+        elif self.command in ("POST", "PUT") and (item_id is not None or self.command == "POST"):
+            document = self._store_document(item_id)
+            if document is not None:
+                self._send_json({"success": True, kind: put(document)}, 200 if item_id else 201)
+        elif self.command == "DELETE" and item_id is not None:
+            if delete(item_id):
+                self._send_json({"success": True})
+            else:
+                self._send_json({"success": False, "message": f"{kind.capitalize()} not found"}, 404)
+        else:
+            self._send_json({"success": False, "message": "Method not allowed"}, 405)
+
+    def handle_store_exams(self, item_id, query: dict):
+        store = get_store()
+        if self.command == "GET" and item_id is None:
+            page = store.list_exams(query.get("teacherId"), query.get("limit"), query.get("offset"))
+            self._send_json({"success": True, **page})
+            return
+        self._store_item("exam", item_id, store.get_exam, store.put_exam, store.delete_exam)
+
+    def handle_store_results(self, item_id, query: dict):
+        store = get_store()
+        if self.command == "GET" and item_id is None:
+            page = store.list_results(
+                query.get("examId"), query.get("studentId"), query.get("limit"), query.get("offset")
+            )
+            self._send_json({"success": True, **page})
+            return
+        self._store_item("result", item_id, store.get_result, store.put_result, store.delete_result)
+
+    def handle_store_submissions(self, item_id, query: dict):
+        store = get_store()
+        if self.command != "GET":
+            self._send_json({"success": False, "message": "Submissions are written through /api/results"}, 405)
+        elif item_id is not None:
+            submission = store.get_submission(item_id)
+            if submission is None:
+                self._send_json({"success": False, "message": "Submission not found"}, 404)
+            else:
+                self._send_json({"success": True, "submission": submission})
+        elif not query.get("examId"):
+            self._send_json({"success": False, "message": "examId is required"}, 400)
         else:
-            # Default: serve static files
-            super().do_GET()
+            page = store.list_submissions(
+                query["examId"], query.get("questionId"), query.get("limit"), query.get("offset")
+            )
+            self._send_json({"success": True, **page})
 
     def _read_json_body(self):
         """Helper to read and parse JSON request body."""
@@ -97,18 +587,103 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         if content_length <= 0:
             return None, "Empty request body"
 
-        raw = self.rfile.read(content_length)
+        raw = self._read_request_body(content_length)
         try:
             return json.loads(raw.decode("utf-8")), None
         except json.JSONDecodeError:
             return None, "Invalid JSON"
 
-    def _send_json(self, data: dict, status: int = 200):
+    def _send_json(self, data: dict, status: int = 200, headers: dict = None):
         """Helper to send JSON response."""
+        self._send_json_body(json.dumps(data).encode("utf-8"), status, headers)
+
+    def _send_json_body(self, body: bytes, status: int = 200, headers: dict = None):
+        """Send an already serialized JSON body."""
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cache_bypassed(self, payload: dict) -> bool:
+        """Clients skip the result cache with `Cache-Control: no-cache`, `?nocache=1` or `"noCache": true`."""
+        if "no-cache" in self.headers.get("Cache-Control", "").lower():
+            return True
+        if payload.get("noCache"):
+            return True
+        query = parse_qs(urlparse(self.path).query)
+        return query.get("nocache", [""])[0].lower() in ("1", "true", "yes")
+
+    def _cached_result(self, route: str, normalized: dict, bypass: bool, compute):
+        """
+        Look `route` up in RESULT_CACHE, otherwise call `compute()` which returns
+        (response_dict, status). Only 200 responses are cached.
+
+        Returns (serialized_body, status, cache_status).
+        """
+        if bypass:
+            data, status = compute()
+            return json.dumps(data).encode("utf-8"), status, "BYPASS"
+
+        key = make_cache_key(route, normalized, grader_version())
+        body = RESULT_CACHE.get(key)
+        if body is not None:
+            return body, 200, "HIT"
+
+        data, status = compute()
+        body = json.dumps(data).encode("utf-8")
+        if status == 200:
+            RESULT_CACHE.put(key, body)
+        return body, status, "MISS"
+
+    def _send_cached(self, route: str, normalized: dict, bypass: bool, compute):
+        """Send the (possibly cached) result of `compute()`; X-Cache reports HIT, MISS or BYPASS."""
+        body, status, cache_status = self._cached_result(route, normalized, bypass, compute)
+        self._send_json_body(body, status, {"X-Cache": cache_status})
+
+    def _wants_ndjson(self) -> bool:
+        """Bulk endpoints stream NDJSON for `Accept: application/x-ndjson` or `?stream=1`."""
+        if "application/x-ndjson" in self.headers.get("Accept", ""):
+            return True
+        query = parse_qs(urlparse(self.path).query)
+        return query.get("stream", [""])[0].lower() in ("1", "true", "yes")
+
+    def _start_chunked(self, content_type: str, status: int = 200, headers: dict = None):
+        """
+        Send response headers for a body of unknown length. HTTP/1.1 clients get
+        chunked transfer encoding; HTTP/1.0 clients get a body ended by closing
+        the connection.
+        """
+        self.chunked = self.request_version == "HTTP/1.1"
+        if not self.chunked:
+            self.close_connection = True
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if self.chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode("utf-8"))
+        self.streaming = True
+
+    def _write_chunk(self, data: bytes):
+        if not data:
+            return
+        if self.chunked:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        else:
+            self.wfile.write(data)
+
+    def _end_chunked(self):
+        if self.chunked:
+            self.wfile.write(b"0\r\n\r\n")
+        self.streaming = False
+
+    def _write_ndjson(self, obj: dict):
+        """Write one NDJSON line as its own chunk so the client sees it immediately."""
+        self._write_chunk((json.dumps(obj) + "\n").encode("utf-8"))
 
     def handle_convert_questions(self):
         content_length = int(self.headers.get("Content-Length", "0") or "0")
@@ -116,7 +691,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             self._send_json({"success": False, "message": "Empty request body"}, 400)
             return
 
-        raw_data = self.rfile.read(content_length)
+        raw_data = self._read_request_body(content_length)
 
         filename = self.headers.get("X-Filename") or "uploaded"
         parsed = urlparse(self.path)
@@ -150,7 +725,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             self._send_json({"success": False, "message": "Empty request body"}, 400)
             return
 
-        raw_data = self.rfile.read(content_length)
+        raw_data = self._read_request_body(content_length)
 
         filename = self.headers.get("X-Filename") or "uploaded"
         parsed = urlparse(self.path)
@@ -188,42 +763,83 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             "mandatoryTerms": ["term1", "term2"],  // optional
             "otherAnswers": ["...", "..."],        // optional, for plagiarism check
             "minWords": 10,                        // optional
-            "maxWords": 1000                       // optional
+            "maxWords": 1000,                      // optional
+            "noCache": true                        // optional, skip the result cache
+        }
+        or
+        {
+            "submissionId": "<resultId>:<questionId>",  // stored answer instead of studentAnswer;
+            "referenceAnswers": [...], "maxPoints": 10  // classmates' answers become otherAnswers
         }
+        or
+        {
+            "items": [{...one request as above...}, ...]
+        }
+
+        Identical requests are answered from RESULT_CACHE; the X-Cache response
+        header reports HIT, MISS or BYPASS. The items form can stream NDJSON
+        (Accept: application/x-ndjson or ?stream=1).
         """
         payload, error = self._read_json_body()
         if error:
             self._send_json({"success": False, "message": error}, 400)
             return
 
-        student_answer = payload.get("studentAnswer", "")
-        reference_answers = payload.get("referenceAnswers") or []
-        max_points = float(payload.get("maxPoints") or 0)
-        mandatory_terms = payload.get("mandatoryTerms") or []
-        other_answers = payload.get("otherAnswers") or []
-        min_words = int(payload.get("minWords") or 10)
-        max_words = int(payload.get("maxWords") or 1000)
+        bypass = self._cache_bypassed(payload)
 
-        try:
-            score, feedback, similarity = grade_answer(
-                student_answer=student_answer,
-                reference_answers=reference_answers,
-                max_points=max_points,
-                mandatory_terms=mandatory_terms if mandatory_terms else None,
-                other_student_answers=other_answers if other_answers else None,
-                min_words=min_words,
-                max_words=max_words,
-                enable_plagiarism_check=bool(other_answers),
-                enable_grammar_check=True
-            )
-            self._send_json({
-                "success": True,
-                "score": score,
-                "similarity": similarity,
-                "feedback": feedback,
-            })
-        except RuntimeError as e:
-            self._send_json({"success": False, "message": str(e)}, 500)
+        if "items" in payload:
+            self._grade_essay_batch(payload["items"], bypass)
+            return
+
+        error = _resolve_submission(payload)
+        if error:
+            self._send_json({"success": False, "message": error}, 404)
+            return
+
+        normalized = normalize_essay_request(payload)
+        self._send_cached("grade-essay", normalized, bypass, lambda: grade_essay_request(normalized))
+
+    def _grade_essay_batch(self, items, bypass: bool):
+        """
+        Grade several essays in one call: {"items": [<grade-essay request>, ...]}.
+        Returns {"success": true, "results": [...]}, or with NDJSON streaming one
+        {"type": "item", "index": i, ...} line per essay followed by {"type": "done"}.
+        """
+        if not isinstance(items, list):
+            self._send_json({"success": False, "message": "items must be an array"}, 400)
+            return
+
+        def results():
+            for index, item in enumerate(items):
+                check_cancelled()
+                if not isinstance(item, dict):
+                    yield index, {"success": False, "message": "item must be an object"}
+                    continue
+                error = _resolve_submission(item)
+                if error:
+                    yield index, {"success": False, "message": error}
+                    continue
+                normalized = normalize_essay_request(item)
+                body, _status, _cache = self._cached_result(
+                    "grade-essay", normalized, bypass, lambda: grade_essay_request(normalized)
+                )
+                yield index, json.loads(body)
+
+        if self._wants_ndjson():
+            self._start_chunked("application/x-ndjson")
+            count = 0
+            try:
+                for index, data in results():
+                    self._write_ndjson({"type": "item", "index": index, **data})
+                    count += 1
+            except Exception as e:
+                self._write_ndjson({"type": "error", "success": False, "message": str(e)})
+            else:
+                self._write_ndjson({"type": "done", "success": True, "count": count})
+            self._end_chunked()
+            return
+
+        self._send_json({"success": True, "results": [data for _index, data in results()]})
 
     def handle_check_plagiarism(self):
         """
@@ -233,23 +849,41 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         {
             "studentAnswer": "...",
             "otherAnswers": ["...", "..."],
-            "threshold": 0.92  // optional
+            "threshold": 0.92, // optional
+            "noCache": true    // optional, skip the result cache
         }
+
+        With "submissionId" instead of "studentAnswer", the stored answer is checked
+        against the other stored answers to the same question.
         """
         payload, error = self._read_json_body()
         if error:
             self._send_json({"success": False, "message": error}, 400)
             return
 
+        error = _resolve_submission(payload)
+        if error:
+            self._send_json({"success": False, "message": error}, 404)
+            return
+
         student_answer = payload.get("studentAnswer", "")
         other_answers = payload.get("otherAnswers") or []
-        threshold = float(payload.get("threshold") or 0.92)
+        threshold = float(payload.get("threshold") or DEFAULT_PLAGIARISM_THRESHOLD)
 
-        try:
-            result = detect_plagiarism(student_answer, other_answers, threshold)
-            self._send_json({"success": True, **result})
-        except Exception as e:
-            self._send_json({"success": False, "message": str(e)}, 500)
+        normalized = {
+            "studentAnswer": student_answer,
+            "otherAnswers": other_answers,
+            "threshold": threshold,
+        }
+
+        def compute():
+            try:
+                result = detect_plagiarism(student_answer, other_answers, threshold)
+            except Exception as e:
+                return {"success": False, "message": str(e)}, 500
+            return {"success": True, **result}, 200
+
+        self._send_cached("check-plagiarism", normalized, self._cache_bypassed(payload), compute)
 
     def handle_analyze_text(self):
         """
@@ -274,13 +908,11 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         max_words = int(payload.get("maxWords") or 1000)
 
         try:
-            grammar_result = analyze_grammar_and_length(text, min_words, max_words)
-            terms_result = check_mandatory_terms(text, mandatory_terms) if mandatory_terms else None
-            
+            analysis = analyze_text(text, min_words, max_words, mandatory_terms)
             self._send_json({
                 "success": True,
-                "grammar": grammar_result,
-                "terms": terms_result
+                "grammar": analysis["grammar"],
+                "terms": analysis["terms"]
             })
         except Exception as e:
             self._send_json({"success": False, "message": str(e)}, 500)
@@ -297,7 +929,12 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             "referenceAnswers": ["..."],
             "aiScore": 7.5,
             "teacherScore": 8.0,
-            "teacherFeedback": "..."
+            "teacherFeedback": "...",
+            "questionId": "...",   (optional, for per-question patterns)
+            "examId": "...",       (optional)
+            "teacherId": "...",    (optional)
+            "maxPoints": 10,       (optional, for calibration)
+            "mandatoryTerms": []   (optional, as sent to grade-essay)
         }
         """
         payload, error = self._read_json_body()
@@ -312,7 +949,12 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 reference_answers=payload.get("referenceAnswers") or [],
                 ai_score=float(payload.get("aiScore") or 0),
                 teacher_score=float(payload.get("teacherScore") or 0),
-                teacher_feedback=payload.get("teacherFeedback", "")
+                teacher_feedback=payload.get("teacherFeedback", ""),
+                question_id=payload.get("questionId"),
+                exam_id=payload.get("examId"),
+                teacher_id=payload.get("teacherId"),
+                max_points=float(payload["maxPoints"]) if payload.get("maxPoints") else None,
+                mandatory_terms=payload.get("mandatoryTerms") or None
             )
             self._send_json({
                 "success": True,
@@ -322,21 +964,142 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             self._send_json({"success": False, "message": str(e)}, 500)
 
     def handle_get_training_data(self):
-        """Get all collected training data."""
+        """
+        Collected training data, oldest first:
+
+          GET /api/training-data?limit=&offset=   - one page, with the total count
+          GET /api/training-data?stream=1         - every example as NDJSON, streamed
+
+        The log is read line by line, so neither form loads the whole history.
+        """
+        if self._wants_ndjson():
+            self._start_chunked("application/x-ndjson")
+            try:
+                for example in iter_training_data():
+                    self._write_ndjson(example)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+                return
+            self._end_chunked()
+            return
+
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
         try:
-            data = get_training_data()
-            self._send_json({"success": True, "data": data, "count": len(data)})
+            page = get_training_data(query.get("limit"), query.get("offset"))
+        except ValueError:
+            self._send_json({"success": False, "message": "limit and offset must be integers"}, 400)
+            return
         except Exception as e:
             self._send_json({"success": False, "message": str(e)}, 500)
+            return
+        self._send_json({
+            "success": True,
+            "data": page["items"],
+            "count": len(page["items"]),
+            "total": page["total"],
+            "limit": page["limit"],
+            "offset": page["offset"],
+        })
 
     def handle_get_grading_patterns(self):
-        """Analyze grading patterns from collected data."""
+        """
+        Analyze grading patterns from collected data:
+
+          GET /api/grading-patterns?questionId=|examId=|teacherId=&groupBy=question|exam|teacher
+
+        Answered from running summaries, without reading the training log.
+        """
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
         try:
-            analysis = analyze_grading_patterns()
+            analysis = analyze_grading_patterns(
+                question_id=query.get("questionId"),
+                exam_id=query.get("examId"),
+                teacher_id=query.get("teacherId"),
+                group_by=query.get("groupBy")
+            )
             self._send_json({"success": True, **analysis})
+        except ValueError as e:
+            self._send_json({"success": False, "message": str(e)}, 400)
         except Exception as e:
             self._send_json({"success": False, "message": str(e)}, 500)
 
+    def handle_get_analytics(self):
+        """
+        Pre-aggregated dashboard data, maintained as results are written:
+
+          GET /api/analytics/exam/<examId>        - score summary, histogram, per-question
+                                                    correct rates, daily trend
+          GET /api/analytics/student/<studentId>  - attempts, mean, stddev, min, max
+          GET /api/analytics/teacher/<teacherId>  - per-exam summaries and overall totals
+        """
+        parts = urlparse(self.path).path.strip("/").split("/")
+        handlers = {
+            "exam": get_store().exam_analytics,
+            "student": get_store().student_analytics,
+            "teacher": get_store().teacher_analytics,
+        }
+        if len(parts) != 4 or parts[2] not in handlers:
+            self._send_json({"success": False, "message": "Unknown analytics endpoint"}, 404)
+            return
+        self._send_json({"success": True, **handlers[parts[2]](unquote(parts[3]))})
+
+    def handle_export_results(self):
+        """
+        Stream stored results as CSV or NDJSON:
+
+          GET /api/export/results?format=csv|ndjson&examId=&from=YYYY-MM-DD&to=YYYY-MM-DD&gzip=1
+
+        Rows are read from the store in batches and written as chunks, so memory use
+        does not grow with the export size. The body is gzip-compressed when gzip=1,
+        or when gzip is not given and the client sends Accept-Encoding: gzip.
+        """
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        fmt = query.get("format", "csv").lower()
+        if fmt not in EXPORT_FORMATS:
+            self._send_json({"success": False, "message": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, 400)
+            return
+        try:
+            since = parse_date_bound(query.get("from"))
+            until = parse_date_bound(query.get("to"), end=True)
+        except ValueError:
+            self._send_json({"success": False, "message": "from and to must be ISO dates"}, 400)
+            return
+
+        if "gzip" in query:
+            compress = query["gzip"].lower() in ("1", "true", "yes")
+        else:
+            compress = "gzip" in self.headers.get("Accept-Encoding", "").lower()
+
+        exam_id = query.get("examId")
+        filename = f"results_{exam_id or 'all'}.{fmt}"
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+
+        results = get_store().iter_results(exam_id, since, until, batch_size=EXPORT_BATCH_SIZE)
+        self._start_chunked(EXPORT_FORMATS[fmt], headers=headers)
+        try:
+            for chunk in iter_export(results, fmt, compress):
+                self._write_chunk(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        except Exception as e:
+            # Headers are gone; the only signal left is an incomplete body.
+            self.log_message("export failed: %s", e)
+            self.close_connection = True
+            return
+        self._end_chunked()
+
+    def handle_get_trace(self):
+        """Return a saved Chrome trace-event JSON file: GET /api/trace/<trace_id>."""
+        trace_id = urlparse(self.path).path.rsplit("/", 1)[-1]
+        trace = load_trace(trace_id)
+        if trace is None:
+            self._send_json({"success": False, "message": "Trace not found"}, 404)
+            return
+        self._send_json(trace)
+
     def handle_fix_spacing(self):
         """
         Use NLP (BERT tokenizer) to intelligently fix word spacing.
@@ -349,16 +1112,24 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         {
             "texts": ["text1", "text2", ...]
         }
+        plus optionally "engine": "tokenizer" or "segmenter" (default: SPACING_ENGINE).
+
+        The texts form can stream NDJSON (Accept: application/x-ndjson or ?stream=1).
         """
         payload, error = self._read_json_body()
         if error:
             self._send_json({"success": False, "message": error}, 400)
             return
 
+        engine = payload.get("engine") or SPACING_ENGINE
+        if engine not in SPACING_ENGINES:
+            self._send_json({"success": False, "message": f"engine must be one of {', '.join(SPACING_ENGINES)}"}, 400)
+            return
+
         try:
             # Handle single text
             if "text" in payload:
-                fixed = fix_word_spacing_nlp(payload["text"])
+                fixed = fix_word_spacing_nlp(payload["text"], engine=engine)
                 self._send_json({"success": True, "text": fixed})
             # Handle multiple texts
             elif "texts" in payload:
@@ -366,13 +1137,32 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 if not isinstance(texts, list):
                     self._send_json({"success": False, "message": "texts must be an array"}, 400)
                     return
-                fixed = [fix_word_spacing_nlp(t) if isinstance(t, str) else t for t in texts]
-                self._send_json({"success": True, "texts": fixed})
+                if self._wants_ndjson():
+                    self._stream_fixed_spacing(texts, engine)
+                    return
+                self._send_json({"success": True, "texts": fix_word_spacing_batch(texts, engine=engine)})
             else:
                 self._send_json({"success": False, "message": "Provide 'text' or 'texts'"}, 400)
         except Exception as e:
             self._send_json({"success": False, "message": str(e)}, 500)
 
+    def _stream_fixed_spacing(self, texts: list, engine: str):
+        """NDJSON form of the `texts` request: one {"type": "item"} line per text, a batch at a time."""
+        self._start_chunked("application/x-ndjson")
+        try:
+            for start in range(0, len(texts), SPACING_BATCH_SIZE):
+                fixed = fix_word_spacing_batch(texts[start:start + SPACING_BATCH_SIZE], engine=engine)
+                for offset, text in enumerate(fixed):
+                    self._write_ndjson({"type": "item", "index": start + offset, "text": text})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        except Exception as e:
+            self._write_ndjson({"type": "error", "success": False, "message": str(e)})
+        else:
+            self._write_ndjson({"type": "done", "success": True, "count": len(texts)})
+        self._end_chunked()
+
     def handle_grade_ocr(self):
         """
         Grade a scanned answer sheet using OCR.
@@ -383,6 +1173,9 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
           - questions: JSON array of questions
           - lang: (optional) OCR language code (default: 'eng')
           - minConfidence: (optional) minimum OCR confidence (default: 30.0)
+
+        With Accept: application/x-ndjson or ?stream=1 the response streams one
+        NDJSON line per OCRed page and per graded question, then a summary.
         """
         if not OCR_GRADING_AVAILABLE:
             self._send_json({
@@ -397,7 +1190,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             return
 
         # Read raw data
-        raw_data = self.rfile.read(content_length)
+        raw_data = self._read_request_body(content_length)
         
         # Parse multipart form data
         # Simple multipart parser (for basic use cases)
@@ -431,6 +1224,9 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 tmp_path = Path(tmp.name)
             
             try:
+                if self._wants_ndjson():
+                    self._stream_ocr_grading(str(tmp_path), questions, lang, min_confidence)
+                    return
                 # Grade the answer sheet
                 result = grade_ocr_answer_sheet(
                     answer_sheet_path=str(tmp_path),
@@ -451,20 +1247,97 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             self._send_json({"success": False, "message": f"OCR grading error: {str(e)}"}, 500)
 
+    def _stream_ocr_grading(self, path: str, questions: list, lang: str, min_confidence: float):
+        """NDJSON form of /api/grade-ocr: forwards iter_grade_ocr_answer_sheet events as they happen."""
+        self._start_chunked("application/x-ndjson")
+        try:
+            for event in iter_grade_ocr_answer_sheet(
+                answer_sheet_path=path,
+                questions=questions,
+                lang=lang,
+                min_confidence=min_confidence
+            ):
+                self._write_ndjson(event)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        except Exception as e:
+            self._write_ndjson({"type": "error", "success": False, "message": f"OCR grading error: {str(e)}"})
+        self._end_chunked()
+
+
+def _print_endpoints():
+    print("NLP Grading API endpoints:")
+    print("  POST /api/grade-essay        - Grade essay with NLP + hybrid approach")
+    print("  POST /api/check-plagiarism   - Check for plagiarism")
+    if OCR_GRADING_AVAILABLE:
+        print("  POST /api/grade-ocr          - Grade scanned answer sheet with OCR")
+    print("  POST /api/analyze-text       - Analyze grammar/length/terms")
+    print("  POST /api/save-grading-example - Save example for fine-tuning")
+    print("  GET  /api/training-data      - Page through collected training data")
+    print("  GET  /api/grading-patterns   - Analyze grading patterns")
+    print("  GET/POST/PUT/DELETE /api/exams[/<id>], /api/results[/<id>] - Exam and result store")
+    print("  GET  /api/submissions[/<id>] - Stored answers, by exam and question")
+    print("  GET  /api/analytics/{exam,student,teacher}/<id> - Pre-aggregated dashboard statistics")
+    print("  GET  /api/export/results     - Stream results as CSV / NDJSON (examId, from, to, gzip)")
+    print("  GET  /api/cache-stats        - Grading result cache statistics")
+    print("  GET  /api/admission-stats    - Queue lengths and rejections per route")
+    print("  GET  /api/trace/<id>         - Chrome trace of a request sent with ?trace=1")
+
+
+def _preload_shared_state():
+    """Load read-only state once in the pre-fork parent so workers share it copy-on-write."""
+    from nlp_grader import _get_model
+    try:
+        _get_model()
+        print("Embedding model preloaded")
+    except RuntimeError as e:
+        print(f"Embedding model not preloaded: {e}", file=sys.stderr)
+
 
-script_dir = os.path.dirname(os.path.abspath(__file__))
 def main():
     PORT = parse_port()
+    options = parse_worker_options()
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
     public_dir = os.path.join(script_dir, 'public')
-    os.chdir(public_dir)
+    os.chdir(public_dir if os.path.isdir(public_dir) else script_dir)
+    for setting, path in (("EXAMGRADE_DB", DB_PATH), ("TRAINING_LOG_FILE", LOG_FILE)):
+        if is_within(path, os.getcwd()):
+            print(f"Refusing to start: {setting} ({path}) is inside the web root {os.getcwd()}. "
+                  "Point it (or EXAMGRADE_DATA_DIR) somewhere the server does not serve.", file=sys.stderr)
+            sys.exit(1)
 
     Handler = MyHTTPRequestHandler
 
-    with socketserver.TCPServer(("0.0.0.0", PORT), Handler) as httpd:
-        print(f"Server running at http://0.0.0.0:{PORT}/")
-        print("Press Ctrl+C to stop the server")
+    assets = get_static_assets(os.getcwd())
+    asset_stats = assets.stats()
+    print(f"Preloaded {asset_stats['assets']} static assets "
+          f"({asset_stats['bytes']} bytes, {asset_stats['gzip_bytes']} gzip, {asset_stats['br_bytes']} brotli)")
+
+    if options.workers > 0 and not prefork.fork_supported():
+        print('Pre-fork mode needs os.fork; running a single process instead', file=sys.stderr)
+        options.workers = 0
+
+    print(f"Server running at http://0.0.0.0:{PORT}/")
+    _print_endpoints()
+    print("Press Ctrl+C to stop the server")
+
+    if options.workers > 0:
+        print(f"Pre-fork mode: {options.workers} workers, "
+              f"max {options.max_requests or 'unlimited'} requests per worker")
+        prefork.serve_prefork(
+            ("0.0.0.0", PORT),
+            ExamGradeServer,
+            Handler,
+            workers=options.workers,
+            max_requests=options.max_requests,
+            graceful_timeout=options.graceful_timeout,
+            preload=None if options.no_preload else _preload_shared_state,
+        )
+        return
+
+    with ExamGradeServer(("0.0.0.0", PORT), Handler) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
@@ -473,20 +1346,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-os.chdir(public_dir)
-
-Handler = MyHTTPRequestHandler
-
-with socketserver.TCPServer(("0.0.0.0", PORT), Handler) as httpd:
-    print(f"Server running at http://0.0.0.0:{PORT}/")
-    print("NLP Grading API endpoints:")
-    print("  POST /api/grade-essay        - Grade essay with NLP + hybrid approach")
-    print("  POST /api/check-plagiarism   - Check for plagiarism")
-    if OCR_GRADING_AVAILABLE:
-        print("  POST /api/grade-ocr          - Grade scanned answer sheet with OCR")
-    print("  POST /api/analyze-text       - Analyze grammar/length/terms")
-    print("  POST /api/save-grading-example - Save example for fine-tuning")
-    print("  GET  /api/training-data      - Get collected training data")
-    print("  GET  /api/grading-patterns   - Analyze grading patterns")
-    print("Press Ctrl+C to stop the server")
-    httpd.serve_forever()
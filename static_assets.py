@@ -0,0 +1,192 @@
+"""
+Static file layer for the ExamGradeFlow front-end.
+
+At startup every servable asset (HTML/JS/CSS/images/fonts) under the web root
+is read once, given a content-hash ETag and, when it helps, precompressed to
+gzip (and brotli if the `brotli` package is installed). The request handler
+then answers conditional GETs with 304, picks the best encoding from
+Accept-Encoding without compressing anything per request, and sends large
+uncompressed files with sendfile.
+
+Versioned URLs (`app.js?v=3` or a content hash in the file name such as
+`app.3f2a1b9c.js`) are cached by browsers for a year; everything else must be
+revalidated (cheaply, via the ETag) on each use.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import unquote, urlparse, parse_qs
+
+try:
+    import brotli  # type: ignore
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+STATIC_EXTENSIONS = {
+    ".html", ".htm", ".js", ".mjs", ".css", ".map", ".svg", ".png", ".jpg", ".jpeg",
+    ".gif", ".webp", ".ico", ".woff", ".woff2", ".ttf", ".webmanifest",
+}
+COMPRESSIBLE_EXTENSIONS = {".html", ".htm", ".js", ".mjs", ".css", ".map", ".svg", ".webmanifest", ".ttf"}
+
+# Files at least this large are not kept in memory; their identity body is sent with sendfile.
+SENDFILE_THRESHOLD = 256 * 1024
+# Compressing tiny files costs more in headers than it saves.
+MIN_COMPRESS_SIZE = 512
+
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv", ".pytest_cache"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+
+class StaticAsset:
+    """One file with its ETag and precompressed variants."""
+
+    __slots__ = ("path", "size", "mtime_ns", "content_type", "etag", "body", "variants")
+
+    def __init__(self, path: Path):
+        stat = path.stat()
+        data = path.read_bytes()
+        self.path = path
+        self.size = len(data)
+        self.mtime_ns = stat.st_mtime_ns
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+        self.etag = hashlib.sha256(data).hexdigest()[:20]
+        # Small identity bodies are served from memory; large ones with sendfile.
+        self.body: Optional[bytes] = data if self.size < SENDFILE_THRESHOLD else None
+        self.variants: Dict[str, bytes] = {}
+
+        if path.suffix.lower() in COMPRESSIBLE_EXTENSIONS and self.size >= MIN_COMPRESS_SIZE:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < self.size:
+                self.variants["gzip"] = gz
+            if BROTLI_AVAILABLE:
+                br = brotli.compress(data, quality=11)
+                if len(br) < self.size:
+                    self.variants["br"] = br
+
+    def is_stale(self) -> bool:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return True
+        return stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """True if any entity tag in an If-None-Match header refers to this content."""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-", 1)[0] == self.etag:
+                return True
+        return False
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(asset: StaticAsset, accept_encoding: str) -> Optional[str]:
+    """Pick the precompressed variant the client accepts, preferring brotli."""
+    if not asset.variants or not accept_encoding:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def is_versioned_request(raw_path: str) -> bool:
+    """Versioned URLs carry ?v=/?version= or a content hash in the file name."""
+    parsed = urlparse(raw_path)
+    query = parse_qs(parsed.query)
+    if query.get("v") or query.get("version"):
+        return True
+    return bool(_HASHED_NAME.search(parsed.path))
+
+
+class StaticAssetTable:
+    """Preloaded assets under `root`, keyed by URL path."""
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self) -> None:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in filenames:
+                path = Path(dirpath) / name
+                if path.suffix.lower() not in STATIC_EXTENSIONS:
+                    continue
+                try:
+                    asset = StaticAsset(path)
+                except OSError:
+                    continue
+                self._assets["/" + path.relative_to(self.root).as_posix()] = asset
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def lookup(self, raw_path: str) -> Optional[StaticAsset]:
+        """Return the asset for a request path, reloading it if the file changed on disk."""
+        url_path = unquote(urlparse(raw_path).path)
+        if url_path.endswith("/"):
+            url_path += "index.html"
+        asset = self._assets.get(url_path)
+        if asset is None or not asset.is_stale():
+            return asset
+        with self._lock:
+            try:
+                asset = StaticAsset(asset.path)
+            except OSError:
+                self._assets.pop(url_path, None)
+                return None
+            self._assets[url_path] = asset
+            return asset
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "bytes": sum(a.size for a in self._assets.values()),
+                "gzip_bytes": sum(len(a.variants.get("gzip", b"")) for a in self._assets.values()),
+                "br_bytes": sum(len(a.variants.get("br", b"")) for a in self._assets.values()),
+            }
@@ -6,7 +6,9 @@ function getExams() {
 }
 
 function saveExams(exams) {
+    const changed = changedDocuments(localStorage.getItem('exams'), exams);
     localStorage.setItem('exams', JSON.stringify(exams));
+    changed.forEach(exam => mirrorToServer('PUT', '/api/exams/' + encodeURIComponent(exam.id), exam));
 }
 
 function getExamById(examId) {
@@ -20,7 +22,9 @@ function getResults() {
 }
 
 function saveResults(results) {
+    const changed = changedDocuments(localStorage.getItem('results'), results);
     localStorage.setItem('results', JSON.stringify(results));
+    changed.forEach(result => mirrorToServer('PUT', '/api/results/' + encodeURIComponent(result.id), result));
 }
 
 function getResultsByStudent(studentId) {
@@ -33,6 +37,31 @@ function getResultsByExam(examId) {
     return results.filter(r => r.examId === examId);
 }
 
+// Best-effort copy to the server-side store (/api/exams, /api/results) so that
+// grading endpoints can refer to submissions by id. saveExams / saveResults
+// send every document that is new or changed; localStorage stays the source
+// of truth for the pages and failures are ignored.
+function mirrorToServer(method, path, body) {
+    try {
+        fetch(path, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            body: body === undefined ? undefined : JSON.stringify(body)
+        }).catch(() => {});
+    } catch (e) {
+        // fetch unavailable
+    }
+}
+
+// Documents of `items` (with an id) that are new or differ from the stored JSON array.
+function changedDocuments(storedJson, items) {
+    const stored = {};
+    (storedJson ? JSON.parse(storedJson) : []).forEach(item => {
+        if (item && item.id) stored[item.id] = JSON.stringify(item);
+    });
+    return items.filter(item => item && item.id && stored[item.id] !== JSON.stringify(item));
+}
+
 function addResult(result) {
     const results = getResults();
     results.push(result);
@@ -47,6 +76,7 @@ function deleteExam(examId) {
     let results = getResults();
     results = results.filter(r => r.examId !== examId);
     saveResults(results);
+    mirrorToServer('DELETE', '/api/exams/' + encodeURIComponent(examId));
 }
 
 // Question Bank Functions
@@ -0,0 +1,200 @@
+"""
+Multi-pattern matcher for mandatory rubric terms.
+
+All terms of a question, together with their variants, are compiled into one
+Aho-Corasick automaton over word tokens. An answer is then matched in a single
+left-to-right pass over its tokens, whatever the number of terms. Because
+matching works on whole tokens, "set" does not match inside "subset", and
+"power set" matches "Power  set" (case and spacing are ignored).
+
+A term is given as:
+- a string, e.g. "power set",
+- a string with alternatives, e.g. "CPU|processor|central processing unit",
+- or an object {"term": "CPU", "synonyms": ["processor"]}.
+
+Unless disabled, each alternative also matches simple inflections of its last
+word: plurals ("sets", "properties", "analyses") and -ed / -ing forms. A term
+given in plural matches its singular only where the plural is unambiguous
+("properties" -> "property", "boxes" -> "box"); a final -s is otherwise kept,
+so "news", "means" and "economics" are not satisfied by "new", "mean" and
+"economic".
+
+Compiled matchers are cached, so a rubric is compiled once and reused for
+every answer in a cohort.
+"""
+
+import json
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+
+TermSpec = Union[str, Dict[str, Any]]
+
+# Words and single punctuation marks; "x^2" -> ["x", "^", "2"].
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SIBILANT_ENDINGS = ("s", "x", "z", "ch", "sh")
+# Plural "-es" endings that can be undone safely ("analyses" -> "analys" cannot).
+_UNAMBIGUOUS_ES_ENDINGS = ("x", "z", "ch", "sh")
+_VOWELS = "aeiou"
+# Stems shorter than this are not inflected or de-inflected ("us" must not become "u").
+_MIN_STEM = 3
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def _singular(word: str) -> str:
+    """
+    Undo an unambiguous plural: properties -> property, boxes -> box. Other
+    words come back unchanged: without a lexicon, stripping -s / -ed / -ing
+    would turn "news" into "new", "means" into "mean" and "evening" into "even".
+    """
+    if len(word) > _MIN_STEM + 3 and word.endswith("ies") and word[-4] not in _VOWELS:
+        return word[:-3] + "y"
+    if len(word) >= _MIN_STEM + 2 and word.endswith("es") and word[:-2].endswith(_UNAMBIGUOUS_ES_ENDINGS):
+        return word[:-2]
+    return word
+
+
+def word_variants(word: str) -> List[str]:
+    """The word and its regular inflections, or for an unambiguous plural, its singular."""
+    if not word.isalpha() or len(word) < _MIN_STEM:
+        return [word]
+    singular = _singular(word)
+    if singular != word:
+        return [word, singular]
+    forms = [word]
+    if word.endswith("ing"):
+        forms.append(word + "s")  # buildings, embeddings
+    elif word.endswith("ed"):
+        pass
+    elif word.endswith("is"):
+        forms.append(word[:-2] + "es")  # analysis -> analyses
+    elif word.endswith("s") and not word.endswith(("ss", "us")):
+        pass  # news, means, economics: already an -s form, nothing regular to add
+    else:
+        if word.endswith("y") and word[-2] not in _VOWELS:
+            forms.append(word[:-1] + "ies")
+        elif word.endswith(_SIBILANT_ENDINGS):
+            forms.append(word + "es")
+        else:
+            forms.append(word + "s")
+        if word.endswith("e"):
+            forms += [word + "d", word[:-1] + "ing"]
+        else:
+            forms += [word + "ed", word + "ing"]
+    return list(dict.fromkeys(forms))
+
+
+def _alternatives(spec: TermSpec) -> Tuple[str, List[str]]:
+    """(display name, surface alternatives) of one term spec."""
+    if isinstance(spec, dict):
+        name = str(spec.get("term") or "")
+        extra = spec.get("synonyms") or spec.get("variants") or []
+        return name, [name] + [str(s) for s in extra]
+    name = str(spec)
+    return name, name.split("|") if "|" in name else [name]
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over word tokens for a list of term specs.
+
+    Args:
+        terms: term specs (see module docstring)
+        expand_variants: also match plural / -ed / -ing forms of each alternative's last word
+    """
+
+    def __init__(self, terms: Sequence[TermSpec], expand_variants: bool = True):
+        self.terms: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # state -> [(term index, pattern length in tokens)]
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+        for index, spec in enumerate(terms):
+            name, alternatives = _alternatives(spec)
+            self.terms.append(name)
+            for alternative in alternatives:
+                tokens = tokenize(alternative)
+                if not tokens:
+                    continue
+                last_forms = word_variants(tokens[-1]) if expand_variants else [tokens[-1]]
+                for last in last_forms:
+                    self._add(tokens[:-1] + [last], index)
+        self._build_failure_links()
+
+    def _add(self, tokens: List[str], term_index: int) -> None:
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((term_index, len(tokens)))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_tokens(self, tokens: Sequence[str]) -> Dict[int, str]:
+        """term index -> matched text (first occurrence) for every term found in `tokens`."""
+        found: Dict[int, str] = {}
+        wanted = len(self.terms)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                for term_index, length in out[state]:
+                    if term_index not in found:
+                        found[term_index] = " ".join(tokens[position - length + 1:position + 1])
+                if len(found) == wanted:
+                    break
+        return found
+
+    def find(self, text: str) -> Dict[int, str]:
+        return self.find_tokens(tokenize(text))
+
+    def check(self, text: str = "", tokens: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Found / missing terms and coverage, in the shape of check_mandatory_terms."""
+        found = self.find_tokens(tokens if tokens is not None else tokenize(text))
+        return {
+            "found_terms": [name for i, name in enumerate(self.terms) if i in found],
+            "missing_terms": [name for i, name in enumerate(self.terms) if i not in found],
+            "coverage": len(found) / len(self.terms) if self.terms else 1.0,
+            "matches": {self.terms[i]: surface for i, surface in sorted(found.items())},
+        }
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(key: Tuple[str, ...], expand_variants: bool) -> TermMatcher:
+    specs = [json.loads(k[1:]) if k.startswith("\0") else k for k in key]
+    return TermMatcher(specs, expand_variants)
+
+
+def compile_terms(terms: Sequence[TermSpec], expand_variants: bool = True) -> TermMatcher:
+    """Cached TermMatcher for `terms`."""
+    key = tuple(
+        "\0" + json.dumps(t, sort_keys=True) if isinstance(t, dict) else str(t)
+        for t in terms
+    )
+    return _compile_cached(key, expand_variants)
@@ -0,0 +1,43 @@
+"""Mandatory-term matching: run with `python -m unittest test_term_matcher` (or pytest)."""
+
+import unittest
+
+from term_matcher import compile_terms, word_variants
+
+
+def _missing(terms, text):
+    return compile_terms(terms).check(text)["missing_terms"]
+
+
+class TermsEndingInSTest(unittest.TestCase):
+    def test_plural_looking_words_keep_their_s(self):
+        self.assertEqual(word_variants("news"), ["news"])
+        self.assertEqual(word_variants("means"), ["means"])
+        self.assertEqual(word_variants("economics"), ["economics"])
+
+    def test_stem_does_not_satisfy_term(self):
+        self.assertEqual(_missing(["news"], "The new policy was announced."), ["news"])
+        self.assertEqual(_missing(["economics"], "An economic argument."), ["economics"])
+        self.assertEqual(_missing(["means"], "The mean of the sample."), ["means"])
+
+    def test_term_itself_matches(self):
+        self.assertEqual(_missing(["news", "economics", "means"],
+                                  "The news about economics is a means to an end."), [])
+
+    def test_analysis_matches_its_plural_not_a_truncation(self):
+        self.assertNotIn("analysi", word_variants("analysis"))
+        self.assertEqual(_missing(["analysis"], "Both analyses agree."), [])
+
+    def test_unambiguous_plurals_match_singular(self):
+        self.assertEqual(_missing(["properties", "boxes"], "One property of the box."), [])
+
+    def test_singular_terms_match_plurals(self):
+        self.assertEqual(_missing(["set", "process", "property"],
+                                  "Two sets, many processes and their properties."), [])
+
+    def test_ss_and_us_words_inflect(self):
+        self.assertEqual(_missing(["class", "bus"], "All classes took the buses."), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Lightweight per-request stage tracing.
+
+Spans are recorded only while a Tracer is active for the current request
+(see `start_trace`); otherwise `span()` returns a shared no-op context manager,
+so instrumented code pays a single context-variable lookup.
+
+Finished traces are written in Chrome trace-event format and can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+TRACE_DIR = Path(os.environ.get("EXAMGRADE_TRACE_DIR") or Path(tempfile.gettempdir()) / "examgrade_traces")
+
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar("examgrade_tracer", default=None)
+
+
+class _NullSpan:
+    """No-op span used when tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach extra arguments to the span (shown in the trace viewer)."""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects complete ("X") trace events for a single request."""
+
+    def __init__(self, name: str = "request", trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **args) -> _Span:
+        return _Span(self, name, args)
+
+    def _record(self, name: str, start: float, end: float, args: Dict[str, Any]):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = {k: _jsonable(v) for k, v in args.items()}
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Return the trace as a Chrome trace-event JSON object."""
+        with self._lock:
+            events = sorted(self.events, key=lambda e: (e["ts"], -e["dur"]))
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "name": self.name},
+        }
+
+    def save(self, directory: Optional[Path] = None) -> Path:
+        """Write the trace to `<directory>/<trace_id>.json` and return the path."""
+        directory = Path(directory or TRACE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.trace_id}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def start_trace(name: str = "request", trace_id: Optional[str] = None):
+    """
+    Activate a new Tracer for the current context.
+
+    Returns (tracer, token); pass the token to `stop_trace` when the request ends.
+    """
+    tracer = Tracer(name, trace_id)
+    return tracer, _current_tracer.set(tracer)
+
+
+def stop_trace(token) -> None:
+    _current_tracer.reset(token)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+def span(name: str, **args):
+    """Context manager timing a named stage; a no-op when tracing is disabled."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording every call of the function as a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _current_tracer.get()
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_trace(trace_id: str, directory: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Load a previously saved trace by id, or None if it does not exist."""
+    if not trace_id or not all(c in "0123456789abcdef" for c in trace_id):
+        return None
+    path = Path(directory or TRACE_DIR) / f"{trace_id}.json"
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,322 @@
+"""
+Append-only log of teacher grading corrections (the fine-tuning dataset).
+
+Each example is one JSON line in `grading_training_data.jsonl`, kept in the
+data directory (see data_paths) rather than next to the sources. Saving an
+example appends a single line under an exclusive file lock, so the cost no
+longer grows with the size of the dataset and concurrent saves (threads or
+pre-fork workers) cannot overwrite each other. A small sidecar file keeps the
+example count and running statistics of the teacher-minus-AI score difference
+(overall and per question, exam and teacher), updated on every append, so
+neither the count nor the grading patterns require reading the log.
+
+Readers stream the file line by line without taking the lock; a line that is
+still being written (or was torn by a crash) is skipped. Every COMPACT_EVERY
+appends the log is compacted: torn and unparseable lines are dropped and the
+file is replaced atomically. Repeated examples are kept, since the same
+correction can legitimately be submitted more than once.
+
+The old whole-file `grading_training_data.json` is migrated on first use.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from data_paths import SOURCE_DIR, adopt_legacy_files, data_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+LEGACY_FILE = SOURCE_DIR / "grading_training_data.json"
+# Where the log lived before it moved to the data directory.
+LEGACY_LOG_FILE = SOURCE_DIR / "grading_training_data.jsonl"
+LOG_FILE = Path(os.environ.get("TRAINING_LOG_FILE") or data_dir() / "grading_training_data.jsonl")
+
+# Compact the log after this many appends.
+COMPACT_EVERY = 1000
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# A teacher score within this distance of the AI score counts as "similar".
+SIMILAR_THRESHOLD = 0.1
+
+# Example field -> pattern group it is aggregated under.
+PATTERN_GROUPS = {"question_id": "question", "exam_id": "exam", "teacher_id": "teacher"}
+
+
+@contextmanager
+def file_lock(path: Path, exclusive: bool = True):
+    """Inter-process lock on `path` (created if missing): fcntl.flock, or msvcrt on Windows."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 seconds; keep waiting.
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {"count": 0, "mean": 0.0, "m2": 0.0, "higher": 0, "lower": 0, "similar": 0}
+
+
+def _add_to_bucket(bucket: Dict[str, Any], diff: float) -> None:
+    """Welford update of one running summary with a score difference."""
+    bucket["count"] += 1
+    delta = diff - bucket["mean"]
+    bucket["mean"] += delta / bucket["count"]
+    bucket["m2"] += delta * (diff - bucket["mean"])
+    if diff > SIMILAR_THRESHOLD:
+        bucket["higher"] += 1
+    elif diff < -SIMILAR_THRESHOLD:
+        bucket["lower"] += 1
+    else:
+        bucket["similar"] += 1
+
+
+def _new_patterns() -> Dict[str, Any]:
+    return {"overall": _new_bucket(), **{group: {} for group in PATTERN_GROUPS.values()}}
+
+
+def add_to_patterns(patterns: Dict[str, Any], example: Dict[str, Any]) -> None:
+    """Fold one example into the overall and per-group summaries."""
+    try:
+        diff = float(example.get("score_difference") or 0)
+    except (TypeError, ValueError):
+        diff = 0.0
+    _add_to_bucket(patterns["overall"], diff)
+    for field, group in PATTERN_GROUPS.items():
+        key = example.get(field)
+        if key is not None and key != "":
+            _add_to_bucket(patterns[group].setdefault(str(key), _new_bucket()), diff)
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class TrainingLog:
+    """
+    Args:
+        path: JSONL log file (default LOG_FILE); `<path>.lock` and `<path>.meta.json` live next to it
+        legacy_path: whole-file JSON dataset to import if the log does not exist yet
+    """
+
+    def __init__(self, path: Optional[Path] = None, legacy_path: Optional[Path] = LEGACY_FILE):
+        if path is None and not os.environ.get("TRAINING_LOG_FILE"):
+            adopt_legacy_files(LEGACY_LOG_FILE, LOG_FILE, ("", ".meta.json"))
+        self.path = Path(path or LOG_FILE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.meta_path = self.path.with_name(self.path.name + ".meta.json")
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        # (mtime_ns, size) of the sidecar -> parsed contents, for read-only callers
+        self._meta_cache: Optional[Tuple[Tuple[int, int], Dict[str, Any]]] = None
+
+    # ------------------------------------------------------------ metadata
+
+    def _stored_meta(self) -> Optional[Dict[str, Any]]:
+        """The sidecar's contents, or None if it is missing or incomplete."""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if isinstance(meta, dict) and "patterns" in meta:
+                return meta
+        except (OSError, json.JSONDecodeError):
+            pass
+        return None
+
+    def _read_meta(self) -> Dict[str, Any]:
+        return self._stored_meta() or self._rebuild_meta()
+
+    def _restore_meta(self) -> Dict[str, Any]:
+        """Rebuild a missing or incomplete sidecar from the log and write it back."""
+        with file_lock(self.lock_path):
+            meta = self._stored_meta()
+            if meta is None:
+                meta = self._rebuild_meta()
+                _write_json_atomic(self.meta_path, meta)
+            return meta
+
+    def _rebuild_meta(self) -> Dict[str, Any]:
+        patterns = _new_patterns()
+        for example in self._iter_raw():
+            add_to_patterns(patterns, example)
+        return {"count": patterns["overall"]["count"], "appends_since_compaction": 0, "patterns": patterns}
+
+    def _cached_meta(self) -> Dict[str, Any]:
+        """
+        The sidecar, re-parsed only when it has been replaced. A missing or
+        incomplete sidecar is rebuilt once and written back, so later reads do
+        not rescan the log. Do not mutate.
+        """
+        try:
+            st = os.stat(self.meta_path)
+            key = (st.st_mtime_ns, st.st_size)
+            if self._meta_cache is not None and self._meta_cache[0] == key:
+                return self._meta_cache[1]
+            meta = self._stored_meta()
+            if meta is None:
+                meta = self._restore_meta()
+                st = os.stat(self.meta_path)
+                key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            try:
+                meta = self._restore_meta()
+                st = os.stat(self.meta_path)
+            except OSError:
+                return self._read_meta()  # read-only directory: rebuild every time
+            key = (st.st_mtime_ns, st.st_size)
+        self._meta_cache = (key, meta)
+        return meta
+
+    # --------------------------------------------------------------- write
+
+    def append(self, example: Dict[str, Any]) -> int:
+        """Append one example; returns the number of examples in the log."""
+        line = (json.dumps(example, ensure_ascii=False) + "\n").encode("utf-8")
+        with file_lock(self.lock_path):
+            self._migrate_legacy()
+            meta = self._read_meta()
+            # O_APPEND + one write call: the line lands whole at the end of the file.
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # A tail without a newline is a write torn by a crash (appends hold the
+                # lock); end it so this example does not join it and get skipped with it.
+                if os.fstat(fd).st_size:
+                    os.lseek(fd, -1, os.SEEK_END)
+                    if os.read(fd, 1) != b"\n":
+                        line = b"\n" + line
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            meta["count"] = meta.get("count", 0) + 1
+            add_to_patterns(meta["patterns"], example)
+            meta["appends_since_compaction"] = meta.get("appends_since_compaction", 0) + 1
+            if meta["appends_since_compaction"] >= COMPACT_EVERY:
+                meta = self._compact_locked()
+            _write_json_atomic(self.meta_path, meta)
+            return meta["count"]
+
+    def compact(self) -> Dict[str, Any]:
+        """Drop torn and unparseable lines; returns the new metadata."""
+        with file_lock(self.lock_path):
+            meta = self._compact_locked()
+            _write_json_atomic(self.meta_path, meta)
+            return meta
+
+    def _compact_locked(self) -> Dict[str, Any]:
+        tmp_path = self.path.with_name(self.path.name + ".compact")
+        count = 0
+        patterns = _new_patterns()
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for example in self._iter_raw():
+                out.write(json.dumps(example, ensure_ascii=False) + "\n")
+                add_to_patterns(patterns, example)
+                count += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        return {"count": count, "appends_since_compaction": 0, "compacted_at": time.time(), "patterns": patterns}
+
+    def _migrate_legacy(self) -> None:
+        """Import the old JSON array file once (called with the lock held)."""
+        if self.path.exists() or self.legacy_path is None or not self.legacy_path.exists():
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = []
+        tmp_path = self.path.with_name(self.path.name + ".migrate")
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for example in data if isinstance(data, list) else []:
+                out.write(json.dumps(example, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.legacy_path.rename(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+        _write_json_atomic(self.meta_path, self._rebuild_meta())
+
+    # ---------------------------------------------------------------- read
+
+    def _iter_raw(self) -> Iterator[Dict[str, Any]]:
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # append in progress
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _ensure_migrated(self) -> None:
+        if not self.path.exists() and self.legacy_path is not None and self.legacy_path.exists():
+            with file_lock(self.lock_path):
+                self._migrate_legacy()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream every example, oldest first."""
+        self._ensure_migrated()
+        return self._iter_raw()
+
+    def count(self) -> int:
+        self._ensure_migrated()
+        return self._cached_meta().get("count", 0)
+
+    def patterns(self) -> Dict[str, Any]:
+        """
+        Running score-difference summaries: {"overall": bucket, "question": {id: bucket},
+        "exam": {...}, "teacher": {...}}; a bucket has count, mean, m2 (sum of squared
+        deviations) and the higher / lower / similar counts. Do not mutate.
+        """
+        self._ensure_migrated()
+        return self._cached_meta()["patterns"]
+
+    def page(self, limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        """{items, total, limit, offset}, oldest first, like the exam store's listings."""
+        limit = DEFAULT_PAGE_SIZE if limit is None else max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset or 0))
+        items = list(islice(iter(self), offset, offset + limit))
+        return {"items": items, "total": self.count(), "limit": limit, "offset": offset}
+
+
+_log: Optional[TrainingLog] = None
+
+
+def get_training_log() -> TrainingLog:
+    global _log
+    if _log is None:
+        _log = TrainingLog()
+    return _log
@@ -0,0 +1,292 @@
+"""
+Dictionary-based word segmentation for glued PDF text.
+
+A unigram language model splits runs such as "Showthatthepowersetofaset" into
+the most probable word sequence by dynamic programming (cost of a word =
+-log P(word)). Unlike the tokenizer path in nlp_grader it needs neither
+`transformers` nor a BERT vocabulary: the word-frequency table is a compact
+binary hash table that is memory-mapped, so opening it is instant and forked
+server workers share its pages.
+
+Build the table once from a "word count" text file (one entry per line, e.g.
+Peter Norvig's count_1w.txt or a wordfreq export):
+
+    python word_segmenter.py build count_1w.txt word_freq.bin
+
+Compare against the tokenizer path on your own texts (one per line, or a JSON
+array of strings):
+
+    python word_segmenter.py bench questions.txt
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+WORD_FREQ_TABLE = Path(os.environ.get("WORD_FREQ_TABLE") or Path(__file__).parent / "word_freq.bin")
+
+_MAGIC = b"EGWF"
+_VERSION = 1
+# magic, version, slot count (power of two), longest word, ln(total count)
+_HEADER = struct.Struct("<4sIIId")
+# 64-bit word hash (0 = empty slot), cost = -ln P(word)
+_SLOT = struct.Struct("<Qf")
+
+# Segment words of at most this many characters even if the table knows longer ones.
+MAX_WORD_LEN = 24
+
+_ALPHA_OR_OTHER = re.compile(r"[A-Za-z]+|[^A-Za-z]+")
+_PLACEHOLDER = re.compile(r"MATHPLACEHOLDER\d+")
+
+
+def _word_hash(word: str) -> int:
+    data = word.encode("utf-8")
+    h = (zlib.crc32(data) << 32) | zlib.crc32(data, 0x9E3779B9)
+    return h or 1
+
+
+class WordFreqTable:
+    """Read-only, memory-mapped word -> cost table written by `build_table`."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slots, max_len, log_total = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{self.path} is not a word frequency table (version {_VERSION})")
+        self.slots = slots
+        self.max_word_len = min(max_len, MAX_WORD_LEN)
+        self.log_total = log_total
+        self._mask = slots - 1
+
+    def cost(self, word: str) -> Optional[float]:
+        """-ln P(word), or None for words not in the table."""
+        h = _word_hash(word)
+        index = h & self._mask
+        mm = self._mm
+        while True:
+            slot_hash, cost = _SLOT.unpack_from(mm, _HEADER.size + index * _SLOT.size)
+            if slot_hash == h:
+                return cost
+            if slot_hash == 0:
+                return None
+            index = (index + 1) & self._mask
+
+    def unknown_cost(self, length: int) -> float:
+        # Unseen words get P = 10 / (N * 10^len): long unknown words are very unlikely.
+        return self.log_total - math.log(10) + length * math.log(10)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def build_table(counts: Iterable[Tuple[str, int]], out_path: Path) -> int:
+    """Write a table for (word, count) pairs; returns the number of words."""
+    merged: Dict[str, int] = {}
+    for word, count in counts:
+        word = word.lower()
+        if word.isalpha() and count > 0:
+            merged[word] = merged.get(word, 0) + count
+    if not merged:
+        raise ValueError("no words to write")
+
+    total = sum(merged.values())
+    slots = 1
+    while slots < len(merged) * 2:  # load factor <= 0.5
+        slots <<= 1
+    table = bytearray(_HEADER.size + slots * _SLOT.size)
+    _HEADER.pack_into(table, 0, _MAGIC, _VERSION, slots, max(map(len, merged)), math.log(total))
+    mask = slots - 1
+    for word, count in merged.items():
+        h = _word_hash(word)
+        index = h & mask
+        while _SLOT.unpack_from(table, _HEADER.size + index * _SLOT.size)[0]:
+            index = (index + 1) & mask
+        _SLOT.pack_into(table, _HEADER.size + index * _SLOT.size, h, math.log(total / count))
+
+    out_path = Path(out_path)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    tmp_path.write_bytes(table)
+    os.replace(tmp_path, out_path)
+    return len(merged)
+
+
+def read_counts(path: Path) -> Iterable[Tuple[str, int]]:
+    """Parse "word<whitespace>count" lines; malformed lines are skipped."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2:
+                try:
+                    yield parts[0], int(float(parts[1]))
+                except ValueError:
+                    continue
+
+
+_table: Optional[WordFreqTable] = None
+_table_lock = threading.Lock()
+
+
+def get_table() -> WordFreqTable:
+    """The table at WORD_FREQ_TABLE, opened on first use."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                if not WORD_FREQ_TABLE.exists():
+                    raise RuntimeError(
+                        f"Word frequency table not found at {WORD_FREQ_TABLE}. "
+                        "Build it with: python word_segmenter.py build <word-counts.txt> "
+                        f"{WORD_FREQ_TABLE.name} (or set WORD_FREQ_TABLE)"
+                    )
+                _table = WordFreqTable(WORD_FREQ_TABLE)
+    return _table
+
+
+@lru_cache(maxsize=65536)
+def segment_run(run: str) -> Tuple[str, ...]:
+    """Split one run of letters into its most probable words (original case kept)."""
+    table = get_table()
+    lowered = run.lower()
+    n = len(lowered)
+    best = [0.0] + [math.inf] * n
+    back = [0] * (n + 1)
+    for end in range(1, n + 1):
+        for start in range(max(0, end - table.max_word_len), end):
+            word = lowered[start:end]
+            cost = table.cost(word)
+            if cost is None:
+                cost = table.unknown_cost(end - start)
+            total = best[start] + cost
+            if total < best[end]:
+                best[end] = total
+                back[end] = start
+
+    words = []
+    end = n
+    while end > 0:
+        start = back[end]
+        words.append(run[start:end])
+        end = start
+    return tuple(reversed(words))
+
+
+def segment_text(text: str) -> str:
+    """
+    Insert spaces inside glued letter runs of `text`. Punctuation, digits and
+    MATHPLACEHOLDER tokens are kept as they are.
+    """
+    out = []
+    for token in text.split():
+        if _PLACEHOLDER.fullmatch(token):
+            out.append(token)
+            continue
+        pieces = []
+        for part in _ALPHA_OR_OTHER.findall(token):
+            pieces.append(" ".join(segment_run(part)) if part[0].isalpha() else part)
+        out.append("".join(pieces))
+    return " ".join(out)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark / agreement report
+# ---------------------------------------------------------------------------
+
+def _load_texts(path: Path) -> List[str]:
+    raw = Path(path).read_text(encoding="utf-8")
+    if raw.lstrip().startswith("["):
+        return [t for t in json.loads(raw) if isinstance(t, str)]
+    return [line.strip() for line in raw.splitlines() if line.strip()]
+
+
+def _boundaries(text: str) -> set:
+    """Character offsets (ignoring spaces) at which a new word starts."""
+    cuts, pos = set(), 0
+    for word in text.lower().split():
+        cuts.add(pos)
+        pos += len(word)
+    return cuts
+
+
+def benchmark(texts: List[str]) -> Dict[str, object]:
+    """Time both spacing engines on `texts` and measure how often they agree."""
+    from nlp_grader import fix_word_spacing_batch, _get_tokenizer, _spacing_cache
+
+    report: Dict[str, object] = {"texts": len(texts)}
+    outputs = {}
+    for engine in ("segmenter", "tokenizer"):
+        if engine == "tokenizer" and _get_tokenizer() is None:
+            report[engine] = {"available": False}
+            continue
+        _spacing_cache.clear()
+        segment_run.cache_clear()
+        start = time.perf_counter()
+        outputs[engine] = fix_word_spacing_batch(texts, engine=engine)
+        elapsed = time.perf_counter() - start
+        report[engine] = {
+            "available": True,
+            "seconds": round(elapsed, 4),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+        }
+
+    if len(outputs) == 2:
+        same = matched = total = 0
+        for a, b in zip(outputs["segmenter"], outputs["tokenizer"]):
+            # The tokenizer path lowercases (uncased vocabulary); compare without case.
+            if " ".join(a.lower().split()) == " ".join(b.lower().split()):
+                same += 1
+            cuts_a, cuts_b = _boundaries(a), _boundaries(b)
+            matched += len(cuts_a & cuts_b)
+            total += len(cuts_a | cuts_b)
+        report["agreement"] = {
+            "identical_texts": round(same / len(texts), 4) if texts else None,
+            "word_boundaries": round(matched / total, 4) if total else None,
+        }
+        report["examples"] = [
+            {"input": t, "segmenter": a, "tokenizer": b}
+            for t, a, b in zip(texts, outputs["segmenter"], outputs["tokenizer"])
+            if a.lower() != b.lower()
+        ][:10]
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Word frequency table and segmentation tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Compile a 'word count' text file into a table")
+    build.add_argument("counts", help="Text file with one 'word count' pair per line")
+    build.add_argument("output", nargs="?", default=str(WORD_FREQ_TABLE), help="Table file to write")
+
+    segment = sub.add_parser("segment", help="Segment the given text")
+    segment.add_argument("text", nargs="+")
+
+    bench = sub.add_parser("bench", help="Benchmark and compare with the tokenizer engine")
+    bench.add_argument("texts", help="Text file (one text per line) or JSON array of strings")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        count = build_table(read_counts(Path(args.counts)), Path(args.output))
+        print(f"Wrote {count} words to {args.output} ({Path(args.output).stat().st_size} bytes)")
+    elif args.command == "segment":
+        print(segment_text(" ".join(args.text)))
+    else:
+        print(json.dumps(benchmark(_load_texts(Path(args.texts))), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())